@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from analytics_engine import get_analytics_engine
+from instrumentation import logger
+
+# Colunas que têm totais na tabela, nos cards e na exportação
+MEASURABLE_COLUMNS = [
+    'localWins', 'localFee', 'hands',
+    'dolarWins', 'dolarFee', 'dolarRakeback', 'dolarRebate', 'dolarAgentSett',
+    'realWins', 'realFee', 'realRakeback', 'realRebate', 'realAgentSett',
+    'realRevShare', 'realBPFProfit', 'deal', 'rebate'
+]
+
+_totals_cache = OrderedDict()
+_totals_lock = threading.Lock()
+TOTALS_CACHE_SIZE = 32
+
+def _numeric_block(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """
+    Copia as colunas para uma única matriz float64 (uma linha da matriz por coluna, cada uma
+    contígua na memória). Valores ausentes ou não numéricos viram NaN.
+    """
+    block = np.empty((len(columns), len(df)), dtype=np.float64)
+    for i, col in enumerate(columns):
+        series = df[col]
+        if not pd.api.types.is_numeric_dtype(series):
+            series = pd.to_numeric(series, errors='coerce')
+        block[i] = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return block
+
+def _numpy_totals(df: pd.DataFrame, columns: list) -> dict:
+    block = _numeric_block(df, columns)
+    nan_mask = np.isnan(block)
+    sums = np.nansum(block, axis=1)
+    nans = nan_mask.sum(axis=1)
+
+    result = {'rows': len(df), 'sums': {}, 'counts': {}, 'nans': {}}
+    for i, col in enumerate(columns):
+        is_integer = pd.api.types.is_integer_dtype(df[col])
+        result['sums'][col] = int(round(sums[i])) if is_integer else float(sums[i])
+        result['nans'][col] = int(nans[i])
+        result['counts'][col] = len(df) - int(nans[i])
+    return result
+
+def compute_totals(df: pd.DataFrame, columns: list = None, version: str = None) -> dict:
+    """
+    Calcula, numa única passada vetorizada sobre a matriz das colunas, a soma, a quantidade de
+    valores válidos e a quantidade de NaN de cada coluna (MEASURABLE_COLUMNS por padrão; as
+    que não existirem em `df` são ignoradas).
+    Retorna {'rows', 'sums': {coluna: total}, 'counts': {...}, 'nans': {...}}. Somas de colunas
+    inteiras voltam como int.
+    Com `version` (token de get_dataset_version do DataFrame inteiro), o resultado é
+    memorizado; não informe a versão para fatias como a página atual, que herdam o token.
+    Com o motor DuckDB ativado (veja analytics_engine), os totais de DataFrames grandes são
+    calculados por ele, com o caminho em numpy como alternativa se a consulta falhar.
+    """
+    columns = [col for col in (columns if columns is not None else MEASURABLE_COLUMNS) if col in df.columns]
+    cache_key = (version, tuple(columns)) if version is not None else None
+    if cache_key is not None:
+        with _totals_lock:
+            cached = _totals_cache.get(cache_key)
+            if cached is not None:
+                _totals_cache.move_to_end(cache_key)
+                return cached
+
+    result = None
+    engine = get_analytics_engine(len(df))
+    if engine is not None and all(pd.api.types.is_numeric_dtype(df[col]) for col in columns):
+        try:
+            result = engine.totals(df, columns)
+        except Exception as e:
+            logger.warning("Motor analítico falhou ao calcular os totais, usando o numpy: %s", e)
+    if result is None:
+        result = _numpy_totals(df, columns)
+
+    if cache_key is not None:
+        with _totals_lock:
+            _totals_cache[cache_key] = result
+            while len(_totals_cache) > TOTALS_CACHE_SIZE:
+                _totals_cache.popitem(last=False)
+    return result
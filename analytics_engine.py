@@ -0,0 +1,141 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+from bpd_schema import get_dataset_version
+from utils import get_setting
+from instrumentation import logger
+
+try:
+    import duckdb
+    import pyarrow as pa
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    duckdb = None
+    pa = None
+    DUCKDB_AVAILABLE = False
+
+# Coluna com a posição de cada linha no DataFrame, acrescentada à relação registrada
+POSITION_COLUMN = '__pos'
+
+class AnalyticsEngine:
+    """
+    Motor analítico DuckDB em processo. Cada DataFrame carregado é convertido uma vez para
+    Arrow (as colunas numéricas e categóricas sem cópia) e registrado como relação, por token
+    de versão; filtros e somas viram SQL vetorizado e paralelo sobre essa relação.
+    Os filtros devolvem as posições das linhas, então o DataFrame resultante é montado com
+    `take` a partir do original e mantém exatamente os mesmos tipos do caminho em pandas.
+    """
+
+    def __init__(self, threads: int = None, max_relations: int = 8):
+        self._conn = duckdb.connect(':memory:')
+        if threads:
+            self._conn.execute(f"SET threads = {int(threads)}")
+        self.max_relations = max_relations
+        self._relations = OrderedDict()  # {(token de versão, colunas): nome da relação}
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def _relation(self, df: pd.DataFrame) -> str:
+        """Registra o DataFrame (uma vez por versão e colunas) e retorna o nome da relação. Chamar com o lock."""
+        version = get_dataset_version(df)
+        # load_data junta colunas às mesmas linhas sem trocar o token
+        key = (version, tuple(df.columns)) if version is not None else None
+        name = self._relations.get(key) if key is not None else None
+        if name is not None:
+            self._relations.move_to_end(key)
+            return name
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.append_column(POSITION_COLUMN, pa.array(np.arange(len(df), dtype=np.int64)))
+        self._counter += 1
+        name = f"bpd_{self._counter}"
+        self._conn.register(name, table)
+        if key is not None:
+            self._relations[key] = name
+            while len(self._relations) > self.max_relations:
+                _, evicted = self._relations.popitem(last=False)
+                self._conn.unregister(evicted)
+        return name
+
+    def _release(self, df: pd.DataFrame, name: str):
+        # Relações de DataFrames sem versão valem só para uma consulta
+        if get_dataset_version(df) is None:
+            self._conn.unregister(name)
+
+    def filter_positions(self, df: pd.DataFrame, selections: dict) -> np.ndarray:
+        """
+        Posições (ordenadas) das linhas que atendem aos filtros ({coluna: [valores]}),
+        ou None se nenhum filtro estiver ativo.
+        """
+        active = {col: [str(v) for v in values] for col, values in selections.items() if values and col in df.columns}
+        if not active:
+            return None
+        where = " AND ".join(f'list_contains(?, CAST("{col}" AS VARCHAR))' for col in active)
+        with self._lock:
+            name = self._relation(df)
+            try:
+                result = self._conn.execute(
+                    f'SELECT "{POSITION_COLUMN}" FROM {name} WHERE {where} ORDER BY "{POSITION_COLUMN}"',
+                    list(active.values())
+                ).fetchnumpy()
+            finally:
+                self._release(df, name)
+        return np.asarray(result[POSITION_COLUMN], dtype=np.int64)
+
+    def totals(self, df: pd.DataFrame, columns: list) -> dict:
+        """
+        Soma, quantidade de valores válidos e de ausentes de cada coluna, numa única consulta.
+        Mesmo formato de aggregation.compute_totals.
+        """
+        select = ["COUNT(*)"]
+        for col in columns:
+            select += [f'SUM(CAST("{col}" AS DOUBLE))', f'COUNT("{col}")']
+        with self._lock:
+            name = self._relation(df)
+            try:
+                row = self._conn.execute(f"SELECT {', '.join(select)} FROM {name}").fetchone()
+            finally:
+                self._release(df, name)
+
+        rows = int(row[0])
+        result = {'rows': rows, 'sums': {}, 'counts': {}, 'nans': {}}
+        for i, col in enumerate(columns):
+            total = row[1 + 2 * i] or 0.0
+            count = int(row[2 + 2 * i])
+            is_integer = pd.api.types.is_integer_dtype(df[col])
+            result['sums'][col] = int(round(total)) if is_integer else float(total)
+            result['counts'][col] = count
+            result['nans'][col] = rows - count
+        return result
+
+@st.cache_resource
+def _create_analytics_engine():
+    threads = get_setting("analytics", "threads")
+    return AnalyticsEngine(threads=int(threads) if threads else None)
+
+def get_analytics_engine(rows: int):
+    """
+    Retorna o motor DuckDB se ele estiver ativado ([analytics] engine = "duckdb" no
+    secrets.toml ou a variável de ambiente BPD_ANALYTICS_ENGINE=duckdb), o duckdb estiver instalado e o DataFrame tiver pelo menos
+    [analytics] min_rows linhas (100000 por padrão; abaixo disso o pandas é mais rápido que
+    registrar a relação). Caso contrário retorna None e o chamador usa o caminho em pandas.
+    O duckdb é opcional (requirements-optional.txt); se ele estiver configurado mas não puder
+    ser carregado, cada chamada registra um aviso e usa o pandas.
+    """
+    engine_name = os.environ.get("BPD_ANALYTICS_ENGINE") or get_setting("analytics", "engine", "pandas")
+    if str(engine_name).lower() != "duckdb":
+        return None
+    if not DUCKDB_AVAILABLE:
+        logger.warning("Motor analítico 'duckdb' configurado, mas o duckdb não está instalado. Usando o pandas.")
+        return None
+    if rows < int(get_setting("analytics", "min_rows", 100000)):
+        return None
+    try:
+        return _create_analytics_engine()
+    except Exception as e:
+        # Exceções não ficam no cache do st.cache_resource: a próxima chamada tenta de novo
+        logger.warning("Não foi possível iniciar o motor analítico 'duckdb': %s. Usando o pandas.", e)
+        return None
@@ -4,14 +4,17 @@ import os
 import pandas as pd
 
 __version__ = "1.0.0" # Versão inicial do aplicativo
-from database import load_data, get_db_connection, load_all_users, load_user_config, get_date_range
-from auth import generate_users, verify_login
-from datetime import datetime, timedelta
-from table_component import display_full_table
-from filter_component import display_filters
+from database import load_data, get_db_connection, load_all_users, get_date_range, load_metric_totals, load_column_totals, load_filter_options, FILTER_COLUMNS, METRIC_COLUMNS
+from auth import generate_users, login_lockout_remaining, verify_login
+from datetime import datetime
+from table_component import display_full_table, display_server_table, get_selected_table_columns
+from filter_component import display_filters, display_filter_controls, get_active_filter_values, reset_filters_on_change
 from metric_cards_component import display_metric_cards
 from config_page import display_config_page
-from utils import insert_google_analytics
+from utils import insert_google_analytics, get_setting, PERIOD_OPTIONS, period_dates
+from user_preferences import load_user_preferences, get_user_preference
+from instrumentation import display_timings_panel, log_enabled, logger, span, start_rerun
+from prefetch import cancel_prefetch, prefetch_periods, wait_for_period
 
 
 
@@ -48,19 +51,19 @@ def show_login_screen():
 
             if submitted:
                 with st.spinner("Verificando credenciais..."):
-                    users_df = load_all_users()
-                    if not users_df.empty:
-                        is_logged_in, user_role, user_name = verify_login(username, password, users_df)
-                        
-                        if is_logged_in:
-                            st.session_state['logged_in'] = True
-                            st.session_state['user_role'] = user_role
-                            st.session_state['username'] = user_name
-                            st.rerun() # Recarrega a página para mostrar o dashboard
-                        else:
-                            st.error("Usuário ou senha inválidos.")
+                    is_logged_in, user_role, user_name = verify_login(username, password)
+                    
+                    if is_logged_in:
+                        st.session_state['logged_in'] = True
+                        st.session_state['user_role'] = user_role
+                        st.session_state['username'] = user_name
+                        # Todas as preferências do usuário em uma consulta; depois, só leituras em memória
+                        load_user_preferences(user_name)
+                        st.rerun() # Recarrega a página para mostrar o dashboard
+                    elif (lockout_seconds := login_lockout_remaining(username)) > 0:
+                        st.error(f"Muitas tentativas recusadas. Tente novamente em {max(1, round(lockout_seconds / 60))} minuto(s).")
                     else:
-                        st.error("Não foi possível carregar os dados para verificação. Verifique a conexão com o banco.")
+                        st.error("Usuário ou senha inválidos.")
     
     with col_instructions:
         st.markdown("### 📋 Instruções de Login")
@@ -249,10 +252,10 @@ def show_main_dashboard():
         
     with col2:
         # 1. SETUP: Define as opções e obtém a seleção do estado da sessão
-        date_options = ("Semana Atual", "Hoje", "Última semana", "Últimos 30 dias", "Mostrar tudo")
+        date_options = PERIOD_OPTIONS
         if 'date_range_option_index' not in st.session_state:
-            # Carrega o período padrão salvo do banco de dados
-            saved_period_index = load_user_config(st.session_state['username'], 'default_period_index', '2')
+            # Carrega o período padrão salvo (da memória, carregada no login)
+            saved_period_index = get_user_preference(st.session_state['username'], 'default_period_index', '2')
             try:
                 default_period = int(saved_period_index)
             except (ValueError, TypeError):
@@ -284,37 +287,11 @@ def show_main_dashboard():
         _, max_date_db = get_date_range()
         reference_date = max_date_db if max_date_db else today
         
-        start_date, end_date = None, None
-
-        if date_range_option == "Semana Atual":
-            start_date = reference_date - timedelta(days=reference_date.weekday())
-            end_date = reference_date
-        elif date_range_option == "Hoje":
-            # Para "Hoje", sempre usar a data atual do sistema, não a data máxima do banco
-            start_date = today
-            end_date = today
-        elif date_range_option == "Última semana":
-            end_of_last_week = reference_date - timedelta(days=reference_date.weekday() + 1)
-            start_date = end_of_last_week - timedelta(days=6)
-            end_date = end_of_last_week
-        elif date_range_option == "Últimos 30 dias":
-            start_date = reference_date - timedelta(days=29)
-            end_date = reference_date
-        elif date_range_option == "Mostrar tudo":
-            start_date = None
-            end_date = None
-
-        # Diagnóstico detalhado das datas
-        print(f"\n=== DIAGNÓSTICO DETALHADO DE DATAS ===")
-        print(f"Opção selecionada: {date_range_option}")
-        print(f"Data de hoje (sistema): {today}")
-        print(f"Data máxima no banco: {max_date_db}")
-        print(f"Data de referência usada: {reference_date}")
-        print(f"Data de início calculada: {start_date}")
-        print(f"Data de fim calculada: {end_date}")
-        print(f"Tipo de start_date: {type(start_date)}")
-        print(f"Tipo de end_date: {type(end_date)}")
-        print("=====================================\n")
+        start_date, end_date = period_dates(date_range_option, reference_date, today)
+
+        # Diagnóstico das datas (só com [instrumentation] log_level = "DEBUG")
+        logger.debug("Período '%s': hoje=%s, máxima no banco=%s, referência=%s, início=%s, fim=%s",
+                     date_range_option, today, max_date_db, reference_date, start_date, end_date)
 
         st.session_state['start_date'] = start_date
         st.session_state['end_date'] = end_date
@@ -330,6 +307,7 @@ def show_main_dashboard():
     with col3:
         # st.write(f"Bem-vindo, {st.session_state['username']}!")
         if st.button("Logout"):
+            cancel_prefetch(st.session_state['username'], st.session_state['user_role'])
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
             st.rerun()
@@ -398,36 +376,93 @@ def show_main_dashboard():
     # --- Conteúdo principal conforme seleção ---
     if selected_option == "Dashboard":
         with st.spinner("Carregando informações do banco de dados..."):
-            df_full = load_data(st.session_state['username'], st.session_state['user_role'], st.session_state['start_date'], st.session_state['end_date'])
-
-            # Diagnóstico: prints no console
-            print("\n=== DIAGNÓSTICO DASHBOARD ===")
-            print(f"Usuário logado: {st.session_state['username']}")
-            print(f"Papel: {st.session_state['user_role']}")
-            print(f"Período: {st.session_state['start_date']} até {st.session_state['end_date']}")
-            print(f"Linhas carregadas do banco: {len(df_full)}")
-            print(f"Colunas: {list(df_full.columns)}")
-            print("Primeiras linhas:")
-            print(df_full.head())
-            print("============================\n")
-
-            # Aplicar filtros avançados primeiro
-            with st.expander("Filtros Avançados", expanded=False):
-                df_filtered_by_controls = display_filters(df_full)
-            
-            # Diagnóstico dos dados antes da exibição
-            print(f"\n=== DIAGNÓSTICO ANTES DA EXIBIÇÃO ===")
-            print(f"Dados após filtros avançados: {len(df_filtered_by_controls)} linhas")
-            if not df_filtered_by_controls.empty:
-                print("Primeiras 3 linhas dos dados filtrados:")
-                print(df_filtered_by_controls[['dia', 'playerName', 'reference']].head(3))
-            print("=====================================\n")
-            
-            # Exibir métricas com base nos dados filtrados
-            display_metric_cards(df_filtered_by_controls, st.session_state['selected_currencies'])
+            # Reserva os espaços na ordem de exibição: filtros, métricas e tabela
+            filters_container = st.container()
+            metrics_container = st.container()
+
+            username = st.session_state['username']
+            user_role = st.session_state['user_role']
+            start_date = st.session_state['start_date']
+            end_date = st.session_state['end_date']
+
+            # Modo da tabela ([dashboard] table_mode): "memory" carrega o período inteiro,
+            # "server" lê só a página atual do MySQL e "auto" escolhe pelo tamanho do período
+            table_mode = get_setting("dashboard", "table_mode", "memory")
+            if table_mode == "auto":
+                scope_totals = load_column_totals(username, user_role, start_date, end_date)
+                min_rows = int(get_setting("dashboard", "server_table_min_rows", 200000))
+                table_mode = "server" if scope_totals is not None and scope_totals['rows'] >= min_rows else "memory"
+
+            if table_mode == "server":
+                # Filtros, cards e tabela consultam o banco; nenhuma linha do período é carregada inteira
+                filter_options = load_filter_options(username, user_role, start_date, end_date) or {}
+                with filters_container, span('filter'):
+                    with st.expander("Filtros Avançados", expanded=False):
+                        display_filter_controls(filter_options, (username, user_role, str(start_date), str(end_date)))
+                active_filters = get_active_filter_values()
+                with span('metrics'):
+                    metric_totals = load_metric_totals(username, user_role, start_date, end_date, active_filters)
+                    if metric_totals is not None:
+                        with metrics_container:
+                            display_metric_cards(None, st.session_state['selected_currencies'], totals=metric_totals)
+                with span('table', mode='server'):
+                    display_server_table(username, user_role, start_date, end_date, active_filters)
+                return
+
+            # No modo "sql" os cards são somados no banco e aparecem antes da carga das linhas.
+            # Os filtros são limpos pela troca de período antes da soma, não só ao serem desenhados
+            metric_totals = None
+            filter_data_key = None
+            if get_setting("dashboard", "metrics_mode", "memory") == "sql":
+                filter_data_key = (username, user_role, str(start_date), str(end_date))
+                reset_filters_on_change(filter_data_key)
+                with span('metrics'):
+                    metric_totals = load_metric_totals(st.session_state['username'], st.session_state['user_role'], st.session_state['start_date'], st.session_state['end_date'], get_active_filter_values())
+                    if metric_totals is not None:
+                        with metrics_container:
+                            display_metric_cards(None, st.session_state['selected_currencies'], totals=metric_totals)
+
+            # Mostra o andamento da leitura em lotes enquanto o spinner está ativo
+            progress_placeholder = st.empty()
+            def show_load_progress(rows_loaded):
+                progress_placeholder.caption(f"Carregando dados... {rows_loaded:,} linhas recebidas".replace(",", "."))
+
+            # Só as colunas usadas pela tabela, pelos filtros e pelos cards são carregadas
+            required_columns = set(get_selected_table_columns()) | set(FILTER_COLUMNS)
+            if metric_totals is None:
+                required_columns |= set(METRIC_COLUMNS)
+
+            # Se o período já estiver sendo pré-carregado, espera em vez de repetir a consulta
+            wait_for_period(username, user_role, start_date, end_date)
+            df_full = load_data(st.session_state['username'], st.session_state['user_role'], st.session_state['start_date'], st.session_state['end_date'], progress_callback=show_load_progress, columns=required_columns)
+            progress_placeholder.empty()
+
+            # Diagnóstico no log; o df.head() só é montado com o log em DEBUG
+            if log_enabled():
+                logger.debug("Dashboard de %s (%s), período %s até %s: %d linhas, colunas %s\n%s",
+                             username, user_role, start_date, end_date, len(df_full), list(df_full.columns), df_full.head())
+
+            # Aplicar filtros avançados primeiro. Para administradores as opções vêm das
+            # dimensões em cache; jogadores usam os valores das próprias linhas
+            filter_options = None
+            if user_role != 'Jogador':
+                filter_options = load_filter_options(username, user_role, start_date, end_date)
+            with filters_container, span('filter') as filter_span:
+                with st.expander("Filtros Avançados", expanded=False):
+                    df_filtered_by_controls = display_filters(df_full, filter_options, filter_data_key)
+                filter_span.set(rows=len(df_filtered_by_controls))
+
+            # Exibir métricas com base nos dados filtrados (em memória, se não vieram do banco)
+            if metric_totals is None:
+                with metrics_container:
+                    display_metric_cards(df_filtered_by_controls, st.session_state['selected_currencies'])
 
             # Exibir tabela com dados filtrados
-            display_full_table(df_filtered_by_controls, st.session_state['user_role'])
+            with span('table', mode='memory'):
+                display_full_table(df_filtered_by_controls, st.session_state['user_role'])
+
+            # Com a tela pronta, carrega em segundo plano os outros períodos mais usados
+            prefetch_periods(username, user_role, date_range_option, reference_date, today, required_columns)
     elif selected_option == "Usuários":
         display_users_page()
     elif selected_option == "Configurações":
@@ -441,8 +476,14 @@ if 'logged_in' not in st.session_state:
 if 'selected_currencies' not in st.session_state:
     st.session_state['selected_currencies'] = ["Real (R$)"] # Padrão inicial
 
+# Tempos da execução: medidos para administradores, que podem abri-los no fim da página
+is_admin = st.session_state['logged_in'] and st.session_state.get('user_role') == 'Admin'
+rerun_timings = start_rerun(is_admin or bool(get_setting("instrumentation", "enabled", False)))
+
 # Decide qual tela mostrar
 if st.session_state['logged_in']:
     show_main_dashboard()
+    if is_admin:
+        display_timings_panel(rerun_timings)
 else:
     show_login_screen()
@@ -1,5 +1,16 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
 import pandas as pd
-from database import load_all_users
+import streamlit as st
+from database import load_all_users, get_user_credentials, update_user_password, password_column_fits_hash
+from passwords import check_password, hash_password
+from utils import get_setting
+from instrumentation import logger
+
+# Mapeia user_type para role (admin -> Admin, player -> Jogador)
+USER_ROLES = {'admin': 'Admin', 'player': 'Jogador'}
 
 def generate_users(player_names, agent_names):
     """
@@ -16,14 +27,131 @@ def generate_users(player_names, agent_names):
     
     return users_df
 
-def verify_login(username, password, users_df):
+class LoginThrottle:
     """
-    Verifica as credenciais do usuário no DataFrame de usuários.
-    Retorna True se as credenciais forem válidas, False caso contrário, e o papel do usuário.
+    Limita as tentativas de login recusadas por usuário e por cliente (endereço IP). Depois de
+    `max_failures` recusas dentro de `window` segundos, a chave fica bloqueada por `lockout`
+    segundos, tempo que dobra a cada nova recusa até `max_lockout`. Durante o bloqueio as
+    tentativas são recusadas sem consultar o banco nem calcular o hash.
     """
-    user_found = users_df[(users_df['username'] == username) & (users_df['password'] == password)]
-    if not user_found.empty:
-        user_role = user_found['role'].iloc[0]
-        user_name = user_found['username'].iloc[0]
-        return True, user_role, user_name
-    return False, None, None
\ No newline at end of file
+
+    def __init__(self, max_failures: int = 5, max_client_failures: int = 20, window: float = 900.0,
+                 lockout: float = 60.0, max_lockout: float = 3600.0, max_entries: int = 10000):
+        self.max_failures = max_failures
+        self.max_client_failures = max_client_failures
+        self.window = window
+        self.lockout = lockout
+        self.max_lockout = max_lockout
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # {('user' | 'client', valor): {'failures', 'first_at', 'locked_until'}}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def keys(username: str, client: str = None) -> list:
+        keys = [('user', username)]
+        if client:
+            keys.append(('client', client))
+        return keys
+
+    def _limit(self, key) -> int:
+        return self.max_failures if key[0] == 'user' else self.max_client_failures
+
+    def locked_for(self, keys: list) -> float:
+        """Segundos restantes de bloqueio da chave mais restrita (0 se nenhuma estiver bloqueada)."""
+        now = time.monotonic()
+        with self._lock:
+            remaining = [self._entries[key]['locked_until'] - now for key in keys if key in self._entries]
+        return max([0.0] + remaining)
+
+    def add_failure(self, keys: list):
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or now - entry['first_at'] > self.window:
+                    entry = {'failures': 0, 'first_at': now, 'locked_until': 0.0}
+                entry['failures'] += 1
+                excess = entry['failures'] - self._limit(key)
+                if excess >= 0:
+                    entry['locked_until'] = now + min(self.lockout * 2 ** min(excess, 16), self.max_lockout)
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, username: str):
+        """Descarta as recusas do usuário (depois de um login correto ou de uma troca de senha)."""
+        with self._lock:
+            self._entries.pop(('user', username), None)
+
+@st.cache_resource
+def get_login_throttle():
+    """
+    Limitador de tentativas de login do processo. Os limites podem ser ajustados na seção [auth]
+    do secrets.toml: max_failures (por usuário), max_client_failures (por endereço IP),
+    failure_window, lockout_seconds e max_lockout_seconds.
+    """
+    return LoginThrottle(
+        max_failures=int(get_setting("auth", "max_failures", 5)),
+        max_client_failures=int(get_setting("auth", "max_client_failures", 20)),
+        window=float(get_setting("auth", "failure_window", 900)),
+        lockout=float(get_setting("auth", "lockout_seconds", 60)),
+        max_lockout=float(get_setting("auth", "max_lockout_seconds", 3600)),
+    )
+
+def _client_address():
+    # Endereço do navegador da sessão atual (None fora de uma sessão ou atrás de proxies que o ocultam)
+    try:
+        return st.context.ip_address
+    except Exception:
+        return None
+
+def login_lockout_remaining(username: str) -> float:
+    """Segundos que faltam para o usuário (ou o cliente atual) poder tentar de novo."""
+    return get_login_throttle().locked_for(LoginThrottle.keys(username, _client_address()))
+
+_dummy_password_hash = None
+
+def _dummy_hash():
+    # Hash usado quando o usuário não existe, para que a resposta leve o mesmo tempo
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = hash_password(secrets.token_urlsafe(16))
+    return _dummy_password_hash
+
+def verify_login(username, password):
+    """
+    Verifica as credenciais buscando apenas o usuário informado (consulta pelo username indexado)
+    e comparando a senha com o hash PBKDF2 guardado. Senhas antigas em texto puro são aceitas e
+    convertidas para hash no primeiro login, se a coluna users.password já comportar o hash.
+    Tentativas recusadas são contadas por usuário e por cliente (veja LoginThrottle).
+    Retorna (True/False, papel do usuário, nome do usuário).
+    """
+    if not username or not password:
+        return False, None, None
+    throttle = get_login_throttle()
+    keys = LoginThrottle.keys(username, _client_address())
+    if throttle.locked_for(keys) > 0:
+        return False, None, None
+
+    user, error = get_user_credentials(username)
+    if error:
+        return False, None, None
+
+    if user is None:
+        check_password(password, _dummy_hash())
+        throttle.add_failure(keys)
+        return False, None, None
+
+    matches, needs_upgrade = check_password(password, user['password'])
+    if not matches:
+        throttle.add_failure(keys)
+        return False, None, None
+
+    throttle.forget(username)
+    if needs_upgrade:
+        if password_column_fits_hash():
+            update_user_password(user['username'], password)
+        else:
+            logger.warning("Senha de %s mantida sem hash: a coluna users.password é pequena demais (execute update_users_table.py)", user['username'])
+    return True, USER_ROLES.get(user['user_type']), user['username']
@@ -0,0 +1,67 @@
+"""
+Compara o filtro antigo de display_filters (cópia do DataFrame + uma máscara isin e uma cópia
+por filtro) com o índice do filter_engine, sobre os dados sintéticos de synthetic_bpd (os
+mesmos dos benchmarks de carga).
+
+Uso: python benchmarks/bench_filter_engine.py [tamanho: 10k, 1m, 10m ou número de linhas]
+"""
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic_bpd import BpdGenerator, parse_size
+from filter_engine import FilterIndex, apply_filters, get_filter_index
+
+def legacy_filter(df_original: pd.DataFrame, selections: dict) -> pd.DataFrame:
+    # Cadeia usada antes em display_filters
+    df_filtered = df_original.copy()
+    for column in ['playerName', 'reference', 'club', 'agentName']:
+        values = selections.get(column)
+        if values:
+            mask = df_filtered[column].isin(values)
+            df_filtered = df_filtered[mask].copy()
+    return df_filtered
+
+def timed(func, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    rows = parse_size(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    # Tipado e com token de versão como o de load_data, para o índice ser reaproveitado
+    df = BpdGenerator(rows).frame()
+    clubs = list(df['club'].cat.categories)
+    agents = list(df['agentName'].cat.categories)
+    scenarios = {
+        'sem filtros': {},
+        '1 clube': {'club': clubs[3:4]},
+        '10 jogadores': {'playerName': list(df['playerName'].cat.categories[:10])},
+        'clube + agente': {'club': [clubs[3], clubs[7]], 'agentName': agents[1:4]},
+        '4 filtros': {
+            'playerName': list(df['playerName'].cat.categories[:200]),
+            'club': list(df['club'].cat.categories[:20]),
+            'reference': list(df['reference'].cat.categories[:250]),
+            'agentName': list(df['agentName'].cat.categories[:100]),
+        },
+    }
+
+    build_seconds = timed(lambda: FilterIndex(df), repeat=1)
+    get_filter_index(df)
+    print(f"{rows:,} linhas | construção do índice: {build_seconds * 1000:.1f} ms")
+    print(f"{'cenário':<16}{'linhas':>10}{'antigo (ms)':>14}{'índice (ms)':>14}{'ganho':>8}")
+    for name, selections in scenarios.items():
+        expected = legacy_filter(df, selections)
+        result = apply_filters(df, selections)
+        assert expected['linha_id'].tolist() == result['linha_id'].tolist(), name
+        legacy_seconds = timed(lambda: legacy_filter(df, selections))
+        index_seconds = timed(lambda: apply_filters(df, selections))
+        print(f"{name:<16}{len(result):>10,}{legacy_seconds * 1000:>14.1f}{index_seconds * 1000:>14.1f}{legacy_seconds / max(index_seconds, 1e-9):>7.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Suíte de benchmarks do caminho quente do dashboard, sobre dados sintéticos com o formato da
+tabela bpd (veja synthetic_bpd.py).
+
+Mede, para cada tamanho:
+- load_data (frio, com o cache vazio, e quente), como admin e como o jogador com mais linhas;
+- os filtros avançados de display_filters (opções dos seletores e apply_filters);
+- os totais dos cards de métricas (em memória e, com banco, load_metric_totals);
+- a exportação da tabela (CSV e XLSX, pelos gravadores do exporter).
+
+Sem --db, os dados são gerados direto em memória e só os passos que não dependem do banco
+são medidos. Com --db, os dados são carregados numa base MySQL local, configurada pelas
+variáveis de ambiente BPD_MYSQL_HOST, BPD_MYSQL_PORT, BPD_MYSQL_USER, BPD_MYSQL_PASSWORD e
+BPD_MYSQL_DATABASE (use sempre um banco próprio para os benchmarks), ou, com
+BPD_STORAGE_BACKEND=sqlite, num arquivo SQLite (BPD_SQLITE_PATH).
+
+Uso:
+    python benchmarks/run_benchmarks.py --sizes 10k,1m [--db] [--output resultado.json]
+
+Os resultados são gravados em JSON, com o ambiente da execução, para comparar rodadas.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+from synthetic_bpd import BpdGenerator, load_into_database, loaded_dataset, parse_size
+from aggregation import compute_totals
+from bpd_schema import make_dataset_version
+from database import METRIC_COLUMNS
+from exporter import build_totals_row, iter_frame_chunks, write_csv, write_xlsx
+from filter_component import FILTER_STATE
+from filter_engine import FilterIndex, apply_filters
+
+# Colunas padrão da tabela, usadas na exportação
+EXPORT_COLUMNS = ['dia', 'reference', 'club', 'playerName', 'agentName', 'localWins', 'localFee', 'hands']
+
+# O XLSX tem limite de 1.048.576 linhas por planilha
+XLSX_MAX_ROWS = 1_048_575
+
+class Recorder:
+    """Executa e guarda as medições de uma rodada."""
+
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results = []
+
+    def measure(self, size: str, name: str, func, repeat: int = None, **details):
+        """Executa `func` `repeat` vezes e registra o melhor tempo e a mediana. Retorna o último resultado."""
+        timings = []
+        result = None
+        for _ in range(repeat or self.repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        record = {
+            'size': size,
+            'benchmark': name,
+            'best_seconds': min(timings),
+            'median_seconds': float(np.median(timings)),
+            'runs': len(timings),
+            **details,
+        }
+        self.results.append(record)
+        print(f"  {name:<34}{record['best_seconds'] * 1000:>12.1f} ms  {details or ''}")
+        return result
+
+    def skip(self, size: str, name: str, reason: str):
+        self.results.append({'size': size, 'benchmark': name, 'skipped': reason})
+        print(f"  {name:<34}{'pulado':>15}  ({reason})")
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=BENCHMARKS_DIR, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def environment() -> dict:
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def filter_scenarios(generator: BpdGenerator, df: pd.DataFrame) -> dict:
+    heaviest_club = str(df['club'].value_counts().index[0])
+    players = list(df['playerName'].cat.categories)
+    return {
+        'jogador mais ativo': {'playerName': [generator.heaviest_player()]},
+        'clube mais ativo': {'club': [heaviest_club]},
+        '50 jogadores da cauda': {'playerName': players[-50:]},
+        'clube + 3 agentes': {'club': [heaviest_club], 'agentName': list(df['agentName'].cat.categories[:3])},
+    }
+
+def bench_filters(recorder: Recorder, size: str, generator: BpdGenerator, df: pd.DataFrame):
+    # Opções dos seletores como display_filters monta sem as dimensões (papel Jogador)
+    recorder.measure(size, 'filters.options', lambda: {
+        column: sorted(df[column].dropna().unique().tolist()) for _, column, _ in FILTER_STATE
+    })
+    recorder.measure(size, 'filters.index_build', lambda: FilterIndex(df), repeat=1)
+    for name, selections in filter_scenarios(generator, df).items():
+        filtered = recorder.measure(size, f'filters.apply[{name}]', lambda: apply_filters(df, selections))
+        recorder.results[-1]['rows_out'] = len(filtered)
+
+def bench_metrics(recorder: Recorder, size: str, df: pd.DataFrame):
+    # Sem versão o kernel sempre recalcula; com versão, a segunda chamada vem do cache
+    recorder.measure(size, 'metrics.compute_totals', lambda: compute_totals(df, METRIC_COLUMNS))
+    version = make_dataset_version('benchmark-metrics', size, time.time())
+    compute_totals(df, METRIC_COLUMNS, version=version)
+    recorder.measure(size, 'metrics.compute_totals_cached', lambda: compute_totals(df, METRIC_COLUMNS, version=version))
+
+def bench_export(recorder: Recorder, size: str, df: pd.DataFrame, skip_xlsx: bool):
+    columns = [col for col in EXPORT_COLUMNS if col in df.columns]
+    totals_row = build_totals_row(columns, compute_totals(df, columns)['sums'])
+
+    def export(writer):
+        with tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024) as output:
+            writer(iter_frame_chunks(df), columns, output, totals_row)
+            output.seek(0, os.SEEK_END)
+            return output.tell()
+
+    file_size = recorder.measure(size, 'export.csv', lambda: export(write_csv), repeat=1)
+    recorder.results[-1]['bytes'] = file_size
+    if skip_xlsx:
+        recorder.skip(size, 'export.xlsx', 'desativado por --skip-xlsx')
+    elif len(df) > XLSX_MAX_ROWS:
+        recorder.skip(size, 'export.xlsx', 'acima do limite de linhas do XLSX')
+    else:
+        file_size = recorder.measure(size, 'export.xlsx', lambda: export(write_xlsx), repeat=1)
+        recorder.results[-1]['bytes'] = file_size
+
+def bench_database(recorder: Recorder, size: str, generator: BpdGenerator, reload: bool):
+    """Carrega os dados no banco local (se preciso) e mede load_data e load_metric_totals."""
+    from database import get_connection_pool, get_result_cache, load_data, load_metric_totals
+
+    pool = get_connection_pool()
+    conn = pool.checkout()
+    try:
+        if reload or loaded_dataset(conn) != (generator.rows, generator.seed, generator.days):
+            recorder.measure(size, 'db.insert', lambda: load_into_database(conn, generator), repeat=1)
+    finally:
+        conn.close()
+
+    cache = get_result_cache()
+    heaviest = generator.heaviest_player()
+
+    def cold(func):
+        cache.clear()
+        return func()
+
+    df = recorder.measure(size, 'load_data.admin_cold', lambda: cold(lambda: load_data('benchmark', 'Admin')))
+    recorder.results[-1]['rows_out'] = len(df)
+    recorder.measure(size, 'load_data.admin_warm', lambda: load_data('benchmark', 'Admin'))
+    recorder.measure(size, 'load_data.admin_projected_cold', lambda: cold(lambda: load_data('benchmark', 'Admin', columns=EXPORT_COLUMNS)))
+    player_df = recorder.measure(size, 'load_data.player_cold', lambda: cold(lambda: load_data(heaviest, 'Jogador')))
+    recorder.results[-1]['rows_out'] = len(player_df)
+    recorder.measure(size, 'metrics.load_metric_totals', lambda: cold(lambda: load_metric_totals('benchmark', 'Admin')))
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10k,1m', help="Tamanhos separados por vírgula: 10k, 1m, 10m ou um número de linhas")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=3, help="Execuções de cada medição (o melhor tempo é o principal)")
+    parser.add_argument('--db', action='store_true', help="Carrega os dados no banco local (MySQL pelas variáveis BPD_MYSQL_* ou SQLite) e mede load_data")
+    parser.add_argument('--reload', action='store_true', help="Recarrega o banco mesmo que ele já tenha os dados do tamanho e da semente")
+    parser.add_argument('--skip-xlsx', action='store_true', help="Não mede a exportação XLSX (a mais lenta)")
+    parser.add_argument('--output', default=None, help="Arquivo JSON dos resultados (padrão: benchmarks/results/<data>.json)")
+    args = parser.parse_args()
+
+    sqlite = os.environ.get('BPD_STORAGE_BACKEND', '').lower() == 'sqlite'
+    if args.db and not (sqlite or os.environ.get('BPD_MYSQL_DATABASE')):
+        parser.error("--db exige BPD_MYSQL_DATABASE (e as demais BPD_MYSQL_*) apontando para um banco local de benchmark, ou BPD_STORAGE_BACKEND=sqlite")
+
+    recorder = Recorder(args.repeat)
+    run = {'environment': environment(), 'parameters': vars(args), 'results': recorder.results}
+
+    for size in args.sizes.split(','):
+        rows = parse_size(size)
+        generator = BpdGenerator(rows, seed=args.seed, days=args.days)
+        print(f"\n{size} ({rows:,} linhas)")
+        if args.db:
+            df = bench_database(recorder, size, generator, args.reload)
+        else:
+            df = recorder.measure(size, 'generate_in_memory', lambda: generator.frame(), repeat=1)
+        recorder.results.append({'size': size, 'benchmark': 'dataset', 'rows': len(df),
+                                 'memory_bytes': int(df.memory_usage(deep=True).sum())})
+        bench_filters(recorder, size, generator, df)
+        bench_metrics(recorder, size, df)
+        bench_export(recorder, size, df, args.skip_xlsx)
+        del df
+
+    output = args.output or os.path.join(BENCHMARKS_DIR, 'results', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2, ensure_ascii=False, default=str)
+    print(f"\nResultados gravados em {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Gerador determinístico de dados com o formato da tabela bpd, para os benchmarks.
+
+Os dados imitam a distribuição real: poucos jogadores e clubes concentram a maior parte das
+linhas (distribuição de Zipf) e o resto forma uma cauda longa. Cada jogador tem agente, clube,
+superagente e moeda fixos, e as linhas vêm em ordem de dia, como a carga diária da tabela.
+A mesma semente e a mesma quantidade de linhas geram sempre os mesmos dados, fatia por fatia.
+"""
+import os
+import sys
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bpd_schema import BPD_COLUMNS, BPD_SCHEMA, apply_bpd_schema, concat_typed, make_dataset_version
+
+# Tamanhos nomeados aceitos pelos benchmarks
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+START_DATE = date(2024, 1, 1)
+
+def parse_size(value: str) -> int:
+    """Converte '10k', '1m', '10m' (ou um número) na quantidade de linhas."""
+    value = str(value).strip().lower().replace('_', '')
+    if value in SIZES:
+        return SIZES[value]
+    for suffix, factor in (('k', 1_000), ('m', 1_000_000)):
+        if value.endswith(suffix):
+            return int(float(value[:-1]) * factor)
+    return int(value)
+
+class BpdGenerator:
+    """
+    Gera `rows` linhas em `days` dias a partir de START_DATE. As entidades (jogadores, agentes,
+    clubes) são sorteadas uma vez a partir da semente; as linhas de cada fatia usam uma semente
+    derivada da posição da fatia, então qualquer fatia pode ser gerada de forma independente.
+    """
+
+    def __init__(self, rows: int, seed: int = 42, days: int = 365):
+        self.rows = rows
+        self.seed = seed
+        self.days = days
+        rng = np.random.default_rng(seed)
+
+        n_players = max(rows // 200, 50)
+        n_agents = max(n_players // 25, 10)
+        n_superagents = max(n_agents // 10, 3)
+        n_clubs = 60
+
+        self.players = np.array([f"player_{i:06d}" for i in range(n_players)])
+        self.player_ids = rng.permutation(np.arange(100_000, 100_000 + n_players))
+        # Popularidade dos jogadores: pesos de Zipf, com os mais ativos espalhados pela lista
+        self.player_weights = self._zipf_weights(n_players, 1.1, rng)
+
+        self.agents = np.array([f"agent_{i:04d}" for i in range(n_agents)])
+        self.superagents = np.array([f"superagent_{i:03d}" for i in range(n_superagents)])
+        self.clubs = np.array([f"club_{i:02d}" for i in range(n_clubs)])
+        self.references = np.array([f"REF{i:04d}" for i in range(300)])
+        self.shares = np.array(['40%', '50%', '60%', '70%'])
+
+        self.player_agent = rng.integers(0, n_agents, n_players)
+        self.agent_superagent = rng.integers(0, n_superagents, n_agents)
+        self.player_club = rng.choice(n_clubs, n_players, p=self._zipf_weights(n_clubs, 1.3, rng))
+        self.player_moeda = np.where(rng.random(n_players) < 0.7, 'BRL', 'USD')
+        self.player_reference = rng.integers(0, len(self.references), n_players)
+
+    @staticmethod
+    def _zipf_weights(n: int, exponent: float, rng) -> np.ndarray:
+        weights = 1.0 / np.arange(1, n + 1) ** exponent
+        weights = weights[rng.permutation(n)]
+        return weights / weights.sum()
+
+    def heaviest_player(self) -> str:
+        """Jogador com mais linhas (o pior caso dos filtros e do papel Jogador)."""
+        return str(self.players[int(np.argmax(self.player_weights))])
+
+    def chunk(self, start: int, stop: int) -> pd.DataFrame:
+        """Linhas de posição [start, stop), com os valores brutos como viriam do MySQL ('dia' em texto)."""
+        rng = np.random.default_rng([self.seed, start])
+        n = stop - start
+        positions = np.arange(start, stop)
+
+        player = rng.choice(len(self.players), n, p=self.player_weights)
+        agent = self.player_agent[player]
+        superagent = self.agent_superagent[agent]
+        day_offsets = positions * self.days // self.rows
+        days = np.array([(START_DATE + timedelta(days=int(d))).isoformat() for d in range(self.days)])
+
+        hands = rng.poisson(40, n)
+        local_fee = np.round(rng.lognormal(1.5, 1.0, n), 2)
+        local_wins = np.round(rng.standard_t(3, n) * 50, 2)
+        is_usd = self.player_moeda[player] == 'USD'
+        to_real = np.where(is_usd, 5.0, 1.0)
+        to_dolar = np.where(is_usd, 1.0, 0.2)
+        rakeback_rate = 0.3 + (player % 5) * 0.05
+
+        return pd.DataFrame({
+            'linha_id': positions + 1,
+            'dia': days[day_offsets],
+            'reference': self.references[self.player_reference[player]],
+            'share': self.shares[agent % len(self.shares)],
+            'moeda': self.player_moeda[player],
+            'upline': self.superagents[superagent],
+            'club': self.clubs[self.player_club[player]],
+            'playerID': self.player_ids[player],
+            'playerName': self.players[player],
+            'agentName': self.agents[agent],
+            'agentId': 5_000 + agent,
+            'superAgentName': self.superagents[superagent],
+            'superagentId': 900 + superagent,
+            'localWins': local_wins,
+            'localFee': local_fee,
+            'hands': hands,
+            'dolarWins': np.round(local_wins * to_dolar, 2),
+            'dolarFee': np.round(local_fee * to_dolar, 2),
+            'dolarRakeback': np.round(local_fee * to_dolar * rakeback_rate, 2),
+            'dolarRebate': np.round(local_fee * to_dolar * 0.05, 2),
+            'realWins': np.round(local_wins * to_real, 2),
+            'realFee': np.round(local_fee * to_real, 2),
+            'realRakeback': np.round(local_fee * to_real * rakeback_rate, 2),
+            'realRebate': np.round(local_fee * to_real * 0.05, 2),
+            'realAgentSett': np.round(-local_wins * to_real * 0.5, 2),
+            'dolarAgentSett': np.round(-local_wins * to_dolar * 0.5, 2),
+            'realRevShare': np.round(local_fee * to_real * 0.1, 2),
+            'realBPFProfit': np.round(local_fee * to_real * (1 - rakeback_rate) * 0.4, 2),
+            'deal': rakeback_rate,
+            'rebate': 0.05,
+        }, columns=BPD_COLUMNS)
+
+    def chunks(self, chunk_rows: int = 100_000):
+        """Percorre todas as linhas em fatias de `chunk_rows`."""
+        for start in range(0, self.rows, chunk_rows):
+            yield self.chunk(start, min(start + chunk_rows, self.rows))
+
+    def frame(self, chunk_rows: int = 500_000) -> pd.DataFrame:
+        """
+        Todas as linhas já no schema tipado de load_data, com um token de versão, sem passar
+        pelo banco.
+        """
+        df = concat_typed([apply_bpd_schema(chunk) for chunk in self.chunks(chunk_rows)])
+        df.attrs['dataset_version'] = make_dataset_version('synthetic', self.rows, self.seed, self.days)
+        return df
+
+# Tabela que marca o banco como banco de benchmark
+BENCHMARK_MARKER_TABLE = 'benchmark_meta'
+
+# Tabelas mantidas a partir da bpd (etl_state, dimensões e rollup), esvaziadas a cada carga
+DERIVED_TABLES = ['etl_state', 'bpd_daily_rollup', 'bpd_rollup_days', 'dim_player', 'dim_agent', 'dim_superagent', 'dim_club', 'dim_reference']
+
+def _mysql_type(kind: str) -> str:
+    return {'integer': 'BIGINT', 'date': 'DATE', 'category': 'VARCHAR(64)', 'numeric': 'DOUBLE'}[kind]
+
+# DDL da tabela bpd no banco local dos benchmarks (MySQL ou SQLite), com os índices de migrate_bpd_indexes.py
+BPD_BENCHMARK_DDL = (
+    "CREATE TABLE bpd (linha_id BIGINT AUTO_INCREMENT PRIMARY KEY, "
+    + ", ".join(f"`{col}` {_mysql_type(kind)} NULL" for col, kind in BPD_SCHEMA.items() if col != 'linha_id')
+    + ", INDEX idx_bpd_dia (dia), INDEX idx_bpd_dia_linha (dia, linha_id), INDEX idx_bpd_player_dia (playerName, dia), INDEX idx_bpd_agent_dia (agentName, dia)"
+    + ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+)
+
+def load_into_database(conn, generator: BpdGenerator, chunk_rows: int = 50_000, progress=None):
+    """
+    Recria a tabela bpd no banco da conexão com os dados do gerador. Só aceita um banco sem
+    tabela bpd ou já marcado como banco de benchmark (tabela benchmark_meta), para nunca
+    apagar dados reais. Retorna a quantidade de linhas gravadas.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SHOW TABLES")
+        tables = {row[0] for row in cursor.fetchall()}
+        if 'bpd' in tables and BENCHMARK_MARKER_TABLE not in tables:
+            raise RuntimeError("O banco já tem uma tabela bpd que não foi criada pelos benchmarks; use um banco local vazio.")
+
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {BENCHMARK_MARKER_TABLE} (rows_loaded BIGINT, seed INT, days INT)")
+        cursor.execute("DROP TABLE IF EXISTS bpd")
+        # Estado incremental das dimensões e do rollup recomeça junto com os dados
+        for table in DERIVED_TABLES:
+            if table in tables:
+                cursor.execute(f"TRUNCATE TABLE {table}")
+        cursor.execute(BPD_BENCHMARK_DDL)
+
+        columns = BPD_COLUMNS
+        insert = "INSERT INTO bpd (" + ", ".join(f"`{col}`" for col in columns) + ") VALUES (" + ", ".join(["%s"] * len(columns)) + ")"
+        rows_loaded = 0
+        for chunk in generator.chunks(chunk_rows):
+            records = chunk.astype(object).itertuples(index=False, name=None)
+            cursor.executemany(insert, [tuple(value.item() if hasattr(value, 'item') else value for value in record) for record in records])
+            conn.commit()
+            rows_loaded += len(chunk)
+            if progress:
+                progress(rows_loaded)
+
+        cursor.execute(f"DELETE FROM {BENCHMARK_MARKER_TABLE}")
+        cursor.execute(f"INSERT INTO {BENCHMARK_MARKER_TABLE} VALUES (%s, %s, %s)", (rows_loaded, generator.seed, generator.days))
+        conn.commit()
+        return rows_loaded
+    finally:
+        cursor.close()
+
+def loaded_dataset(conn):
+    """Retorna (linhas, semente, dias) dos dados de benchmark já carregados no banco, ou None."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SHOW TABLES")
+        if BENCHMARK_MARKER_TABLE not in {row[0] for row in cursor.fetchall()}:
+            return None
+        cursor.execute(f"SELECT rows_loaded, seed, days FROM {BENCHMARK_MARKER_TABLE}")
+        row = cursor.fetchone()
+        return tuple(row) if row else None
+    finally:
+        cursor.close()
@@ -0,0 +1,156 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Tipo declarado de cada coluna da tabela 'bpd', na ordem de column_names.txt:
+# - 'integer': IDs e contagens, guardados no menor inteiro que comporta os valores
+# - 'date': a coluna 'dia', convertida para datetime (valores inválidos viram NaT)
+# - 'category': nomes e códigos com poucos valores distintos
+# - 'numeric': valores monetários e percentuais, em float64
+BPD_SCHEMA = {
+    'linha_id': 'integer',
+    'dia': 'date',
+    'reference': 'category',
+    'share': 'category',
+    'moeda': 'category',
+    'upline': 'category',
+    'club': 'category',
+    'playerID': 'integer',
+    'playerName': 'category',
+    'agentName': 'category',
+    'agentId': 'integer',
+    'superAgentName': 'category',
+    'superagentId': 'integer',
+    'localWins': 'numeric',
+    'localFee': 'numeric',
+    'hands': 'integer',
+    'dolarWins': 'numeric',
+    'dolarFee': 'numeric',
+    'dolarRakeback': 'numeric',
+    'dolarRebate': 'numeric',
+    'realWins': 'numeric',
+    'realFee': 'numeric',
+    'realRakeback': 'numeric',
+    'realRebate': 'numeric',
+    'realAgentSett': 'numeric',
+    'dolarAgentSett': 'numeric',
+    'realRevShare': 'numeric',
+    'realBPFProfit': 'numeric',
+    'deal': 'numeric',
+    'rebate': 'numeric',
+}
+
+BPD_COLUMNS = list(BPD_SCHEMA)
+
+def _to_compact_integer(series: pd.Series) -> pd.Series:
+    """
+    Converte para o menor tipo inteiro que comporta os valores. Colunas com valores ausentes
+    usam os inteiros anuláveis do pandas; valores fracionários mantêm a coluna em float64.
+    """
+    numeric = pd.to_numeric(series, errors='coerce')
+    if numeric.empty:
+        return numeric.astype('int64')
+    values = numeric.to_numpy(dtype='float64', na_value=np.nan)
+    present = values[~np.isnan(values)]
+    if present.size and not np.array_equal(present, np.floor(present)):
+        return numeric.astype('float64')
+
+    if present.size == values.size:
+        return pd.to_numeric(numeric, downcast='integer')
+
+    low = present.min() if present.size else 0
+    high = present.max() if present.size else 0
+    for dtype, info in (('Int8', np.iinfo(np.int8)), ('Int16', np.iinfo(np.int16)), ('Int32', np.iinfo(np.int32))):
+        if info.min <= low and high <= info.max:
+            return numeric.astype(dtype)
+    return numeric.astype('Int64')
+
+def convert_column(series: pd.Series, kind: str) -> pd.Series:
+    """
+    Converte uma coluna para o tipo declarado em BPD_SCHEMA.
+    """
+    if kind == 'date':
+        return pd.to_datetime(series, errors='coerce')
+    if kind == 'category':
+        return series.astype('category')
+    if kind == 'integer':
+        return _to_compact_integer(series)
+    if kind == 'numeric':
+        return pd.to_numeric(series, errors='coerce').astype('float64')
+    return series
+
+def apply_bpd_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica o schema declarado às colunas conhecidas do DataFrame (as demais ficam como estão)
+    e registra em df.attrs['memory_report'] quanto de memória a conversão economizou.
+    """
+    bytes_before = int(df.memory_usage(deep=True).sum())
+
+    typed = {
+        col: convert_column(df[col], BPD_SCHEMA[col]) if col in BPD_SCHEMA else df[col]
+        for col in df.columns
+    }
+    result = pd.DataFrame(typed, index=df.index)
+
+    bytes_after = int(result.memory_usage(deep=True).sum())
+    result.attrs['memory_report'] = {
+        'rows': len(result),
+        'bytes_before': bytes_before,
+        'bytes_after': bytes_after,
+        'bytes_saved': bytes_before - bytes_after,
+    }
+    return result
+
+def concat_typed(frames: list) -> pd.DataFrame:
+    """
+    Concatena DataFrames já tipados mantendo as colunas categóricas: as categorias são unidas,
+    em vez de a coluna voltar a ser object como aconteceria com pd.concat.
+    """
+    non_empty = [frame for frame in frames if not frame.empty]
+    if not non_empty:
+        return frames[0] if frames else pd.DataFrame()
+    if len(non_empty) == 1:
+        return non_empty[0]
+
+    columns = {}
+    for col in non_empty[0].columns:
+        parts = [frame[col] for frame in non_empty]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            # Lotes em que a coluna veio toda nula têm categorias vazias de outro tipo
+            # (object em vez de texto), o que union_categoricals não aceita
+            filled = [part for part in parts if len(part.cat.categories)]
+            if filled:
+                empty_dtype = pd.CategoricalDtype(filled[0].cat.categories[:0])
+                parts = [part if len(part.cat.categories) else part.astype(empty_dtype) for part in parts]
+            columns[col] = pd.Series(union_categoricals(parts), name=col)
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+def make_dataset_version(*parts) -> str:
+    """
+    Monta o token de versão de um conjunto de dados a partir de valores que o identificam
+    (parâmetros da consulta, marca d'água, seleção dos filtros...).
+    """
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+def get_dataset_version(df: pd.DataFrame):
+    """
+    Retorna o token de versão guardado em df.attrs['dataset_version'] por load_data (e derivado
+    pelos filtros), ou None se o DataFrame não tiver um. Dois DataFrames com o mesmo token têm
+    as mesmas linhas na mesma ordem, então o token serve de chave barata para estado e caches derivados.
+    """
+    return df.attrs.get('dataset_version') if df is not None else None
+
+def format_memory_report(report: dict) -> str:
+    """
+    Formata o relatório de memória de uma carga para os logs.
+    """
+    before_mb = report['bytes_before'] / 1024 ** 2
+    after_mb = report['bytes_after'] / 1024 ** 2
+    saved_pct = (report['bytes_saved'] / report['bytes_before'] * 100) if report['bytes_before'] else 0.0
+    return (
+        f"{report['rows']} linhas: {before_mb:.1f} MB -> {after_mb:.1f} MB "
+        f"({saved_pct:.0f}% economizado)"
+    )
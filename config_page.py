@@ -1,5 +1,7 @@
 import streamlit as st
-from database import save_user_config, load_user_config, get_user_info, update_user_password, update_user_email, create_user_if_not_exists
+from user_preferences import get_user_preference, save_user_preference
+from auth import get_login_throttle
+from database import get_user_info, update_user_password, update_user_email, create_user_if_not_exists
 
 def display_config_page():
     st.title("Configurações")
@@ -22,8 +24,8 @@ def display_config_page():
         # Opções de período disponíveis
         period_options = ["Semana Atual", "Hoje", "Última semana", "Últimos 30 dias", "Mostrar tudo"]
         
-        # Carrega o período padrão salvo do banco de dados
-        saved_period_index = load_user_config(st.session_state['username'], 'default_period_index', '2')
+        # Carrega o período padrão salvo (da memória, carregada no login)
+        saved_period_index = get_user_preference(st.session_state['username'], 'default_period_index', '2')
         try:
             saved_period_index = int(saved_period_index)
         except (ValueError, TypeError):
@@ -54,9 +56,9 @@ def display_config_page():
         
         # Botão para aplicar a mudança
         if st.button("Aplicar Período Padrão", key="apply_default_period"):
-            # Salva no banco de dados
+            # Salva na memória; a gravação no banco é feita em segundo plano
             period_index = str(period_options.index(period_option))
-            if save_user_config(st.session_state['username'], 'default_period_index', period_index):
+            if save_user_preference(st.session_state['username'], 'default_period_index', period_index):
                 st.session_state['date_range_option_index'] = period_options.index(period_option)
                 st.success(f"Período padrão salvo e aplicado: {period_option}")
                 st.rerun()
@@ -137,6 +139,7 @@ def display_config_page():
                         
                         # Atualizar senha
                         if update_user_password(st.session_state['username'], new_password):
+                            get_login_throttle().forget(st.session_state['username'])
                             st.success(f"✅ Senha alterada com sucesso para o usuário {st.session_state['username']}")
                         else:
                             st.error("❌ Erro ao alterar senha. Tente novamente.")
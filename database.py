@@ -1,68 +1,464 @@
+import os
 import streamlit as st
-import mysql.connector
 import pandas as pd
+import queue
+import threading
+import time
+from collections import OrderedDict
 from datetime import date
+from utils import get_setting
+from passwords import PASSWORD_HASH_LENGTH, hash_password
+from snapshot_store import get_snapshot_store
+from dimensions import refresh_dimensions, fetch_dimension_values
+from rollup import ROLLUP_TABLE, refresh_rollup, can_use_rollup, is_rollup_current
+from bpd_schema import BPD_COLUMNS, apply_bpd_schema, concat_typed, format_memory_report, make_dataset_version
+from instrumentation import logger, log_enabled, span
+from storage_backends import create_storage_backend
+from filter_engine import get_filter_index
+
+class ConnectionPool:
+    """Pool de conexões compartilhado pelas sessões, sobre o backend configurado (MySQL ou SQLite)."""
+
+    def __init__(self, backend, pool_size: int = 5, checkout_timeout: float = 10.0, ping_interval: float = 30.0):
+        self.backend = backend
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+        # LIFO: a conexão devolvida por último é a próxima a sair, mantendo poucas conexões "quentes"
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open_connections = 0
+        self._stats = {
+            'checkouts': 0,
+            'connects': 0,
+            'reconnects': 0,
+            'discarded': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'hold_seconds_total': 0.0,
+            'hold_seconds_max': 0.0,
+        }
+
+    def _connect(self):
+        conn = self.backend.connect()
+        with self._lock:
+            self._stats['connects'] += 1
+        return conn
+
+    def _acquire(self):
+        """Retorna (conexão, instante da devolução), abrindo uma nova se o pool ainda não estiver cheio."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._open_connections < self.pool_size
+            if can_open:
+                self._open_connections += 1
+
+        if can_open:
+            try:
+                return self._connect(), time.monotonic()
+            except Exception:
+                with self._lock:
+                    self._open_connections -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise TimeoutError(
+                f"Nenhuma conexão livre no pool após {self.checkout_timeout}s ({self.pool_size} conexões em uso)"
+            )
+
+    def _is_alive(self, conn) -> bool:
+        try:
+            return conn.is_connected()  # Executa um ping no servidor
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._lock:
+            self._open_connections -= 1
+            self._stats['discarded'] += 1
+
+    def checkout(self):
+        """
+        Empresta uma conexão do pool. Conexões ociosas há mais de `ping_interval` segundos
+        passam por um teste de vida e são reabertas se o servidor as tiver derrubado.
+        """
+        started = time.perf_counter()
+        conn, released_at = self._acquire()
+        try:
+            if time.monotonic() - released_at > self.ping_interval and not self._is_alive(conn):
+                self._close_quietly(conn)
+                conn = self._connect()
+                with self._lock:
+                    self._stats['reconnects'] += 1
+        except Exception:
+            with self._lock:
+                self._open_connections -= 1
+                self._stats['discarded'] += 1
+            raise
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['wait_seconds_total'] += waited
+            self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+        return PooledConnection(self, conn)
+
+    def release(self, conn, held_seconds: float):
+        """Devolve uma conexão ao pool, encerrando a transação de leitura aberta pelo empréstimo."""
+        with self._lock:
+            self._stats['hold_seconds_total'] += held_seconds
+            self._stats['hold_seconds_max'] = max(self._stats['hold_seconds_max'], held_seconds)
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            # Sem o rollback, o próximo empréstimo continuaria no snapshot antigo do InnoDB
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def stats(self) -> dict:
+        """Retorna uma cópia dos contadores do pool, com médias de espera e de uso por empréstimo."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_connections'] = self._open_connections
+        stats['idle_connections'] = self._idle.qsize()
+        stats['pool_size'] = self.pool_size
+        checkouts = stats['checkouts'] or 1
+        stats['wait_seconds_avg'] = stats['wait_seconds_total'] / checkouts
+        stats['hold_seconds_avg'] = stats['hold_seconds_total'] / checkouts
+        return stats
+
+class PooledConnection:
+    """Conexão emprestada do pool; close() a devolve ao pool em vez de encerrá-la."""
+
+    def __init__(self, pool: ConnectionPool, conn):
+        self._pool = pool
+        self._conn = conn
+        self.backend = pool.backend
+        self._checked_out_at = time.perf_counter()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn, time.perf_counter() - self._checked_out_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Chaves de [mysql] que podem ser sobrescritas por variáveis de ambiente BPD_MYSQL_<CHAVE>
+MYSQL_SETTING_KEYS = ['host', 'user', 'password', 'database', 'port', 'pool_size', 'pool_timeout', 'pool_ping_interval']
+
+def _mysql_settings() -> dict:
+    """
+    Retorna a seção [mysql] do secrets.toml com as variáveis de ambiente BPD_MYSQL_<CHAVE>
+    (por exemplo BPD_MYSQL_HOST) por cima, para apontar o app ou os benchmarks para outro banco.
+    """
+    try:
+        settings = dict(st.secrets["mysql"])
+    except Exception:
+        settings = {}
+    for key in MYSQL_SETTING_KEYS:
+        value = os.environ.get(f"BPD_MYSQL_{key.upper()}")
+        if value is not None:
+            settings[key] = value
+    return settings
+
+def _storage_backend_name() -> str:
+    """
+    Backend de armazenamento: a variável de ambiente BPD_STORAGE_BACKEND ou [storage] backend
+    no secrets.toml ('mysql', o padrão, ou 'sqlite').
+    """
+    return (os.environ.get("BPD_STORAGE_BACKEND") or get_setting("storage", "backend", "mysql")).lower()
+
+@st.cache_resource
+def get_connection_pool():
+    """
+    Retorna o pool de conexões do processo, ajustável na seção [mysql] do secrets.toml
+    (pool_size, pool_timeout, pool_ping_interval) ou pelas variáveis BPD_MYSQL_<CHAVE>.
+    """
+    mysql_settings = _mysql_settings()
+    backend = create_storage_backend(
+        _storage_backend_name(),
+        mysql_settings=mysql_settings,
+        sqlite_path=os.environ.get("BPD_SQLITE_PATH") or get_setting("storage", "sqlite_path"),
+    )
+    return ConnectionPool(
+        backend,
+        pool_size=int(mysql_settings.get("pool_size", 5)),
+        checkout_timeout=float(mysql_settings.get("pool_timeout", 10)),
+        ping_interval=float(mysql_settings.get("pool_ping_interval", 30)),
+    )
+
+def get_pool_stats() -> dict:
+    """
+    Retorna os contadores do pool de conexões (empréstimos, reconexões, tempos de espera e de uso).
+    """
+    return get_connection_pool().stats()
+
+# Contador de versão da bpd mantido por triggers (veja migrate_bpd_indexes.py), revalidado
+# periodicamente como a coluna de data
+BPD_VERSION_TABLE = 'bpd_version'
+_VERSION_TABLE_TTL = 600
+_version_table_cache = {'value': None, 'checked_at': 0.0}
+
+def _has_version_table(conn) -> bool:
+    if _version_table_cache['value'] is not None and time.monotonic() - _version_table_cache['checked_at'] < _VERSION_TABLE_TTL:
+        return _version_table_cache['value']
+    value = bool(conn.backend.column_types(conn, BPD_VERSION_TABLE))
+    _version_table_cache['value'] = value
+    _version_table_cache['checked_at'] = time.monotonic()
+    return value
+
+class ResultCache:
+    """
+    Cache de resultados do processo. Cada entrada só é servida enquanto a marca d'água da bpd
+    (MAX(linha_id) e o contador bpd_version, ou COUNT(*) sem ele) não mudar.
+    """
+
+    def __init__(self, max_entries: int = 32, watermark_ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.watermark_ttl = watermark_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._watermark = None
+        self._watermark_checked_at = 0.0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'evictions': 0,
+            'watermark_queries': 0,
+            'derived': 0,
+        }
+
+    def current_watermark(self, conn):
+        """
+        Retorna a marca d'água atual do banco. A consulta é reaproveitada por `watermark_ttl`
+        segundos para que as várias leituras de um mesmo rerun custem uma única ida ao banco.
+        """
+        with self._lock:
+            if self._watermark is not None and time.monotonic() - self._watermark_checked_at < self.watermark_ttl:
+                return self._watermark
+
+        if _has_version_table(conn):
+            query = f"SELECT (SELECT MAX(linha_id) FROM bpd), (SELECT version FROM {BPD_VERSION_TABLE} WHERE id = 1)"
+        else:
+            query = "SELECT MAX(linha_id), COUNT(*) FROM bpd"
+        cursor = conn.cursor()
+        try:
+            with span('query', source='watermark'):
+                cursor.execute(query)
+                max_linha_id, version = cursor.fetchone()
+        finally:
+            cursor.close()
+
+        watermark = (max_linha_id, version)
+        with self._lock:
+            self._watermark = watermark
+            self._watermark_checked_at = time.monotonic()
+            self._stats['watermark_queries'] += 1
+        return watermark
+
+    def get(self, key, watermark):
+        """Retorna o valor em cache para `key` se ele foi carregado com a mesma marca d'água, ou None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry['watermark'] != watermark:
+                self._stats['stale'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry['value']
+
+    def get_entry(self, key, watermark):
+        """
+        Retorna a entrada completa de `key` (valor, marca d'água e estado de sincronização), mesmo
+        que esteja desatualizada, para que o chamador possa atualizá-la de forma incremental.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry['watermark'] == watermark:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+            else:
+                self._stats['stale'] += 1
+                self._stats['misses'] += 1
+            return entry
+
+    def fresh_entries(self, watermark, key_prefix: tuple) -> list:
+        """
+        Retorna [(chave, valor)] das entradas carregadas com a marca d'água atual cujas chaves
+        começam por `key_prefix`, sem contar como acerto ou falha.
+        """
+        with self._lock:
+            return [
+                (key, entry['value']) for key, entry in self._entries.items()
+                if key[:len(key_prefix)] == key_prefix and entry['watermark'] == watermark
+            ]
+
+    def touch(self, key):
+        """Marca a entrada como recém-usada, sem contar como acerto (veja _derive_player_slice)."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def record_derived(self):
+        """Conta um resultado montado a partir de outra entrada do cache, sem consultar o banco."""
+        with self._lock:
+            self._stats['derived'] += 1
+
+    def put(self, key, watermark, value, sync=None):
+        """Guarda um valor, descartando as entradas menos usadas quando o limite é atingido."""
+        with self._lock:
+            self._entries[key] = {'watermark': watermark, 'value': value, 'sync': sync, 'stored_at': time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._watermark = None
+
+    def stats(self) -> dict:
+        """Retorna uma cópia dos contadores de acertos e falhas do cache."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['watermark'] = self._watermark
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+@st.cache_resource
+def get_result_cache():
+    """Retorna o cache de resultados do processo ([cache] max_entries e watermark_ttl no secrets.toml)."""
+    return ResultCache(
+        max_entries=int(get_setting("cache", "max_entries", 32)),
+        watermark_ttl=float(get_setting("cache", "watermark_ttl", 5)),
+    )
+
+def get_cache_stats() -> dict:
+    """
+    Retorna os contadores do cache de resultados (acertos, falhas, entradas e marca d'água atual).
+    """
+    return get_result_cache().stats()
 
 def get_db_connection():
     """
-    Estabelece e retorna uma conexão com o banco de dados MySQL usando as credenciais do Streamlit secrets.
+    Empresta uma conexão do pool compartilhado. Chamar close() na conexão a devolve ao pool.
     """
     try:
-        conn = mysql.connector.connect(
-            host=st.secrets["mysql"]["host"],
-            user=st.secrets["mysql"]["user"],
-            password=st.secrets["mysql"]["password"],
-            database=st.secrets["mysql"]["database"],
-            port=st.secrets["mysql"]["port"]
-        )
-        return conn
+        with span('db_connect'):
+            return get_connection_pool().checkout()
     except Exception as e:
         st.error(f"Erro ao conectar ao banco de dados: {e}")
         return None
 
+# Coluna de data usada nos filtros, revalidada periodicamente (a migração pode rodar com o app no ar)
+_DATE_COLUMN_TTL = 600
+_date_column_cache = {'value': None, 'checked_at': 0.0}
+
+def _bpd_date_column(conn):
+    """Retorna (coluna, tipada): 'dia_date' depois de migrate_bpd_indexes.py, senão 'dia' (tipada se já for DATE)."""
+    if _date_column_cache['value'] is not None and time.monotonic() - _date_column_cache['checked_at'] < _DATE_COLUMN_TTL:
+        return _date_column_cache['value']
+
+    column_types = conn.backend.column_types(conn, 'bpd')
+    if 'dia_date' in column_types:
+        value = ('dia_date', True)
+    elif column_types.get('dia') == 'date':
+        value = ('dia', True)
+    else:
+        value = ('dia', False)
+    _date_column_cache['value'] = value
+    _date_column_cache['checked_at'] = time.monotonic()
+    return value
+
+def _valid_date_clause(date_column: str, typed: bool):
+    """
+    Cláusula que descarta as linhas cuja data não é válida (as mesmas que load_data remove).
+    """
+    if typed:
+        return f" {date_column} IS NOT NULL"
+    return f" {date_column} IS NOT NULL AND {date_column} != '' AND {date_column} != '-'"
+
+def _parse_db_date(value):
+    """
+    Converte uma data vinda da coluna 'dia' (texto no formato YYYY-MM-DD) em datetime.date, ou None.
+    """
+    if value is None:
+        return None
+    value_str = str(value).strip()
+    if not value_str or value_str == '-' or value_str == 'None':
+        return None
+    try:
+        # Assumir formato YYYY-MM-DD
+        return pd.to_datetime(value_str, format='%Y-%m-%d').date()
+    except:
+        # Fallback: tentar parsing automático
+        parsed = pd.to_datetime(value_str, errors='coerce')
+        return parsed.date() if pd.notna(parsed) else None
+
 def get_date_range():
     """
     Retorna as datas mínima e máxima dos dados no banco.
+    O resultado fica em cache até a marca d'água da tabela bpd mudar.
     """
     conn = get_db_connection()
     if conn:
         try:
-            query = "SELECT MIN(dia) as min_date, MAX(dia) as max_date FROM bpd WHERE dia IS NOT NULL AND dia != '' AND dia != '-'"
-            df = pd.read_sql(query, conn)
-            
-            min_date = None
-            max_date = None
-            
-            # Processar data mínima
-            if not df.empty and df['min_date'].iloc[0] is not None:
-                min_date_str = str(df['min_date'].iloc[0]).strip()
-                if min_date_str and min_date_str != '-' and min_date_str != 'None':
-                    try:
-                        # Assumir formato YYYY-MM-DD
-                        min_date = pd.to_datetime(min_date_str, format='%Y-%m-%d').date()
-                    except:
-                        # Fallback: tentar parsing automático
-                        min_date = pd.to_datetime(min_date_str, errors='coerce')
-                        if pd.notna(min_date):
-                            min_date = min_date.date()
-                        else:
-                            min_date = None
-            
-            # Processar data máxima
-            if not df.empty and df['max_date'].iloc[0] is not None:
-                max_date_str = str(df['max_date'].iloc[0]).strip()
-                if max_date_str and max_date_str != '-' and max_date_str != 'None':
-                    try:
-                        # Assumir formato YYYY-MM-DD
-                        max_date = pd.to_datetime(max_date_str, format='%Y-%m-%d').date()
-                    except:
-                        # Fallback: tentar parsing automático
-                        max_date = pd.to_datetime(max_date_str, errors='coerce')
-                        if pd.notna(max_date):
-                            max_date = max_date.date()
-                        else:
-                            max_date = None
-            
+            cache = get_result_cache()
+            watermark = cache.current_watermark(conn)
+            cached_range = cache.get(('date_range',), watermark)
+            if cached_range is not None:
+                return cached_range
+
+            # Com a coluna tipada e indexada, MIN/MAX são resolvidos pelo índice
+            date_column, typed = _bpd_date_column(conn)
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT MIN({date_column}) as min_date, MAX({date_column}) as max_date FROM bpd WHERE" + _valid_date_clause(date_column, typed))
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+
+            min_date = _parse_db_date(row[0]) if row else None
+            max_date = _parse_db_date(row[1]) if row else None
+
+            cache.put(('date_range',), watermark, (min_date, max_date))
             return min_date, max_date
         except Exception as e:
             st.error(f"Erro ao buscar range de datas: {e}")
@@ -71,62 +467,408 @@ def get_date_range():
             conn.close()
     return None, None
 
-# @st.cache_data(ttl=3600) # Cache por 1 hora - Temporariamente desativado para depuração
-def load_data(username: str = None, user_role: str = None, start_date: date = None, end_date: date = None):
+def _data_cache_key(username: str, user_role: str, start_date: date, end_date: date):
     """
-    Carrega os dados da tabela 'bpd' do MySQL para um DataFrame Pandas.
-    Realiza limpeza inicial dos dados e filtra por usuário/papel e intervalo de datas se fornecido.
+    Monta a chave de cache de load_data. O nome do usuário só restringe a consulta para
+    jogadores, então administradores compartilham as mesmas entradas.
+    """
+    scoped_username = username if user_role == 'Jogador' else None
+    start_key = str(start_date) if start_date and end_date else None
+    end_key = str(end_date) if start_date and end_date else None
+    return ('bpd', user_role, scoped_username, start_key, end_key)
+
+def _covers_period(key, start_date: date, end_date: date) -> bool:
+    """Indica se a entrada de load_data com chave `key` contém todas as linhas do período."""
+    superset_start, superset_end = key[3], key[4]
+    if superset_start is None:
+        return True  # "Mostrar tudo"
+    if not (start_date and end_date):
+        return False
+    return superset_start <= str(start_date) and str(end_date) <= superset_end
+
+def _derive_player_slice(cache, watermark, username: str, start_date: date, end_date: date, columns: list):
+    """
+    Recorta as linhas de um jogador de uma carga de administrador já em cache que cubra o período.
+    Retorna None se não houver uma.
+    """
+    candidates = [
+        (key, value) for key, value in cache.fresh_entries(watermark, ('bpd',))
+        if key[1] != 'Jogador' and key[2] is None and _covers_period(key, start_date, end_date)
+        and not value.empty and all(col in value.columns for col in columns)
+    ]
+    if not candidates:
+        return None
+    superset_key, superset = min(candidates, key=lambda candidate: len(candidate[1]))
+    cache.touch(superset_key)
+
+    positions = get_filter_index(superset).positions({'playerName': [username]})
+    df = superset[columns].take(positions)
+    if start_date and end_date:
+        df = df[(df['dia'] >= pd.Timestamp(start_date)) & (df['dia'] <= pd.Timestamp(end_date))]
+    # As categorias da carga maior incluem os valores de todos os jogadores
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+    # Mesma ordem de uma carga direta do jogador, que recebe o mesmo token
+    df = _canonical_order(df.reset_index(drop=True))
+    df.attrs = {}
+    cache.record_derived()
+    return df
+
+# Checksum de uma linha, usado para detectar alterações em dias já carregados
+_ROW_CHECKSUM_SQL = "CRC32(CONCAT_WS('|', " + ", ".join(f"`{col}`" for col in BPD_COLUMNS) + "))"
+
+def _bpd_scope_where(username: str = None, user_role: str = None, start_date: date = None, end_date: date = None, date_column: str = 'dia'):
+    """
+    Monta as cláusulas WHERE e os parâmetros que restringem a tabela 'bpd' ao usuário/papel e ao período.
+    `date_column` é a coluna de data indexada retornada por _bpd_date_column.
+    """
+    where_clauses = []
+    params = []
+
+    if user_role == 'Jogador' and username:
+        where_clauses.append(" playerName = %s")
+        params.append(username)
+
+    if start_date and end_date:
+        where_clauses.append(f" {date_column} BETWEEN %s AND %s")
+        # Converter datetime.date para string no formato YYYY-MM-DD
+        start_date_str = start_date.strftime('%Y-%m-%d') if hasattr(start_date, 'strftime') else str(start_date)
+        end_date_str = end_date.strftime('%Y-%m-%d') if hasattr(end_date, 'strftime') else str(end_date)
+        params.append(start_date_str)
+        params.append(end_date_str)
+        logger.debug("Filtrando por período - %s até %s (parâmetros: %s)", start_date, end_date, params)
+
+    return where_clauses, params
+
+def _stream_bpd(conn, query: str, params: list, batch_size: int, progress_callback=None):
+    """Lê o resultado em lotes com um cursor sem buffer, convertendo cada lote para o schema tipado."""
+    cursor = conn.cursor(buffered=False)
+    batches = []
+    bytes_before = 0
+    rows_loaded = 0
+    try:
+        with span('query'):
+            cursor.execute(query, params)
+        # Limpeza inicial: remover espaços dos nomes das colunas
+        # Esta linha é crucial para que o pandas possa acessar as colunas sem o espaço
+        columns = [desc[0].strip() for desc in cursor.description]
+        # Inclui a espera pelos lotes vindos do servidor, que chegam durante a conversão
+        with span('to_dataframe') as conversion:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                batch = apply_bpd_schema(pd.DataFrame.from_records(rows, columns=columns))
+                bytes_before += batch.attrs['memory_report']['bytes_before']
+                batches.append(batch)
+                rows_loaded += len(rows)
+                if progress_callback:
+                    progress_callback(rows_loaded)
+            conversion.set(rows=rows_loaded)
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass  # Linhas não lidas são descartadas quando a conexão volta ao pool
+
+    if not batches:
+        return apply_bpd_schema(pd.DataFrame.from_records([], columns=columns))
+
+    # Uma única concatenação no final, unindo as categorias dos lotes
+    df = concat_typed(batches)
+    bytes_after = int(df.memory_usage(deep=True).sum())
+    df.attrs['memory_report'] = {
+        'rows': len(df),
+        'bytes_before': bytes_before,
+        'bytes_after': bytes_after,
+        'bytes_saved': bytes_before - bytes_after,
+    }
+    return df
+
+def _projected_columns(columns=None) -> list:
+    """
+    Colunas a selecionar, na ordem da tabela. Sem lista, seleciona todas; 'linha_id' e 'dia'
+    entram sempre, porque a sincronização e a limpeza das datas dependem delas.
+    """
+    if columns is None:
+        return list(BPD_COLUMNS)
+    requested = set(columns) | {'linha_id', 'dia'}
+    return [col for col in BPD_COLUMNS if col in requested]
+
+def _canonical_order(df: pd.DataFrame) -> pd.DataFrame:
+    """Ordena as linhas por (dia, linha_id), para que o mesmo token sempre tenha as mesmas posições."""
+    if df.empty:
+        return df
+    return df.sort_values(['dia', 'linha_id'], kind='stable', ignore_index=True)
+
+def _read_bpd(conn, where_clauses: list, params: list, progress_callback=None, columns=None):
+    """Executa a consulta da tabela 'bpd' com as cláusulas informadas e realiza a limpeza inicial dos dados."""
+    # Atenção: Colunas com espaços nos nomes devem ser envolvidas em crases (`)
+    query = "SELECT " + ", ".join(f"`{col}`" for col in _projected_columns(columns)) + " FROM bpd"
+
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+
+    # Aplica o schema declarado: 'dia' como data, nomes como categorias, IDs como inteiros
+    # compactos e valores monetários como float64, lote a lote durante a leitura
+    batch_size = int(get_setting("mysql", "fetch_batch_size", 50000))
+    df = _stream_bpd(conn, query, params, batch_size, progress_callback)
+    if log_enabled():
+        logger.debug("Memória da carga - %s", format_memory_report(df.attrs['memory_report']))
+
+    # Remover linhas com datas inválidas (NaT) na coluna 'dia'
+    df.dropna(subset=['dia'], inplace=True)
+
+    return df
+
+def _fetch_day_checksums(conn, where_clauses: list, params: list, max_linha_id, previous_max_linha_id=None):
+    """
+    Retorna {dia: {'rows', 'checksum', 'previous_rows', 'previous_checksum'}} das linhas até max_linha_id;
+    os valores 'previous' contam só as linhas até previous_max_linha_id.
     """
+    previous_bound = previous_max_linha_id if previous_max_linha_id is not None else max_linha_id
+    query = (
+        "SELECT dia, "
+        f"SUM(linha_id <= %s), BIT_XOR(IF(linha_id <= %s, {_ROW_CHECKSUM_SQL}, 0)), "
+        f"SUM(linha_id <= %s), BIT_XOR(IF(linha_id <= %s, {_ROW_CHECKSUM_SQL}, 0)) "
+        "FROM bpd"
+    )
+    query_params = [max_linha_id, max_linha_id, previous_bound, previous_bound]
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+        query_params += params
+    query += " GROUP BY dia"
+
+    cursor = conn.cursor()
+    try:
+        with span('query', source='day_checksums'):
+            cursor.execute(query, query_params)
+            rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    return {
+        str(dia): {
+            'rows': int(rows_count or 0),
+            'checksum': int(checksum or 0),
+            'previous_rows': int(previous_rows or 0),
+            'previous_checksum': int(previous_checksum or 0),
+        }
+        for dia, rows_count, checksum, previous_rows, previous_checksum in rows
+    }
+
+def _merge_missing_columns(conn, df: pd.DataFrame, columns: list, where_clauses: list, params: list, max_linha_id, progress_callback=None):
+    """Busca só as colunas de `columns` que faltam em `df` e retorna um novo DataFrame com elas."""
+    missing = [col for col in _projected_columns(columns) if col not in df.columns]
+    if not missing:
+        return df
+
+    extra = _read_bpd(conn, where_clauses + [" linha_id <= %s"], params + [max_linha_id], progress_callback, columns=missing)
+    extra = extra.drop_duplicates(subset='linha_id').set_index('linha_id').reindex(df['linha_id'].to_numpy())
+
+    merged = df.copy(deep=False)
+    for col in missing:
+        merged[col] = pd.Series(extra[col].array, index=df.index)
+    merged = merged[[col for col in BPD_COLUMNS if col in merged.columns]]
+    merged.attrs = dict(df.attrs)
+    return merged
+
+def _sync_bpd_full(conn, where_clauses: list, params: list, watermark, progress_callback=None, columns=None):
+    """
+    Carrega todas as linhas do escopo até a marca d'água e registra os checksums por dia
+    que servirão de base para as próximas cargas incrementais.
+    """
+    max_linha_id = watermark[0] if watermark[0] is not None else 0
+    df = _canonical_order(_read_bpd(conn, where_clauses + [" linha_id <= %s"], params + [max_linha_id], progress_callback, columns))
+    checksums = _fetch_day_checksums(conn, where_clauses, params, max_linha_id)
+    sync = {
+        'max_linha_id': max_linha_id,
+        'day_checksums': {dia: (day['rows'], day['checksum']) for dia, day in checksums.items()},
+    }
+    return df, sync
+
+def _sync_bpd_delta(conn, df: pd.DataFrame, sync: dict, where_clauses: list, params: list, watermark, progress_callback=None):
+    """Anexa à cópia em cache as linhas novas, ou retorna None se linhas antigas mudaram."""
+    previous_max = sync['max_linha_id']
+    max_linha_id = watermark[0]
+    if max_linha_id is None or max_linha_id < previous_max:
+        return None
+
+    checksums = _fetch_day_checksums(conn, where_clauses, params, max_linha_id, previous_max)
+
+    # Cada dia já conhecido precisa bater exatamente com o que foi carregado antes
+    stored = sync['day_checksums']
+    for dia, day in checksums.items():
+        if (day['previous_rows'], day['previous_checksum']) != stored.get(dia, (0, 0)):
+            return None
+    for dia in stored:
+        if dia not in checksums and stored[dia][0] > 0:
+            return None
+
+    # O delta traz as mesmas colunas que a cópia local já tem
+    delta = _read_bpd(conn, where_clauses + [" linha_id > %s", " linha_id <= %s"], params + [previous_max, max_linha_id], progress_callback, list(df.columns))
+    if not delta.empty:
+        df = _canonical_order(concat_typed([df, delta]))
+
+    new_sync = {
+        'max_linha_id': max_linha_id,
+        'day_checksums': {dia: (day['rows'], day['checksum']) for dia, day in checksums.items()},
+    }
+    return df, new_sync
+
+def _sync_snapshot(conn, store, watermark, days_per_batch: int = 31):
+    """
+    Atualiza o snapshot local até a marca d'água informada, regravando apenas os dias cuja
+    contagem/checksum no servidor difere do manifest. Retorna um resumo da sincronização.
+    """
+    with store.lock:
+        if store.watermark == tuple(watermark):
+            return {'days_written': 0, 'days_deleted': 0, 'seconds': 0.0}
+
+        started = time.perf_counter()
+        max_linha_id = watermark[0] if watermark[0] is not None else 0
+        server_days = _fetch_day_checksums(conn, [], [], max_linha_id)
+        days_to_write, days_to_delete = store.diff(server_days)
+
+        for i in range(0, len(days_to_write), days_per_batch):
+            batch_days = days_to_write[i:i + days_per_batch]
+            placeholders = ", ".join(["%s"] * len(batch_days))
+            df = _read_bpd(conn, [f" dia IN ({placeholders})", " linha_id <= %s"], batch_days + [max_linha_id])
+            day_keys = df['dia'].dt.strftime('%Y-%m-%d')
+            groups = {dia: day_df for dia, day_df in df.groupby(day_keys, sort=False)}
+            for dia in batch_days:
+                # Dias com datas inválidas não têm linhas legíveis, mas entram no manifest com seu checksum
+                day_df = groups.get(dia, df.iloc[0:0])
+                store.write_day(dia, day_df, server_days[dia]['rows'], server_days[dia]['checksum'], max_linha_id)
+
+        for dia in days_to_delete:
+            store.delete_day(dia)
+
+        store.commit(watermark)
+        return {
+            'days_written': len(days_to_write),
+            'days_deleted': len(days_to_delete),
+            'seconds': time.perf_counter() - started,
+        }
+
+def refresh_snapshot():
+    """
+    Sincroniza o snapshot local com o MySQL (apenas partições novas ou alteradas).
+    Retorna o resumo da sincronização, ou None se o snapshot estiver desativado.
+    """
+    store = get_snapshot_store()
+    if store is None:
+        return None
     conn = get_db_connection()
     if conn:
         try:
-            # Atenção: Colunas com espaços nos nomes devem ser envolvidas em crases (`)
-            query = """
-            SELECT
-                `linha_id`, `dia`, `reference`, `share`, `moeda`, `upline`,
-                `club`, `playerID`, `playerName`, `agentName`, `agentId`,
-                `superAgentName`, `superagentId`, `localWins`, `localFee`,
-                `hands`, `dolarWins`, `dolarFee`, `dolarRakeback`,
-                `dolarRebate`, `realWins`, `realFee`, `realRakeback`,
-                `realRebate`, `realAgentSett`, `dolarAgentSett`,
-                `realRevShare`, `realBPFProfit`, `deal`, `rebate`
-            FROM bpd
-            """
-            
-            where_clauses = []
-            params = []
+            watermark = get_result_cache().current_watermark(conn)
+            return _sync_snapshot(conn, store, watermark)
+        except Exception as e:
+            st.error(f"Erro ao sincronizar o snapshot local: {e}")
+            return None
+        finally:
+            conn.close()
+    return None
 
-            if user_role == 'Jogador' and username:
-                where_clauses.append(" playerName = %s")
-                params.append(username)
-            
-            if start_date and end_date:
-                print(f"DEBUG: Filtrando por período - {start_date} até {end_date}")
-                print(f"DEBUG: Tipos - start_date: {type(start_date)}, end_date: {type(end_date)}")
-                where_clauses.append(" dia BETWEEN %s AND %s")
-                # Converter datetime.date para string no formato YYYY-MM-DD
-                start_date_str = start_date.strftime('%Y-%m-%d') if hasattr(start_date, 'strftime') else str(start_date)
-                end_date_str = end_date.strftime('%Y-%m-%d') if hasattr(end_date, 'strftime') else str(end_date)
-                params.append(start_date_str)
-                params.append(end_date_str)
-                print(f"DEBUG: Parâmetros da query (convertidos): {params}")
+def run_etl(rebuild: bool = False, progress=None) -> dict:
+    """
+    Executa os jobs de ETL (dimensões e rollup diário) até a marca d'água atual; veja etl.py.
+    Lança as exceções e retorna {job: quantidade processada}.
+    """
+    report = progress or (lambda message: None)
+    conn = get_connection_pool().checkout()
+    try:
+        cursor = conn.cursor()
+        try:
+            # A versão é lida antes: uma alteração durante o job deixa o rollup desatualizado
+            version = None
+            if _has_version_table(conn):
+                cursor.execute(f"SELECT version FROM {BPD_VERSION_TABLE} WHERE id = 1")
+                row = cursor.fetchone()
+                version = row[0] if row else None
+            cursor.execute("SELECT MAX(linha_id) FROM bpd")
+            max_linha_id = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        date_column, typed = _bpd_date_column(conn)
 
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
+        results = {}
+        report("Dimensões: processando as linhas novas...")
+        results['dimensions'] = refresh_dimensions(conn, date_column, typed, max_linha_id, rebuild=rebuild)
+        report(f"Dimensões: atualizadas até linha_id {results['dimensions']}.")
+        report(f"Rollup diário: calculando os checksums por dia até linha_id {max_linha_id}...")
+        day_checksums = _fetch_day_checksums(conn, [_valid_date_clause(date_column, typed)], [], max_linha_id or 0)
+        results['rollup'] = refresh_rollup(conn, date_column, typed, max_linha_id, day_checksums, rebuild=rebuild, version=version)
+        report(f"Rollup diário: {results['rollup']} dia(s) recalculado(s) ou removido(s).")
+        return results
+    finally:
+        conn.close()
 
-            df = pd.read_sql(query, conn, params=params)
+def _load_data(conn, username: str, user_role: str, start_date: date, end_date: date, progress_callback, columns):
+    # Corpo de load_data e fetch_data; lança as exceções
+    cache = get_result_cache()
+    watermark = cache.current_watermark(conn)
+    cache_key = _data_cache_key(username, user_role, start_date, end_date)
+    columns = _projected_columns(columns)
 
-            # Limpeza inicial: remover espaços dos nomes das colunas
-            # Esta linha é crucial para que o pandas possa acessar as colunas sem o espaço
-            df.columns = df.columns.str.strip()
+    entry = cache.get_entry(cache_key, watermark)
+    is_fresh = entry is not None and entry['watermark'] == watermark
+    if is_fresh and all(col in entry['value'].columns for col in columns):
+        return entry['value']
+    if entry is not None:
+        # A cópia em cache continua com as colunas que já tinha
+        columns = _projected_columns(set(columns) | set(entry['value'].columns))
 
-            # Converter a coluna 'dia' para datetime usando o formato ISO do banco
-            df['dia'] = pd.to_datetime(df['dia'], errors='coerce')
+    # Jogador: se outra sessão já carregou o período inteiro (ou um maior), recorta dela
+    if user_role == 'Jogador' and username and get_setting("cache", "derive_player_slices", True):
+        df = _derive_player_slice(cache, watermark, username, start_date, end_date, columns)
+        if df is not None:
+            df.attrs['dataset_version'] = make_dataset_version(cache_key, watermark)
+            return df
 
-            # Remover linhas com datas inválidas (NaT) na coluna 'dia'
+    store = get_snapshot_store()
+    if store is not None:
+        _sync_snapshot(conn, store, watermark)
+        player_name = username if user_role == 'Jogador' and username else None
+        df = store.read(start_date, end_date, player_name, columns)
+        if not df.empty:
+            df = apply_bpd_schema(df)
             df.dropna(subset=['dia'], inplace=True)
+            df = _canonical_order(df)
+        df.attrs['dataset_version'] = make_dataset_version(cache_key, watermark)
+        cache.put(cache_key, watermark, df)
+        return df
 
-            return df
+    date_column, _ = _bpd_date_column(conn)
+    where_clauses, params = _bpd_scope_where(username, user_role, start_date, end_date, date_column)
+    synced = None
+    if is_fresh and entry['sync'] is not None:
+        # Mesma marca d'água: as linhas em cache estão atualizadas, faltam só colunas
+        synced = entry['value'], entry['sync']
+    elif entry is not None and entry['sync'] is not None:
+        synced = _sync_bpd_delta(conn, entry['value'], entry['sync'], where_clauses, params, watermark, progress_callback)
+    if synced is None:
+        # Primeira carga ou dias antigos alterados: ressincroniza o escopo inteiro
+        synced = _sync_bpd_full(conn, where_clauses, params, watermark, progress_callback, columns)
+
+    df, sync = synced
+    df = _merge_missing_columns(conn, df, columns, where_clauses, params, sync['max_linha_id'], progress_callback)
+    # Mesmos parâmetros e mesma marca d'água = mesmas linhas; as colunas não entram no token
+    df.attrs['dataset_version'] = make_dataset_version(cache_key, watermark)
+    cache.put(cache_key, watermark, df, sync=sync)
+    return df
+
+def load_data(username: str = None, user_role: str = None, start_date: date = None, end_date: date = None, progress_callback=None, columns=None):
+    """
+    Carrega os dados da tabela 'bpd' do MySQL para um DataFrame Pandas.
+    Realiza limpeza inicial dos dados e filtra por usuário/papel e intervalo de datas se fornecido.
+    """
+    conn = get_db_connection()
+    if conn:
+        try:
+            return _load_data(conn, username, user_role, start_date, end_date, progress_callback, columns)
         except Exception as e:
             st.error(f"Erro ao carregar dados do banco de dados: {e}")
             return pd.DataFrame() # Retorna um DataFrame vazio em caso de erro
@@ -134,67 +876,217 @@ def load_data(username: str = None, user_role: str = None, start_date: date = No
             conn.close()
     return pd.DataFrame() # Retorna um DataFrame vazio se a conexão falhar
 
-def save_user_config(username: str, config_type: str, config_value: str):
+def fetch_data(username: str = None, user_role: str = None, start_date: date = None, end_date: date = None, progress_callback=None, columns=None):
+    """
+    Mesma carga de load_data, para threads em segundo plano (a pré-carga): as exceções são
+    lançadas em vez de mostradas com st.error, que só funciona na thread do script.
+    """
+    conn = get_connection_pool().checkout()
+    try:
+        return _load_data(conn, username, user_role, start_date, end_date, progress_callback, columns)
+    finally:
+        conn.close()
+
+# Colunas somadas pelos cards de métricas
+METRIC_COLUMNS = [
+    'hands', 'realWins', 'dolarWins', 'realFee', 'dolarFee',
+    'realRakeback', 'dolarRakeback', 'realRebate', 'dolarRebate'
+]
+
+# Colunas que os filtros avançados podem restringir
+FILTER_COLUMNS = ['playerName', 'club', 'reference', 'agentName']
+
+def _filter_where(filters: dict = None):
+    """
+    Converte as seleções dos filtros avançados ({coluna: [valores]}) em cláusulas IN.
+    Colunas fora de FILTER_COLUMNS são ignoradas.
+    """
+    where_clauses = []
+    params = []
+    for col in FILTER_COLUMNS:
+        values = (filters or {}).get(col)
+        if values:
+            placeholders = ", ".join(["%s"] * len(values))
+            where_clauses.append(f" `{col}` IN ({placeholders})")
+            params.extend(values)
+    return where_clauses, params
+
+def _filters_cache_key(filters: dict = None):
+    return tuple((col, tuple(sorted(map(str, (filters or {}).get(col) or [])))) for col in FILTER_COLUMNS)
+
+def _scoped_where(conn, username: str, user_role: str, start_date: date, end_date: date, filters: dict = None):
+    """
+    Cláusulas de papel, período e filtros avançados das consultas feitas no servidor, restritas
+    às mesmas linhas que load_data mantém. Retorna (coluna de data, cláusulas, parâmetros).
+    """
+    date_column, typed = _bpd_date_column(conn)
+    where_clauses, params = _bpd_scope_where(username, user_role, start_date, end_date, date_column)
+    if not (start_date and end_date):
+        # Mesmas linhas descartadas por load_data quando 'dia' não é uma data
+        where_clauses.append(_valid_date_clause(date_column, typed))
+    filter_clauses, filter_params = _filter_where(filters)
+    return date_column, where_clauses + filter_clauses, params + filter_params
+
+def load_column_totals(username: str = None, user_role: str = None, start_date: date = None, end_date: date = None, filters: dict = None, columns: list = None):
     """
-    Salva as configurações específicas do usuário no banco de dados.
+    Soma no banco as colunas de `columns` no escopo de load_data (pelo rollup diário quando possível).
+    Retorna {coluna: total, 'rows': quantidade de linhas} ou None em caso de erro.
     """
+    columns = [col for col in (columns or []) if col in BPD_COLUMNS]
     conn = get_db_connection()
     if conn:
         try:
+            cache = get_result_cache()
+            watermark = cache.current_watermark(conn)
+            cache_key = ('column_totals', tuple(columns)) + _data_cache_key(username, user_role, start_date, end_date)[1:] + (_filters_cache_key(filters),)
+            totals = cache.get(cache_key, watermark)
+            if totals is not None:
+                return totals
+
+            if get_setting("rollup", "enabled", False) and can_use_rollup(columns, filters) and is_rollup_current(conn, watermark[0], watermark[1] if _has_version_table(conn) else None):
+                # Sem necessidade de linhas individuais: soma o rollup diário em vez da 'bpd'
+                where_clauses, params = _bpd_scope_where(username, user_role, start_date, end_date, 'dia')
+                filter_clauses, filter_params = _filter_where(filters)
+                where_clauses += filter_clauses
+                params += filter_params
+                query = "SELECT SUM(row_count)" + "".join(f", SUM(`{col}`)" for col in columns) + f" FROM {ROLLUP_TABLE}"
+            else:
+                _, where_clauses, params = _scoped_where(conn, username, user_role, start_date, end_date, filters)
+                query = "SELECT COUNT(*)" + "".join(f", SUM(`{col}`)" for col in columns) + " FROM bpd"
+            if where_clauses:
+                query += " WHERE " + " AND ".join(where_clauses)
+
             cursor = conn.cursor()
-            
-            # Cria a tabela de configurações se não existir
-            create_table_query = """
-            CREATE TABLE IF NOT EXISTS user_configs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) NOT NULL,
-                config_type VARCHAR(100) NOT NULL,
-                config_value TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                UNIQUE KEY unique_user_config (username, config_type)
-            )
-            """
-            cursor.execute(create_table_query)
-            
-            # Insere ou atualiza a configuração
-            query = """
-            INSERT INTO user_configs (username, config_type, config_value) 
-            VALUES (%s, %s, %s) 
-            ON DUPLICATE KEY UPDATE config_value = %s, updated_at = CURRENT_TIMESTAMP
-            """
-            cursor.execute(query, (username, config_type, config_value, config_value))
-            conn.commit()
-            return True
+            try:
+                with span('query', source='column_totals'):
+                    cursor.execute(query, params)
+                    row = cursor.fetchone()
+            finally:
+                cursor.close()
+
+            totals = {'rows': int(row[0] or 0)}
+            for col, value in zip(columns, row[1:]):
+                totals[col] = float(value) if value is not None else 0.0
+
+            cache.put(cache_key, watermark, totals)
+            return totals
         except Exception as e:
-            st.error(f"Erro ao salvar configuração do usuário: {e}")
-            return False
+            st.error(f"Erro ao calcular os totais no banco de dados: {e}")
+            return None
         finally:
             conn.close()
-    return False
+    return None
 
-def load_user_config(username: str, config_type: str, default_value=None):
+def load_metric_totals(username: str = None, user_role: str = None, start_date: date = None, end_date: date = None, filters: dict = None):
     """
-    Carrega uma configuração específica do usuário do banco de dados.
+    Calcula no MySQL as somas usadas pelos cards de métricas (veja load_column_totals).
+    Retorna {coluna: total, 'rows': quantidade de linhas} ou None em caso de erro.
+    """
+    return load_column_totals(username, user_role, start_date, end_date, filters, METRIC_COLUMNS)
+
+def load_filter_options(username: str = None, user_role: str = None, start_date: date = None, end_date: date = None):
+    """
+    Busca os valores dos filtros avançados no escopo do usuário e do período, sem carregar as linhas.
+    Retorna {coluna: [valores ordenados]} ou None em caso de erro.
     """
     conn = get_db_connection()
     if conn:
         try:
+            cache = get_result_cache()
+            watermark = cache.current_watermark(conn)
+            cache_key = ('filter_options',) + _data_cache_key(username, user_role, start_date, end_date)[1:]
+            options = cache.get(cache_key, watermark)
+            if options is not None:
+                return options
+
+            if user_role != 'Jogador':
+                # Sem restrição de jogador: as opções vêm das tabelas de dimensão
+                start_key, end_key = _data_cache_key(username, user_role, start_date, end_date)[3:]
+                options = {col: _dimension_values(conn, col, start_key, end_key) for col in FILTER_COLUMNS}
+                cache.put(cache_key, watermark, options)
+                return options
+
+            _, where_clauses, params = _scoped_where(conn, username, user_role, start_date, end_date)
+            options = {}
             cursor = conn.cursor()
-            query = "SELECT config_value FROM user_configs WHERE username = %s AND config_type = %s"
-            cursor.execute(query, (username, config_type))
-            result = cursor.fetchone()
-            
-            if result:
-                return result[0]
-            else:
-                return default_value
+            try:
+                for col in FILTER_COLUMNS:
+                    query = f"SELECT DISTINCT `{col}` FROM bpd WHERE " + " AND ".join(where_clauses + [f" `{col}` IS NOT NULL"])
+                    with span('query', source=f'distinct_{col}'):
+                        cursor.execute(query, params)
+                        options[col] = sorted(str(row[0]) for row in cursor.fetchall())
+            finally:
+                cursor.close()
+
+            cache.put(cache_key, watermark, options)
+            return options
+        except Exception as e:
+            st.error(f"Erro ao carregar as opções dos filtros: {e}")
+            return None
+        finally:
+            conn.close()
+    return None
+
+_PAGE_KEY_COLUMN = '__page_key'
+
+def _read_bpd_page(conn, username: str, user_role: str, start_date: date, end_date: date, filters: dict, columns: list, page_size: int, after_key=None, offset: int = 0, from_end: bool = False):
+    """Lê uma página do escopo a partir da chave `after_key`; veja load_bpd_page."""
+    date_column, where_clauses, params = _scoped_where(conn, username, user_role, start_date, end_date, filters)
+    if after_key is not None and not from_end:
+        # Comparação de tupla: o MySQL resolve como uma única faixa do índice (data, linha_id)
+        where_clauses.append(f" ({date_column}, linha_id) > (%s, %s)")
+        params += [after_key[0], after_key[1]]
+
+    # A chave da página usa o valor bruto da data: um 'dia' em texto que não vira data (NaT)
+    # continua sendo uma chave válida no banco
+    query = ("SELECT " + ", ".join(f"`{col}`" for col in _projected_columns(columns))
+             + f", {date_column} AS {_PAGE_KEY_COLUMN} FROM bpd")
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+    direction = " DESC" if from_end else ""
+    query += f" ORDER BY {date_column}{direction}, linha_id{direction} LIMIT %s OFFSET %s"
+
+    df = _stream_bpd(conn, query, params + [int(page_size), int(offset)], int(page_size))
+    if df.empty:
+        return df.drop(columns=[_PAGE_KEY_COLUMN]), None
+    if from_end:
+        df = df.iloc[::-1].reset_index(drop=True)
+    last_row = df.iloc[-1]
+    return df.drop(columns=[_PAGE_KEY_COLUMN]), (last_row[_PAGE_KEY_COLUMN], int(last_row['linha_id']))
+
+def load_bpd_page(username: str = None, user_role: str = None, start_date: date = None, end_date: date = None, filters: dict = None, columns: list = None, page_size: int = 50, after_key=None, offset: int = 0, from_end: bool = False):
+    """
+    Lê uma página do escopo em ordem (data, linha_id), continuando da chave `after_key`.
+    Retorna (DataFrame da página, chave da última linha), ou (DataFrame vazio, None) em caso de erro.
+    """
+    conn = get_db_connection()
+    if conn:
+        try:
+            return _read_bpd_page(conn, username, user_role, start_date, end_date, filters, columns, page_size, after_key, offset, from_end)
         except Exception as e:
-            st.error(f"Erro ao carregar configuração do usuário: {e}")
-            return default_value
+            st.error(f"Erro ao carregar a página da tabela: {e}")
+            return pd.DataFrame(), None
+        finally:
+            conn.close()
+    return pd.DataFrame(), None
+
+def iter_bpd_pages(pool, username: str = None, user_role: str = None, start_date: date = None, end_date: date = None, filters: dict = None, columns: list = None, page_size: int = 50000):
+    """
+    Percorre o escopo em páginas de `page_size` linhas, com uma conexão do `pool` por página.
+    Erros são propagados para quem consome o iterador.
+    """
+    after_key = None
+    while True:
+        conn = pool.checkout()
+        try:
+            df, after_key = _read_bpd_page(conn, username, user_role, start_date, end_date, filters, columns, page_size, after_key)
         finally:
             conn.close()
-    return default_value
+        if df.empty:
+            return
+        yield df
+        if len(df) < page_size:
+            return
 
 def save_config(config_data):
     """
@@ -235,17 +1127,26 @@ def load_config():
             conn.close()
     return config
 
+def _dimension_values(conn, column: str, start_date: str = None, end_date: str = None) -> list:
+    """Retorna os nomes da dimensão de `column` (veja dimensions.py), opcionalmente restritos ao período."""
+    cache = get_result_cache()
+    watermark = cache.current_watermark(conn)
+    cache_key = ('dimension', column, start_date, end_date)
+    values = cache.get(cache_key, watermark)
+    if values is None:
+        date_column, typed = _bpd_date_column(conn)
+        with span('query', source=f'dimension_{column}'):
+            values = fetch_dimension_values(conn, column, date_column, typed, start_date, end_date)
+        cache.put(cache_key, watermark, values)
+    return values
+
 def get_all_players(conn):
     """
-    Retorna uma lista de todos os playerNames distintos da tabela bpd.
+    Retorna uma lista de todos os playerNames da tabela bpd (lidos da dimensão dim_player).
     """
     if conn:
         try:
-            cursor = conn.cursor()
-            query = "SELECT DISTINCT playerName FROM bpd"
-            cursor.execute(query)
-            players = [row[0] for row in cursor.fetchall()]
-            return players
+            return list(_dimension_values(conn, 'playerName'))
         except Exception as e:
             st.error(f"Erro ao buscar players: {e}")
             return []
@@ -253,15 +1154,11 @@ def get_all_players(conn):
 
 def get_all_agents(conn):
     """
-    Retorna uma lista de todos os agentNames distintos da tabela bpd.
+    Retorna uma lista de todos os agentNames da tabela bpd (lidos da dimensão dim_agent).
     """
     if conn:
         try:
-            cursor = conn.cursor()
-            query = "SELECT DISTINCT agentName FROM bpd"
-            cursor.execute(query)
-            agents = [row[0] for row in cursor.fetchall()]
-            return agents
+            return list(_dimension_values(conn, 'agentName'))
         except Exception as e:
             st.error(f"Erro ao buscar agents: {e}")
             return []
@@ -269,15 +1166,11 @@ def get_all_agents(conn):
 
 def get_all_superagents(conn):
     """
-    Retorna uma lista de todos os superAgentNames distintos da tabela bpd.
+    Retorna uma lista de todos os superAgentNames da tabela bpd (lidos da dimensão dim_superagent).
     """
     if conn:
         try:
-            cursor = conn.cursor()
-            query = "SELECT DISTINCT superAgentName FROM bpd"
-            cursor.execute(query)
-            superagents = [row[0] for row in cursor.fetchall()]
-            return superagents
+            return list(_dimension_values(conn, 'superAgentName'))
         except Exception as e:
             st.error(f"Erro ao buscar superagents: {e}")
             return []
@@ -285,20 +1178,15 @@ def get_all_superagents(conn):
 
 def load_user_names():
     """
-    Carrega apenas os nomes de jogadores e agentes da tabela bpd para uso no login.
+    Carrega apenas os nomes de jogadores e agentes (das dimensões) para uso no login.
     """
     conn = get_db_connection()
     player_names = []
     agent_names = []
     if conn:
         try:
-            cursor = conn.cursor()
-            # Busca playerNames
-            cursor.execute("SELECT DISTINCT playerName FROM bpd")
-            player_names = [row[0] for row in cursor.fetchall() if row[0] is not None]
-            # Busca agentNames
-            cursor.execute("SELECT DISTINCT agentName FROM bpd")
-            agent_names = [row[0] for row in cursor.fetchall() if row[0] is not None]
+            player_names = list(_dimension_values(conn, 'playerName'))
+            agent_names = list(_dimension_values(conn, 'agentName'))
         except Exception as e:
             st.error(f"Erro ao carregar nomes de usuários para login: {e}")
         finally:
@@ -324,6 +1212,60 @@ def get_user_info(username: str):
             conn.close()
     return None
 
+def get_user_credentials(username: str):
+    """
+    Busca um usuário pelo username para o login.
+    Retorna (usuário ou None, erro), com erro True se o banco não pôde ser consultado.
+    """
+    conn = get_db_connection()
+    if conn:
+        try:
+            cursor = conn.cursor(dictionary=True)
+            query = "SELECT username, password, user_type FROM users WHERE username = %s LIMIT 1"
+            cursor.execute(query, (username,))
+            user = cursor.fetchone()
+            cursor.close()
+            return user, False
+        except Exception as e:
+            st.error(f"Erro ao buscar usuário para o login: {e}")
+            return None, True
+        finally:
+            conn.close()
+    return None, True
+
+# Resultado positivo da verificação da coluna users.password; enquanto ela for estreita demais,
+# a verificação é repetida a cada chamada (a migração pode rodar com o app no ar)
+_password_column_ok = False
+
+PASSWORD_COLUMN_ERROR = (
+    "A coluna users.password é pequena demais para guardar o hash da senha. "
+    "Execute update_users_table.py para ampliá-la."
+)
+
+def _password_column_fits_hash(conn) -> bool:
+    """
+    Indica se a coluna users.password comporta o hash PBKDF2 (veja passwords.PASSWORD_HASH_LENGTH).
+    Numa coluna estreita o hash seria truncado (ou recusado) e o usuário não conseguiria mais entrar.
+    """
+    global _password_column_ok
+    if not _password_column_ok:
+        max_length = conn.backend.column_max_length(conn, 'users', 'password')
+        _password_column_ok = max_length is None or max_length >= PASSWORD_HASH_LENGTH
+    return _password_column_ok
+
+def password_column_fits_hash() -> bool:
+    """Versão de _password_column_fits_hash com conexão própria (False se o banco falhar)."""
+    conn = get_db_connection()
+    if conn:
+        try:
+            return _password_column_fits_hash(conn)
+        except Exception as e:
+            logger.error("Erro ao verificar a coluna users.password: %s", e)
+            return False
+        finally:
+            conn.close()
+    return False
+
 def update_user_password(username: str, new_password: str):
     """
     Atualiza a senha do usuário na tabela users.
@@ -331,9 +1273,13 @@ def update_user_password(username: str, new_password: str):
     conn = get_db_connection()
     if conn:
         try:
+            if not _password_column_fits_hash(conn):
+                st.error(PASSWORD_COLUMN_ERROR)
+                return False
             cursor = conn.cursor()
+            # A senha é guardada como hash PBKDF2 com salt, nunca em texto puro
             query = "UPDATE users SET password = %s WHERE username = %s"
-            cursor.execute(query, (new_password, username))
+            cursor.execute(query, (hash_password(new_password), username))
             conn.commit()
             return cursor.rowcount > 0
         except Exception as e:
@@ -376,12 +1322,16 @@ def create_user_if_not_exists(username: str, email: str = None, password: str =
             if cursor.fetchone():
                 return True  # Usuário já existe
             
+            if password and not _password_column_fits_hash(conn):
+                st.error(PASSWORD_COLUMN_ERROR)
+                return False
+
             # Criar novo usuário
             query = """
             INSERT INTO users (username, email, password, user_type) 
             VALUES (%s, %s, %s, %s)
             """
-            cursor.execute(query, (username, email, password, role))
+            cursor.execute(query, (username, email, hash_password(password) if password else password, role))
             conn.commit()
             return True
             
@@ -0,0 +1,155 @@
+import threading
+from etl_state import ETL_STATE_DDL, date_expression, get_etl_position, set_etl_position
+
+# Tabela de dimensão de cada coluna de nomes da tabela 'bpd'
+DIMENSION_TABLES = {
+    'playerName': 'dim_player',
+    'agentName': 'dim_agent',
+    'superAgentName': 'dim_superagent',
+    'club': 'dim_club',
+    'reference': 'dim_reference',
+}
+
+# Nome do job na tabela etl_state
+DIMENSIONS_JOB = 'dimensions'
+
+# A chave `name` usa comparação binária: com utf8mb4_unicode_ci, "José" e "jose" virariam um
+# único nome, que o filtro exato em memória não encontra nas linhas
+DIMENSION_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    first_seen DATE NULL,
+    last_seen DATE NULL,
+    UNIQUE KEY uq_{table}_name (name),
+    INDEX idx_{table}_seen (first_seen, last_seen)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+# Novos nomes entram com o período em que apareceram; nomes já conhecidos só alargam o período
+DIMENSION_UPSERT = """
+INSERT INTO {table} (name, first_seen, last_seen)
+SELECT {name_expr}, MIN({date_expr}), MAX({date_expr})
+FROM bpd
+WHERE linha_id > %s AND linha_id <= %s AND `{column}` IS NOT NULL AND `{column}` != ''
+GROUP BY {name_expr}
+ON DUPLICATE KEY UPDATE
+    first_seen = LEAST(COALESCE(first_seen, VALUES(first_seen)), COALESCE(VALUES(first_seen), first_seen)),
+    last_seen = GREATEST(COALESCE(last_seen, VALUES(last_seen)), COALESCE(VALUES(last_seen), last_seen))
+"""
+
+def name_expression(conn, column: str) -> str:
+    """
+    Expressão SQL da coluna de nomes da 'bpd' com comparação binária, para que GROUP BY e
+    DISTINCT não unam nomes que diferem só em acentos ou maiúsculas (no SQLite já é assim).
+    """
+    if conn.backend.name == 'mysql':
+        return f"CONVERT(`{column}` USING utf8mb4) COLLATE utf8mb4_bin"
+    return f"`{column}`"
+
+_tables_ready = False
+_refresh_lock = threading.Lock()
+
+def ensure_dimension_tables(conn):
+    """
+    Cria as tabelas de dimensão e a etl_state se não existirem (uma vez por processo).
+    Tabelas criadas antes com `name` em utf8mb4_unicode_ci passam para utf8mb4_bin e são
+    recarregadas do início, já que os nomes que diferiam só em acentos ou maiúsculas foram unidos.
+    Chamado só pelo job de ETL (etl.py), que roda com um usuário com permissão de CREATE.
+    """
+    global _tables_ready
+    if _tables_ready:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(ETL_STATE_DDL)
+        for table in DIMENSION_TABLES.values():
+            cursor.execute(DIMENSION_DDL.format(table=table))
+        if conn.backend.name == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+                "AND COLUMN_NAME = 'name' AND COLLATION_NAME != 'utf8mb4_bin' AND TABLE_NAME IN ("
+                + ", ".join(["%s"] * len(DIMENSION_TABLES)) + ")",
+                list(DIMENSION_TABLES.values())
+            )
+            merged_tables = [row[0] for row in cursor.fetchall()]
+            for table in merged_tables:
+                cursor.execute(f"TRUNCATE TABLE {table}")
+                cursor.execute(f"ALTER TABLE {table} MODIFY name VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL")
+            if merged_tables:
+                set_etl_position(cursor, DIMENSIONS_JOB, 0, force=True)
+        conn.commit()
+    finally:
+        cursor.close()
+    _tables_ready = True
+
+def refresh_dimensions(conn, date_column: str, typed: bool, max_linha_id, batch_rows: int = 500000, rebuild: bool = False):
+    """
+    Leva para as dimensões as linhas da 'bpd' com linha_id entre o último processado
+    (guardado na etl_state) e `max_linha_id`, em faixas de `batch_rows` ids. Cada faixa é
+    gravada junto com o novo estado, então uma interrupção continua de onde parou. Com
+    `rebuild`, as dimensões são esvaziadas e recarregadas desde o início.
+    Retorna o último linha_id processado.
+    """
+    ensure_dimension_tables(conn)
+    if max_linha_id is None:
+        return 0
+
+    with _refresh_lock:
+        cursor = conn.cursor()
+        try:
+            if rebuild:
+                for table in DIMENSION_TABLES.values():
+                    cursor.execute(f"TRUNCATE TABLE {table}")
+                set_etl_position(cursor, DIMENSIONS_JOB, 0, force=True)
+                conn.commit()
+            last_linha_id = get_etl_position(cursor, DIMENSIONS_JOB)
+
+            date_expr = date_expression(date_column, typed)
+            while last_linha_id < max_linha_id:
+                upper = min(last_linha_id + batch_rows, max_linha_id)
+                for column, table in DIMENSION_TABLES.items():
+                    cursor.execute(DIMENSION_UPSERT.format(table=table, column=column, name_expr=name_expression(conn, column), date_expr=date_expr), (last_linha_id, upper))
+                set_etl_position(cursor, DIMENSIONS_JOB, upper)
+                conn.commit()
+                last_linha_id = upper
+            return last_linha_id
+        finally:
+            cursor.close()
+
+def fetch_dimension_values(conn, column: str, date_column: str, typed: bool, start_date: str = None, end_date: str = None) -> list:
+    """
+    Retorna os nomes da dimensão da coluna, em ordem. Com período, só os nomes cujo intervalo
+    entre a primeira e a última aparição cruza o período (o que inclui quem não tem linhas no
+    período, mas apareceu antes e depois dele; o dashboard em memória restringe as opções às
+    linhas carregadas).
+    As dimensões só são atualizadas pelo job de ETL; os nomes das linhas que chegaram depois da
+    última execução (ou de todas as linhas, se o job nunca rodou) são lidos direto da 'bpd'.
+    """
+    cursor = conn.cursor()
+    try:
+        try:
+            last_linha_id = get_etl_position(cursor, DIMENSIONS_JOB)
+            query = f"SELECT name FROM {DIMENSION_TABLES[column]}"
+            params = []
+            if start_date and end_date:
+                query += " WHERE first_seen <= %s AND last_seen >= %s"
+                params = [end_date, start_date]
+            cursor.execute(query, params)
+            names = {str(row[0]) for row in cursor.fetchall()}
+        except Exception:
+            # Tabelas ainda não criadas pelo job de ETL
+            conn.rollback()
+            last_linha_id, names = 0, set()
+
+        date_expr = date_expression(date_column, typed)
+        query = f"SELECT DISTINCT {name_expression(conn, column)} FROM bpd WHERE linha_id > %s AND `{column}` IS NOT NULL AND `{column}` != ''"
+        params = [last_linha_id]
+        if start_date and end_date:
+            query += f" AND {date_expr} BETWEEN %s AND %s"
+            params += [start_date, end_date]
+        cursor.execute(query, params)
+        names.update(str(row[0]) for row in cursor.fetchall())
+        return sorted(names)
+    finally:
+        cursor.close()
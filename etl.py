@@ -0,0 +1,35 @@
+"""
+Jobs de ETL da tabela bpd, executados fora do dashboard (por exemplo, num cron a cada poucos
+minutos), com um usuário do banco que tenha permissão de CREATE:
+- dimensões de nomes (dim_player, dim_agent, ...): recebem os nomes das linhas novas;
+- rollup diário (bpd_daily_rollup): recalcula os dias com linhas novas, alteradas ou apagadas,
+  detectados pelo checksum de cada dia.
+
+O dashboard só lê essas tabelas. As credenciais vêm do secrets.toml ([mysql]) e podem ser
+trocadas pelas variáveis de ambiente BPD_MYSQL_<CHAVE> (por exemplo, BPD_MYSQL_USER e
+BPD_MYSQL_PASSWORD de um usuário de ETL).
+
+Uso:
+    python etl.py [--rebuild]
+"""
+import argparse
+import sys
+import time
+from database import run_etl
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild', action='store_true', help="Recarrega as dimensões e recalcula todos os dias do rollup, em vez de só as mudanças")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        run_etl(rebuild=args.rebuild, progress=print)
+    except Exception as e:
+        print(f"Erro no ETL: {e}", file=sys.stderr)
+        return 1
+    print(f"ETL concluído em {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+# Posição de cada job incremental sobre a tabela 'bpd': o último linha_id já processado
+ETL_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS etl_state (
+    job_name VARCHAR(64) NOT NULL PRIMARY KEY,
+    last_linha_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+def get_etl_position(cursor, job_name: str) -> int:
+    """Retorna o último linha_id processado pelo job (0 se ele nunca rodou)."""
+    cursor.execute("SELECT last_linha_id FROM etl_state WHERE job_name = %s", (job_name,))
+    row = cursor.fetchone()
+    return int(row[0]) if row else 0
+
+def set_etl_position(cursor, job_name: str, last_linha_id: int, force: bool = False):
+    """
+    Registra o último linha_id processado pelo job. Sem `force`, a posição nunca recua.
+    """
+    update = "VALUES(last_linha_id)" if force else "GREATEST(last_linha_id, VALUES(last_linha_id))"
+    cursor.execute(
+        "INSERT INTO etl_state (job_name, last_linha_id) VALUES (%s, %s) "
+        f"ON DUPLICATE KEY UPDATE last_linha_id = {update}",
+        (job_name, last_linha_id)
+    )
+
+def date_expression(date_column: str, typed: bool) -> str:
+    """Expressão SQL da data de uma linha da 'bpd' (NULL quando 'dia' não é uma data válida)."""
+    if typed:
+        return date_column
+    # 'dia' em texto: só valores no formato YYYY-MM-DD contam como data
+    return f"CASE WHEN {date_column} LIKE '____-__-__' THEN {date_column} END"
@@ -0,0 +1,207 @@
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from exporter import WRITERS
+from utils import get_setting
+from instrumentation import logger, span
+
+class ExportQueueFull(RuntimeError):
+    """A fila de exportações está cheia ou o usuário já tem uma exportação em andamento."""
+
+class ExportCancelled(Exception):
+    pass
+
+class ExportTooLarge(Exception):
+    """O arquivo da exportação passou do tamanho máximo permitido."""
+
+class ExportJob:
+    """
+    Uma exportação em segundo plano. O arquivo é gravado num SpooledTemporaryFile: fica na
+    memória até `spool_max_size` bytes e passa para o disco a partir daí. Se passar de
+    `max_file_size` bytes a exportação para com erro (veja read_bytes).
+    """
+
+    def __init__(self, owner: str, export_format: str, columns: list, total_rows: int = None, spool_max_size: int = 32 * 1024 * 1024, max_file_size: int = None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.export_format = export_format
+        self.columns = list(columns)
+        self.total_rows = total_rows
+        self.rows_written = 0
+        self.status = 'queued'  # queued, running, done, error, cancelled
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.max_file_size = max_file_size
+        self._cancel = threading.Event()
+        self._file = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+        self._file_lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    @property
+    def progress(self) -> float:
+        """Fração gravada (0 a 1), ou None se o total de linhas não for conhecido."""
+        if self.status == 'done':
+            return 1.0
+        if not self.total_rows:
+            return None
+        return min(self.rows_written / self.total_rows, 1.0)
+
+    def _check_size(self):
+        # Chamar na thread do job, que segura o _file_lock durante a gravação
+        if self.max_file_size and self._file.tell() > self.max_file_size:
+            raise ExportTooLarge(
+                f"O arquivo passou do limite de {self.max_file_size / (1024 * 1024):g} MB das exportações. "
+                "Aplique filtros ou selecione menos colunas."
+            )
+
+    def _on_progress(self, rows_written: int):
+        # Chamado pelo gravador a cada fatia; é onde um cancelamento ou o limite de tamanho
+        # interrompem a exportação
+        self.rows_written = rows_written
+        if self._cancel.is_set():
+            raise ExportCancelled()
+        self._check_size()
+
+    def read_bytes(self) -> bytes:
+        """
+        Conteúdo do arquivo terminado. O download_button do Streamlit não transmite arquivos
+        aos pedaços: o conteúdo inteiro fica na memória do servidor enquanto o download estiver
+        disponível, por isso o tamanho dos arquivos é limitado por `max_file_size`.
+        """
+        with self._file_lock:
+            self._file.seek(0)
+            return self._file.read()
+
+    def close(self):
+        with self._file_lock:
+            self._file.close()
+
+class ExportJobQueue:
+    """
+    Fila de exportações executadas por um pool de threads, fora da thread do script do
+    Streamlit. No máximo `max_concurrent` exportações rodam ao mesmo tempo e até `max_queued`
+    esperam a vez; cada usuário tem no máximo uma exportação ativa. Os arquivos terminados
+    ficam disponíveis por `job_ttl` segundos e não podem passar de `max_file_size` bytes.
+    """
+
+    def __init__(self, max_concurrent: int = 2, max_queued: int = 4, spool_max_size: int = 32 * 1024 * 1024, job_ttl: float = 1800.0, max_file_size: int = 200 * 1024 * 1024):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.spool_max_size = spool_max_size
+        self.max_file_size = max_file_size
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="export-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, export_format: str, columns: list, chunks_factory, totals_row: dict = None, total_rows: int = None) -> ExportJob:
+        """
+        Enfileira uma exportação. `chunks_factory()` é chamado na thread do job e deve retornar
+        um iterador de DataFrames (as fatias a gravar). Lança ExportQueueFull se a fila estiver
+        cheia ou se `owner` já tiver uma exportação ativa.
+        """
+        self._expire()
+        job = ExportJob(owner, export_format, columns, total_rows, self.spool_max_size, self.max_file_size)
+        with self._lock:
+            active = [j for j in self._jobs.values() if j.active]
+            if any(j.owner == owner for j in active):
+                job.close()
+                raise ExportQueueFull("Já existe uma exportação em andamento. Aguarde ela terminar ou cancele-a.")
+            if len(active) >= self.max_concurrent + self.max_queued:
+                job.close()
+                raise ExportQueueFull("Muitas exportações em andamento no servidor. Tente novamente em alguns minutos.")
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, chunks_factory, totals_row)
+        return job
+
+    def _run(self, job: ExportJob, chunks_factory, totals_row: dict):
+        if job._cancel.is_set():
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+            job.close()
+            return
+        job.status = 'running'
+        try:
+            with job._file_lock, span('export', format=job.export_format, owner=job.owner) as export_span:
+                WRITERS[job.export_format](chunks_factory(), job.columns, job._file, totals_row, progress_callback=job._on_progress)
+                # O XLSX só é gravado no arquivo ao final
+                job._check_size()
+                export_span.set(rows=job.rows_written)
+            if job._cancel.is_set():
+                # Descartada enquanto o gravador terminava: já saiu da fila e ninguém mais fecha o arquivo
+                raise ExportCancelled()
+            job.status = 'done'
+        except ExportCancelled:
+            job.status = 'cancelled'
+            job.close()
+        except Exception as e:
+            logger.error("Falha na exportação %s de %s: %s", job.export_format, job.owner, e)
+            job.error = str(e)
+            job.status = 'error'
+            job.close()
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> ExportJob:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs_for(self, owner: str) -> list:
+        """Exportações do usuário, da mais recente para a mais antiga."""
+        self._expire()
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str):
+        job = self.get(job_id)
+        if job is not None and job.active:
+            job._cancel.set()
+
+    def discard(self, job_id: str):
+        """Cancela (se ainda ativa) e remove a exportação, liberando o arquivo."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is None:
+            return
+        if job.active:
+            job._cancel.set()  # A thread do job fecha o arquivo ao parar
+        else:
+            job.close()
+
+    def _expire(self):
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.finished_at is not None and now - job.finished_at > self.job_ttl]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            job.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ('queued', 'running', 'done', 'error', 'cancelled')}
+
+@st.cache_resource
+def get_export_job_queue():
+    """
+    Retorna a fila de exportações do processo. Os limites podem ser ajustados na seção [export]
+    do secrets.toml: max_concurrent_jobs, max_queued_jobs, spool_max_mb (tamanho a partir do
+    qual o arquivo vai para o disco), max_file_mb (tamanho máximo do arquivo, 200 MB por padrão;
+    o download é servido da memória) e job_ttl_minutes (por quanto tempo o arquivo fica disponível).
+    """
+    return ExportJobQueue(
+        max_concurrent=int(get_setting("export", "max_concurrent_jobs", 2)),
+        max_queued=int(get_setting("export", "max_queued_jobs", 4)),
+        spool_max_size=int(float(get_setting("export", "spool_max_mb", 32)) * 1024 * 1024),
+        job_ttl=float(get_setting("export", "job_ttl_minutes", 30)) * 60,
+        max_file_size=int(float(get_setting("export", "max_file_mb", 200)) * 1024 * 1024),
+    )
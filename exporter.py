@@ -0,0 +1,113 @@
+import io
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+try:
+    from openpyxl import Workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    Workbook = None
+    OPENPYXL_AVAILABLE = False
+
+EXPORT_FORMATS = {
+    'csv': {'mime': 'text/csv', 'file_name': 'dados_tabela.csv'},
+    'xlsx': {'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'file_name': 'dados_tabela.xlsx'},
+}
+
+# Linhas convertidas por vez ao gravar os arquivos
+EXPORT_CHUNK_ROWS = 50000
+
+def build_totals_row(columns: list, sums: dict) -> dict:
+    """
+    Monta a linha de totais da exportação: as somas nas colunas mensuráveis, vazio nas demais
+    e o rótulo "TOTAL GERAL" na primeira coluna.
+    """
+    totals_row_data = {col: "" for col in columns}
+    totals_row_data.update({col: value for col, value in sums.items() if col in totals_row_data})
+    if columns:
+        totals_row_data[columns[0]] = "TOTAL GERAL"
+    return totals_row_data
+
+def iter_frame_chunks(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Percorre o DataFrame em fatias de `chunk_rows` linhas, sem copiá-lo."""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def write_csv(chunks, columns: list, fileobj, totals_row: dict = None, progress_callback=None):
+    """
+    Grava o CSV (UTF-8) em `fileobj` (binário) fatia por fatia: só uma fatia convertida para
+    texto fica na memória por vez. `progress_callback(linhas_gravadas)` é chamado a cada fatia.
+    """
+    fileobj.write((",".join(columns) + "\n").encode('utf-8'))
+    rows_written = 0
+    for chunk in chunks:
+        fileobj.write(chunk[columns].to_csv(index=False, header=False).encode('utf-8'))
+        rows_written += len(chunk)
+        if progress_callback:
+            progress_callback(rows_written)
+    if totals_row:
+        fileobj.write(pd.DataFrame([totals_row], columns=columns).to_csv(index=False, header=False).encode('utf-8'))
+    return rows_written
+
+def _excel_values(chunk: pd.DataFrame):
+    # Categorias viram texto e ausentes viram células vazias
+    values = chunk.astype(object)
+    return values.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+def write_xlsx(chunks, columns: list, fileobj, totals_row: dict = None, progress_callback=None):
+    """
+    Grava o XLSX em `fileobj` com o openpyxl em modo write-only, que escreve as linhas em
+    sequência sem montar a planilha inteira na memória.
+    """
+    if not OPENPYXL_AVAILABLE:
+        raise RuntimeError("openpyxl não está instalado; exportação XLSX indisponível")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    rows_written = 0
+    for chunk in chunks:
+        for row in _excel_values(chunk[columns]):
+            sheet.append(row)
+        rows_written += len(chunk)
+        if progress_callback:
+            progress_callback(rows_written)
+    if totals_row:
+        sheet.append([totals_row.get(col, "") for col in columns])
+    workbook.save(fileobj)
+    return rows_written
+
+WRITERS = {'csv': write_csv, 'xlsx': write_xlsx}
+
+_export_cache = OrderedDict()
+_export_lock = threading.Lock()
+EXPORT_CACHE_SIZE = 4
+
+def get_export(df: pd.DataFrame, columns: list, export_format: str, totals_row: dict = None, version: str = None) -> bytes:
+    """
+    Gera (sob demanda) o arquivo de exportação do DataFrame com as colunas informadas e a linha de
+    totais. Com `version` (token de get_dataset_version), o arquivo fica em cache pela versão,
+    colunas e formato, então pedir o mesmo download de novo não gera o arquivo outra vez.
+    """
+    cache_key = (version, tuple(columns), export_format) if version is not None else None
+    if cache_key is not None:
+        with _export_lock:
+            data = _export_cache.get(cache_key)
+            if data is not None:
+                _export_cache.move_to_end(cache_key)
+                return data
+
+    buffer = io.BytesIO()
+    WRITERS[export_format](iter_frame_chunks(df), columns, buffer, totals_row)
+    data = buffer.getvalue()
+
+    if cache_key is not None:
+        with _export_lock:
+            _export_cache[cache_key] = data
+            while len(_export_cache) > EXPORT_CACHE_SIZE:
+                _export_cache.popitem(last=False)
+    return data
+
+def is_export_cached(columns: list, export_format: str, version: str) -> bool:
+    with _export_lock:
+        return (version, tuple(columns), export_format) in _export_cache
@@ -1,165 +1,139 @@
 import streamlit as st
 import pandas as pd
+from filter_engine import apply_filters, get_filter_index
+from bpd_schema import get_dataset_version
 
-def display_filters(df_original: pd.DataFrame) -> pd.DataFrame:
-    df_filtered = df_original.copy() # Começa com o DataFrame original
+# Chave do session_state, coluna filtrada e opção "todos" de cada filtro avançado
+FILTER_STATE = [
+    ("player_filter_value", "playerName", "Todos os Jogadores"),
+    ("club_filter_value", "club", "Todos os Clubes"),
+    ("reference_filter_value", "reference", "Todas as Referências"),
+    ("agent_filter_value", "agentName", "Todos os Agentes"),
+]
 
+def get_active_filter_values() -> dict:
+    """
+    Retorna as seleções atuais dos filtros avançados como {coluna: [valores]}, sem as
+    opções "Todos", para que as consultas no banco apliquem os mesmos filtros da tela.
+    """
+    active = {}
+    for state_key, column, all_option in FILTER_STATE:
+        values = st.session_state.get(state_key, [all_option])
+        if values and all_option not in values:
+            active[column] = list(values)
+    return active
+
+# Rótulo do seletor e chave do widget de cada filtro, na ordem das colunas da tela
+FILTER_WIDGETS = {
+    "playerName": ("Filtrar por Jogador:", "player_filter"),
+    "club": ("Filtrar por Clube:", "club_filter"),
+    "reference": ("Filtrar por Referência:", "reference_filter"),
+    "agentName": ("Filtrar por Agente:", "agent_filter"),
+}
+
+def reset_filters_on_change(data_key):
+    """Limpa os filtros avançados quando `data_key` (os dados exibidos) muda."""
+    if "last_data_hash" not in st.session_state:
+        st.session_state["last_data_hash"] = data_key
+    elif st.session_state["last_data_hash"] != data_key:
+        for state_key, _, all_option in FILTER_STATE:
+            st.session_state[state_key] = [all_option]
+        st.session_state["last_data_hash"] = data_key
+
+def display_filter_controls(filter_options: dict, data_key) -> dict:
+    """
+    Desenha os filtros avançados a partir das listas de opções ({coluna: [valores]}) e retorna
+    as seleções como {coluna: [valores]}, incluindo as opções "Todos". `data_key` identifica os
+    dados exibidos: quando ele muda (por exemplo, outro período), os filtros são limpos.
+    """
     # Inicializa o session_state para os filtros se não existirem
-    if "player_filter_value" not in st.session_state:
-        st.session_state["player_filter_value"] = ["Todos os Jogadores"]
-    if "reference_filter_value" not in st.session_state:
-        st.session_state["reference_filter_value"] = ["Todas as Referências"]
-    if "club_filter_value" not in st.session_state:
-        st.session_state["club_filter_value"] = ["Todos os Clubes"]
-    if "agent_filter_value" not in st.session_state:
-        st.session_state["agent_filter_value"] = ["Todos os Agentes"]
-    
+    for state_key, _, all_option in FILTER_STATE:
+        if state_key not in st.session_state:
+            st.session_state[state_key] = [all_option]
+
     # Verifica se os dados mudaram significativamente (mudança de período)
     # Se sim, limpa os filtros para evitar valores inválidos
-    current_data_hash = hash(str(df_original.shape) + str(sorted(df_original['playerName'].dropna().unique()[:10])))
-    if "last_data_hash" not in st.session_state:
-        st.session_state["last_data_hash"] = current_data_hash
-    elif st.session_state["last_data_hash"] != current_data_hash:
-        # Dados mudaram, limpar filtros
-        st.session_state["player_filter_value"] = ["Todos os Jogadores"]
-        st.session_state["reference_filter_value"] = ["Todas as Referências"]
-        st.session_state["club_filter_value"] = ["Todos os Clubes"]
-        st.session_state["agent_filter_value"] = ["Todos os Agentes"]
-        st.session_state["last_data_hash"] = current_data_hash
+    reset_filters_on_change(data_key)
 
     # --- Botão Limpar Filtros ---
     if st.button("Limpar Filtros", key="clear_filters_button"):
-        st.session_state["player_filter_value"] = ["Todos os Jogadores"]
-        st.session_state["reference_filter_value"] = ["Todas as Referências"]
-        st.session_state["club_filter_value"] = ["Todos os Clubes"]
-        st.session_state["agent_filter_value"] = ["Todos os Agentes"]
+        for state_key, _, all_option in FILTER_STATE:
+            st.session_state[state_key] = [all_option]
         st.rerun() # Recarregar a página para aplicar o reset
 
     # --- Indicador de Filtros Ativos ---
-    active_filters = []
-    if "Todos os Jogadores" not in st.session_state.get("player_filter_value", ["Todos os Jogadores"]):
-        active_filters.append("Jogadores")
-    if "Todas as Referências" not in st.session_state.get("reference_filter_value", ["Todas as Referências"]):
-        active_filters.append("Referências")
-    if "Todos os Clubes" not in st.session_state.get("club_filter_value", ["Todos os Clubes"]):
-        active_filters.append("Clubes")
-    if "Todos os Agentes" not in st.session_state.get("agent_filter_value", ["Todos os Agentes"]):
-        active_filters.append("Agentes")
-    
+    filter_labels = {"playerName": "Jogadores", "reference": "Referências", "club": "Clubes", "agentName": "Agentes"}
+    active_filters = [
+        filter_labels[column] for state_key, column, all_option in FILTER_STATE
+        if all_option not in st.session_state.get(state_key, [all_option])
+    ]
+
     if active_filters:
         st.info(f"🎯 Filtros ativos: {', '.join(active_filters)}")
 
     # --- Layout dos Filtros ---
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        # --- Filtro por Jogador ---
-        unique_players = ["Todos os Jogadores"] + sorted(df_original['playerName'].dropna().unique().tolist())
-        
-        # Valida se os valores padrão estão disponíveis nas opções atuais
-        valid_default_players = [player for player in st.session_state["player_filter_value"] if player in unique_players]
-        if not valid_default_players:
-            valid_default_players = ["Todos os Jogadores"]
-            st.session_state["player_filter_value"] = valid_default_players
-        
-        selected_players = st.multiselect(
-            "Filtrar por Jogador:",
-            options=unique_players,
-            default=valid_default_players,
-            key="player_filter"
-        )
-        
-        # Verifica se o filtro foi alterado
-        if selected_players != st.session_state["player_filter_value"]:
-            st.session_state["player_filter_value"] = selected_players
-            st.rerun()  # Força atualização das métricas
-
-    with col2:
-        # --- Filtro por Clube ---
-        unique_clubs = ["Todos os Clubes"] + sorted(df_original['club'].dropna().unique().tolist())
-        
-        # Valida se os valores padrão estão disponíveis nas opções atuais
-        valid_default_clubs = [club for club in st.session_state["club_filter_value"] if club in unique_clubs]
-        if not valid_default_clubs:
-            valid_default_clubs = ["Todos os Clubes"]
-            st.session_state["club_filter_value"] = valid_default_clubs
-        
-        selected_clubs = st.multiselect(
-            "Filtrar por Clube:",
-            options=unique_clubs,
-            default=valid_default_clubs,
-            key="club_filter"
-        )
-        
-        # Verifica se o filtro foi alterado
-        if selected_clubs != st.session_state["club_filter_value"]:
-            st.session_state["club_filter_value"] = selected_clubs
-            st.rerun()  # Força atualização das métricas
-
-    with col3:
-        # --- Filtro por Referência ---
-        unique_references = ["Todas as Referências"] + sorted(df_original['reference'].dropna().unique().tolist())
-        
-        # Valida se os valores padrão estão disponíveis nas opções atuais
-        valid_default_references = [ref for ref in st.session_state["reference_filter_value"] if ref in unique_references]
-        if not valid_default_references:
-            valid_default_references = ["Todas as Referências"]
-            st.session_state["reference_filter_value"] = valid_default_references
-        
-        selected_references = st.multiselect(
-            "Filtrar por Referência:",
-            options=unique_references,
-            default=valid_default_references,
-            key="reference_filter"
-        )
-        
-        # Verifica se o filtro foi alterado
-        if selected_references != st.session_state["reference_filter_value"]:
-            st.session_state["reference_filter_value"] = selected_references
-            st.rerun()  # Força atualização das métricas
-
-    with col4:
-        # --- Filtro por Agente ---
-        unique_agents = ["Todos os Agentes"] + sorted(df_original['agentName'].dropna().unique().tolist())
-        
-        # Valida se os valores padrão estão disponíveis nas opções atuais
-        valid_default_agents = [agent for agent in st.session_state["agent_filter_value"] if agent in unique_agents]
-        if not valid_default_agents:
-            valid_default_agents = ["Todos os Agentes"]
-            st.session_state["agent_filter_value"] = valid_default_agents
-        
-        selected_agents = st.multiselect(
-            "Filtrar por Agente:",
-            options=unique_agents,
-            default=valid_default_agents,
-            key="agent_filter"
-        )
-        
-        # Verifica se o filtro foi alterado
-        if selected_agents != st.session_state["agent_filter_value"]:
-            st.session_state["agent_filter_value"] = selected_agents
-            st.rerun()  # Força atualização das métricas
+    selections = {}
+    for layout_col, (state_key, column, all_option) in zip(st.columns(4), FILTER_STATE):
+        label, widget_key = FILTER_WIDGETS[column]
+        with layout_col:
+            options = [all_option] + list(filter_options.get(column, []))
 
-    # --- Lógica de Filtragem ---
+            # Valida se os valores padrão estão disponíveis nas opções atuais
+            valid_defaults = [value for value in st.session_state[state_key] if value in options]
+            if not valid_defaults:
+                valid_defaults = [all_option]
+                st.session_state[state_key] = valid_defaults
 
-    # 1. Aplicar Filtro por Jogador
-    if "Todos os Jogadores" not in selected_players and 'playerName' in df_filtered.columns:
-        mask = df_filtered['playerName'].isin(selected_players)
-        df_filtered = df_filtered[mask].copy()
+            selected = st.multiselect(
+                label,
+                options=options,
+                default=valid_defaults,
+                key=widget_key
+            )
 
-    # 2. Aplicar Filtro por Referência
-    if "Todas as Referências" not in selected_references and 'reference' in df_filtered.columns:
-        mask = df_filtered['reference'].isin(selected_references)
-        df_filtered = df_filtered[mask].copy()
+            # Verifica se o filtro foi alterado
+            if selected != st.session_state[state_key]:
+                st.session_state[state_key] = selected
+                st.rerun()  # Força atualização das métricas
+            selections[column] = selected
 
-    # 3. Aplicar Filtro por Clube
-    if "Todos os Clubes" not in selected_clubs and 'club' in df_filtered.columns:
-        mask = df_filtered['club'].isin(selected_clubs)
-        df_filtered = df_filtered[mask].copy()
+    return selections
 
-    # 4. Aplicar Filtro por Agente
-    if "Todos os Agentes" not in selected_agents and 'agentName' in df_filtered.columns:
-        mask = df_filtered['agentName'].isin(selected_agents)
-        df_filtered = df_filtered[mask].copy()
+def display_filters(df_original: pd.DataFrame, filter_options: dict = None, data_key=None) -> pd.DataFrame:
+    """
+    Desenha os filtros avançados e retorna as linhas de `df_original` que passam por eles
+    (o próprio `df_original`, sem cópia, se nenhum filtro estiver ativo).
+    `data_key` substitui o token do DataFrame na decisão de limpar os filtros.
+    As opções vêm de `filter_options` ({coluna: [valores]}, lidas das dimensões) quando
+    informadas, restritas aos valores presentes no próprio DataFrame (as dimensões listam
+    quem apareceu em algum dia entre a primeira e a última aparição, não só no período);
+    sem elas, dos valores presentes no DataFrame.
+    """
+    # O token de versão muda quando o período, o usuário ou os dados do banco mudam; os
+    # filtros são limpos nesse caso. Sem token (DataFrame vazio de erro), usa o formato
+    current_data_hash = data_key or get_dataset_version(df_original) or str(df_original.shape)
+    if filter_options is None:
+        filter_options = {
+            column: sorted(df_original[column].dropna().unique().tolist())
+            for _, column, _ in FILTER_STATE
+        }
+    else:
+        index = get_filter_index(df_original)
+        restricted = {}
+        for column, values in filter_options.items():
+            if column in df_original.columns:
+                present = index.present_values(column)
+                values = [value for value in values if value in present]
+            restricted[column] = values
+        filter_options = restricted
+    selections = display_filter_controls(filter_options, current_data_hash)
 
-    return df_filtered
+    # --- Lógica de Filtragem ---
+    # Índice por valor construído uma vez por DataFrame carregado; a combinação dos filtros é
+    # resolvida pelas posições das linhas e o resultado é materializado uma única vez
+    active_selections = {
+        column: selections[column]
+        for _, column, all_option in FILTER_STATE
+        if all_option not in selections[column]
+    }
+    return apply_filters(df_original, active_selections)
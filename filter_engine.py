@@ -0,0 +1,140 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from bpd_schema import get_dataset_version, make_dataset_version
+from analytics_engine import get_analytics_engine
+from instrumentation import logger
+
+# Colunas indexadas para os filtros avançados
+INDEXED_COLUMNS = ['playerName', 'club', 'reference', 'agentName']
+
+class FilterIndex:
+    """
+    Índice invertido de um DataFrame carregado: para cada coluna filtrável, as posições das
+    linhas de cada valor, agrupadas num único vetor ordenado por valor (formato CSR: `offsets`
+    marca onde começam as linhas de cada código). Qualquer combinação dos filtros é respondida
+    a partir das posições da seleção mais restritiva, sem percorrer o DataFrame, e o resultado
+    é materializado uma única vez com `take`.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: list = None):
+        self._columns = {}
+        for col in columns or INDEXED_COLUMNS:
+            if col in df.columns:
+                self._columns[col] = self._build(df[col])
+
+    @staticmethod
+    def _build(series: pd.Series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            values = series.cat.categories
+        else:
+            codes, values = pd.factorize(series)
+        codes = codes.astype(np.int32, copy=False)
+        order = np.argsort(codes, kind='stable').astype(np.int64)
+        counts = np.bincount(codes[codes >= 0], minlength=len(values))
+        # Linhas sem valor (código -1) ficam no início da ordenação e não entram no índice
+        missing = len(codes) - int(counts.sum())
+        offsets = np.concatenate(([0], np.cumsum(counts))) + missing
+        lookup = {str(value): code for code, value in enumerate(values)}
+        return {'codes': codes, 'order': order, 'offsets': offsets, 'lookup': lookup}
+
+    def _selected_codes(self, col: str, values) -> np.ndarray:
+        lookup = self._columns[col]['lookup']
+        return np.array(sorted({lookup[str(v)] for v in values if str(v) in lookup}), dtype=np.int32)
+
+    def _positions(self, col: str, codes: np.ndarray) -> np.ndarray:
+        index = self._columns[col]
+        parts = [index['order'][index['offsets'][code]:index['offsets'][code + 1]] for code in codes]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+
+    def present_values(self, col: str) -> set:
+        """Valores da coluna que aparecem em pelo menos uma linha (como texto)."""
+        index = self._columns.get(col)
+        if index is None:
+            return set()
+        counts = np.diff(index['offsets'])
+        return {value for value, code in index['lookup'].items() if counts[code] > 0}
+
+    def positions(self, selections: dict):
+        """
+        Retorna as posições (ordenadas) das linhas que atendem a todos os filtros de
+        `selections` ({coluna: [valores]}), ou None se nenhum filtro estiver ativo.
+        """
+        active = {col: self._selected_codes(col, values) for col, values in selections.items() if values and col in self._columns}
+        if not active:
+            return None
+
+        # Começa pela coluna com menos linhas selecionadas e confere as demais só nessas linhas
+        def selected_rows(col):
+            offsets = self._columns[col]['offsets']
+            return int(sum(offsets[code + 1] - offsets[code] for code in active[col]))
+
+        ordered = sorted(active, key=selected_rows)
+        positions = self._positions(ordered[0], active[ordered[0]])
+        for col in ordered[1:]:
+            if positions.size == 0:
+                break
+            positions = positions[np.isin(self._columns[col]['codes'][positions], active[col])]
+        return positions
+
+# Índices por token de versão do DataFrame, descartando os menos usados
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+INDEX_CACHE_SIZE = 8
+
+def get_filter_index(df: pd.DataFrame) -> FilterIndex:
+    """
+    Retorna o índice do DataFrame, construído uma única vez por versão dos dados (token de
+    load_data), então sessões diferentes e reruns reaproveitam o mesmo índice, inclusive
+    depois de load_data juntar colunas novas às mesmas linhas. DataFrames sem token têm o
+    índice construído a cada chamada.
+    """
+    version = get_dataset_version(df)
+    if version is None:
+        return FilterIndex(df)
+    with _index_lock:
+        index = _index_cache.get(version)
+        if index is not None:
+            _index_cache.move_to_end(version)
+            return index
+
+    index = FilterIndex(df)
+    with _index_lock:
+        _index_cache[version] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+def apply_filters(df: pd.DataFrame, selections: dict) -> pd.DataFrame:
+    """
+    Retorna as linhas de `df` que atendem aos filtros ({coluna: [valores]}), materializadas
+    uma única vez. Sem filtros ativos, retorna o próprio `df` (sem cópia), que não deve ser
+    alterado no lugar. O resultado filtrado recebe um token de versão derivado do token de
+    `df` e da seleção.
+    Com o motor DuckDB ativado (veja analytics_engine), as posições vêm de uma consulta SQL
+    sobre a relação registrada; se ela falhar, o índice em memória é usado.
+    """
+    if not any(selections.values()):
+        return df
+    positions = None
+    engine = get_analytics_engine(len(df))
+    if engine is not None:
+        try:
+            positions = engine.filter_positions(df, selections)
+        except Exception as e:
+            logger.warning("Motor analítico falhou ao filtrar, usando o índice em memória: %s", e)
+            engine = None
+    if engine is None:
+        positions = get_filter_index(df).positions(selections)
+    if positions is None:
+        return df
+    filtered = df.take(positions)
+    base_version = get_dataset_version(df)
+    if base_version is not None:
+        selection_key = sorted((col, sorted(map(str, values))) for col, values in selections.items() if values)
+        filtered.attrs['dataset_version'] = f"{base_version}:{make_dataset_version(selection_key)}"
+    return filtered
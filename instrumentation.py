@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+import pandas as pd
+import streamlit as st
+from utils import get_setting
+
+# Logger do aplicativo; o nível vem de [instrumentation] log_level no secrets.toml (WARNING por padrão)
+logger = logging.getLogger("bpd")
+
+# Trechos medidos em cada execução do script
+SPAN_NAMES = ('db_connect', 'query', 'to_dataframe', 'filter', 'metrics', 'table', 'export')
+
+_configured = False
+
+def configure_logging():
+    """Configura o logger "bpd" uma vez por processo."""
+    global _configured
+    if _configured:
+        return
+    level = getattr(logging, str(get_setting("instrumentation", "log_level", "WARNING")).upper(), logging.WARNING)
+    logger.setLevel(level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+    logger.propagate = False
+    _configured = True
+
+def log_enabled(level: int = logging.DEBUG) -> bool:
+    """
+    Indica se mensagens do nível seriam registradas. Use antes de montar diagnósticos caros
+    (como df.head()), que não devem ser calculados com o log desligado.
+    """
+    return logger.isEnabledFor(level)
+
+class RerunTimings:
+    """Tempos dos trechos medidos durante uma execução do script (um rerun)."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.spans = []  # (nome, profundidade, segundos, campos), na ordem em que terminaram
+        self._depth = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def summary(self) -> list:
+        """Totais por nome de trecho: [{'span', 'calls', 'seconds'}], do mais demorado ao mais rápido."""
+        totals = {}
+        for name, _depth, seconds, _fields in self.spans:
+            calls, total = totals.get(name, (0, 0.0))
+            totals[name] = (calls + 1, total + seconds)
+        rows = [{'span': name, 'calls': calls, 'seconds': seconds} for name, (calls, seconds) in totals.items()]
+        return sorted(rows, key=lambda row: row['seconds'], reverse=True)
+
+_local = threading.local()
+
+def start_rerun(enabled: bool) -> RerunTimings:
+    """
+    Começa a medição de uma execução do script na thread atual. Com `enabled` falso, os
+    trechos só são medidos se o log estiver em DEBUG. Retorna os tempos da execução, ou None.
+    """
+    configure_logging()
+    _local.timings = RerunTimings() if enabled else None
+    return _local.timings
+
+class _Span:
+    __slots__ = ('name', 'fields', '_timings', '_depth', '_start')
+
+    def __init__(self, name: str, timings: RerunTimings, fields: dict):
+        self.name = name
+        self.fields = fields
+        self._timings = timings
+
+    def set(self, **fields):
+        """Acrescenta campos ao trecho (por exemplo, a quantidade de linhas lidas)."""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        if self._timings is not None:
+            self._depth = self._timings._depth
+            self._timings._depth += 1
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        if self._timings is not None:
+            self._timings._depth -= 1
+            self._timings.spans.append((self.name, self._depth, seconds, self.fields))
+        logger.debug("%s: %.1f ms %s", self.name, seconds * 1000, self.fields or "")
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name: str, **fields):
+    """
+    Mede o trecho dentro do `with`. Sem medição ativa na thread (veja start_rerun) e com o
+    log abaixo de DEBUG, retorna um objeto vazio compartilhado e não mede nada.
+    """
+    timings = getattr(_local, 'timings', None)
+    if timings is None and not logger.isEnabledFor(logging.DEBUG):
+        return _NULL_SPAN
+    return _Span(name, timings, fields)
+
+def display_timings_panel(timings: RerunTimings):
+    """Painel recolhível com os tempos da execução atual (exibido só para administradores)."""
+    if timings is None:
+        return
+    total = timings.elapsed()
+    with st.expander(f"⏱️ Tempos desta execução ({total * 1000:.0f} ms)", expanded=False):
+        summary = pd.DataFrame(timings.summary(), columns=['span', 'calls', 'seconds'])
+        summary['ms'] = (summary['seconds'] * 1000).round(1)
+        st.dataframe(summary[['span', 'calls', 'ms']], hide_index=True, use_container_width=True)
+
+        details = pd.DataFrame(
+            [{'span': "  " * depth + name, 'ms': round(seconds * 1000, 1), 'detalhes': ", ".join(f"{k}={v}" for k, v in fields.items())}
+             for name, depth, seconds, fields in timings.spans],
+            columns=['span', 'ms', 'detalhes']
+        )
+        st.caption("Trechos na ordem em que terminaram")
+        st.dataframe(details, hide_index=True, use_container_width=True)
@@ -1,94 +1,52 @@
 import streamlit as st
 import pandas as pd
-
-def display_metric_cards(df: pd.DataFrame, selected_currencies: list):
+from database import METRIC_COLUMNS
+from aggregation import compute_totals
+from bpd_schema import get_dataset_version
+from instrumentation import logger, log_enabled, span
+
+def _compute_totals_from_df(df: pd.DataFrame) -> dict:
+    """
+    Calcula em memória, a partir do DataFrame já carregado, os totais exibidos nos cards.
+    Usa o kernel de agregação, memorizado pela versão do DataFrame filtrado.
+    """
+    with span('metrics', rows=len(df)):
+        aggregated = compute_totals(df, METRIC_COLUMNS, version=get_dataset_version(df))
+    totals = {'rows': aggregated['rows']}
+
+    # Colunas ausentes do DataFrame entram com total zero
+    for col in METRIC_COLUMNS:
+        totals[col] = aggregated['sums'].get(col, 0)
+    if log_enabled():
+        logger.debug("Totais das métricas (%d linhas): %s; ausentes: %s", len(df), totals, aggregated['nans'])
+    return totals
+
+def display_metric_cards(df: pd.DataFrame, selected_currencies: list, totals: dict = None):
+    """
+    Exibe os cards de métricas principais. Se `totals` for informado (somas já calculadas
+    no banco por load_metric_totals), o DataFrame não é lido; caso contrário, os totais são
+    calculados em memória a partir de `df`.
+    """
     st.markdown("### Métricas Principais")
 
-    # Diagnóstico dos dados recebidos
-    print(f"\n=== DIAGNÓSTICO MÉTRICAS ===")
-    print(f"DataFrame recebido: {len(df)} linhas")
-    print(f"Colunas disponíveis: {list(df.columns)}")
-    print(f"Moedas selecionadas: {selected_currencies}")
-    
-    if not df.empty:
-        print("Primeiras linhas dos dados:")
-        print(df[['dia', 'playerName', 'realWins', 'dolarWins', 'hands']].head(3))
-    
-    if df.empty:
+    if totals is None:
+        if df is None or df.empty:
+            st.warning("Nenhum dado disponível para calcular as métricas.")
+            return
+        totals = _compute_totals_from_df(df)
+    elif totals.get('rows', 0) == 0:
         st.warning("Nenhum dado disponível para calcular as métricas.")
         return
 
-    # Inicializa os totais
-    total_hands = 0
-    total_wins_real = 0
-    total_wins_dolar = 0
-    total_fee_real = 0
-    total_fee_dolar = 0
-    total_rakeback_real = 0
-    total_rakeback_dolar = 0
-    total_rebate_real = 0
-    total_rebate_dolar = 0
-
-    # Calcula os totais das colunas relevantes
-    print("\n=== CÁLCULOS DOS TOTAIS ===")
-    
-    if 'hands' in df.columns:
-        # Tratar valores inválidos na coluna hands
-        hands_clean = pd.to_numeric(df['hands'], errors='coerce')
-        total_hands = hands_clean.sum()
-        print(f"Total hands: {total_hands} (tipo: {type(total_hands)})")
-    else:
-        print("Coluna 'hands' não encontrada")
-        
-    if 'realWins' in df.columns:
-        total_wins_real = pd.to_numeric(df['realWins'], errors='coerce').sum()
-        print(f"Total realWins: {total_wins_real} (tipo: {type(total_wins_real)})")
-    else:
-        print("Coluna 'realWins' não encontrada")
-        
-    if 'dolarWins' in df.columns:
-        total_wins_dolar = pd.to_numeric(df['dolarWins'], errors='coerce').sum()
-        print(f"Total dolarWins: {total_wins_dolar} (tipo: {type(total_wins_dolar)})")
-    else:
-        print("Coluna 'dolarWins' não encontrada")
-        
-    if 'realFee' in df.columns:
-        total_fee_real = pd.to_numeric(df['realFee'], errors='coerce').sum()
-        print(f"Total realFee: {total_fee_real} (tipo: {type(total_fee_real)})")
-    else:
-        print("Coluna 'realFee' não encontrada")
-        
-    if 'dolarFee' in df.columns:
-        total_fee_dolar = pd.to_numeric(df['dolarFee'], errors='coerce').sum()
-        print(f"Total dolarFee: {total_fee_dolar} (tipo: {type(total_fee_dolar)})")
-    else:
-        print("Coluna 'dolarFee' não encontrada")
-        
-    if 'realRakeback' in df.columns:
-        total_rakeback_real = pd.to_numeric(df['realRakeback'], errors='coerce').sum()
-        print(f"Total realRakeback: {total_rakeback_real} (tipo: {type(total_rakeback_real)})")
-    else:
-        print("Coluna 'realRakeback' não encontrada")
-        
-    if 'dolarRakeback' in df.columns:
-        total_rakeback_dolar = pd.to_numeric(df['dolarRakeback'], errors='coerce').sum()
-        print(f"Total dolarRakeback: {total_rakeback_dolar} (tipo: {type(total_rakeback_dolar)})")
-    else:
-        print("Coluna 'dolarRakeback' não encontrada")
-        
-    if 'realRebate' in df.columns:
-        total_rebate_real = pd.to_numeric(df['realRebate'], errors='coerce').sum()
-        print(f"Total realRebate: {total_rebate_real} (tipo: {type(total_rebate_real)})")
-    else:
-        print("Coluna 'realRebate' não encontrada")
-        
-    if 'dolarRebate' in df.columns:
-        total_rebate_dolar = pd.to_numeric(df['dolarRebate'], errors='coerce').sum()
-        print(f"Total dolarRebate: {total_rebate_dolar} (tipo: {type(total_rebate_dolar)})")
-    else:
-        print("Coluna 'dolarRebate' não encontrada")
-    
-    print("=============================\n")
+    total_hands = totals['hands']
+    total_wins_real = totals['realWins']
+    total_wins_dolar = totals['dolarWins']
+    total_fee_real = totals['realFee']
+    total_fee_dolar = totals['dolarFee']
+    total_rakeback_real = totals['realRakeback']
+    total_rakeback_dolar = totals['dolarRakeback']
+    total_rebate_real = totals['realRebate']
+    total_rebate_dolar = totals['dolarRebate']
 
     # --- Cards de Métricas Melhorados ---
     col1, col2, col3, col4, col5 = st.columns(5)
@@ -124,8 +82,6 @@ def display_metric_cards(df: pd.DataFrame, selected_currencies: list):
         else:
             formatted_wins = "N/A"
 
-        print(f"DEBUG GANHOS: wins_value={wins_value}, formatted_wins='{formatted_wins}'")
-
         with st.container():
             st.markdown(f'''
             <div class="metric-card-improved">
@@ -154,8 +110,6 @@ def display_metric_cards(df: pd.DataFrame, selected_currencies: list):
         else:
             formatted_rakeback = "N/A"
 
-        print(f"DEBUG RAKEBACK: rakeback_value={rakeback_value}, formatted_rakeback='{formatted_rakeback}'")
-
         with st.container():
             st.markdown(f'''
             <div class="metric-card-improved">
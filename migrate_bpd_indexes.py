@@ -0,0 +1,234 @@
+import streamlit as st
+import pandas as pd
+from database import BPD_VERSION_TABLE, get_db_connection
+
+# Coluna DATE gerada a partir do texto de 'dia'. Valores fora do formato YYYY-MM-DD viram NULL.
+DIA_DATE_COLUMN_SQL = (
+    "ADD COLUMN dia_date DATE GENERATED ALWAYS AS "
+    "(CASE WHEN dia LIKE '____-__-__' THEN CAST(dia AS DATE) END) STORED"
+)
+
+# Índices das consultas quentes: período, página do modo servidor (data, linha_id),
+# jogador + período e agente + período
+BPD_INDEXES = [
+    ("idx_bpd_dia_date", ["dia_date"]),
+    ("idx_bpd_dia_linha", ["dia_date", "linha_id"]),
+    ("idx_bpd_player_dia", ["playerName", "dia_date"]),
+    ("idx_bpd_agent_dia", ["agentName", "dia_date"]),
+]
+
+# Triggers que incrementam o contador de versão da bpd (a marca d'água do cache de resultados)
+BPD_VERSION_TRIGGERS = [
+    ("trg_bpd_version_insert", "INSERT"),
+    ("trg_bpd_version_update", "UPDATE"),
+    ("trg_bpd_version_delete", "DELETE"),
+]
+
+def get_bpd_columns(cursor):
+    """
+    Retorna {coluna: tipo} da tabela bpd a partir do information_schema.
+    """
+    cursor.execute(
+        "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'bpd'"
+    )
+    return {name: data_type.lower() for name, data_type in cursor.fetchall()}
+
+def get_bpd_indexes(cursor):
+    """
+    Retorna os nomes dos índices existentes na tabela bpd.
+    """
+    cursor.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'bpd'"
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+def get_bpd_triggers(cursor):
+    """
+    Retorna os nomes dos triggers existentes na tabela bpd.
+    """
+    cursor.execute(
+        "SELECT TRIGGER_NAME FROM information_schema.TRIGGERS "
+        "WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = 'bpd'"
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+def create_version_counter(cursor):
+    """
+    Cria a tabela bpd_version e os triggers que incrementam o contador a cada INSERT, UPDATE
+    ou DELETE na bpd. Retorna quantos triggers foram criados. Se algum trigger não puder ser
+    criado (falta do privilégio TRIGGER, por exemplo), desfaz tudo e relança o erro: sem os
+    triggers o contador ficaria parado e o app deixaria de perceber as alterações.
+    """
+    existing = get_bpd_triggers(cursor)
+    if all(name in existing for name, _ in BPD_VERSION_TRIGGERS):
+        return 0
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {BPD_VERSION_TABLE} (id TINYINT PRIMARY KEY, version BIGINT NOT NULL) ENGINE=InnoDB")
+    cursor.execute(f"INSERT IGNORE INTO {BPD_VERSION_TABLE} (id, version) VALUES (1, 0)")
+    created = []
+    try:
+        for name, event in BPD_VERSION_TRIGGERS:
+            if name in existing:
+                continue
+            cursor.execute(
+                f"CREATE TRIGGER {name} AFTER {event} ON bpd FOR EACH ROW "
+                f"UPDATE {BPD_VERSION_TABLE} SET version = version + 1 WHERE id = 1"
+            )
+            created.append(name)
+    except Exception:
+        for name in created:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {BPD_VERSION_TABLE}")
+        raise
+    return len(created)
+
+def hot_queries(date_column: str, sample_player: str, sample_agent: str, start_date: str, end_date: str):
+    """
+    Consultas usadas pelo dashboard, escritas sobre a coluna de data informada.
+    """
+    if date_column == 'dia':
+        range_query = "SELECT MIN(dia), MAX(dia) FROM bpd WHERE dia IS NOT NULL AND dia != '' AND dia != '-'"
+    else:
+        range_query = f"SELECT MIN({date_column}), MAX({date_column}) FROM bpd"
+    return [
+        ("Intervalo de datas (get_date_range)", range_query, []),
+        ("Período (load_data, Admin)", f"SELECT * FROM bpd WHERE {date_column} BETWEEN %s AND %s", [start_date, end_date]),
+        ("Jogador + período (load_data, Jogador)", f"SELECT * FROM bpd WHERE playerName = %s AND {date_column} BETWEEN %s AND %s", [sample_player, start_date, end_date]),
+        ("Agente + período", f"SELECT * FROM bpd WHERE agentName = %s AND {date_column} BETWEEN %s AND %s", [sample_agent, start_date, end_date]),
+        ("Página da tabela (modo servidor)", f"SELECT * FROM bpd WHERE {date_column} BETWEEN %s AND %s AND ({date_column}, linha_id) > (%s, %s) ORDER BY {date_column}, linha_id LIMIT 50", [start_date, end_date, start_date, 0]),
+    ]
+
+def explain_queries(cursor, queries):
+    """
+    Executa EXPLAIN para cada consulta e retorna {descrição: DataFrame com o plano}.
+    """
+    plans = {}
+    for label, query, params in queries:
+        cursor.execute("EXPLAIN " + query, params)
+        rows = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description]
+        plans[label] = pd.DataFrame(rows, columns=columns)
+    return plans
+
+def sample_values(cursor):
+    """
+    Busca um jogador, um agente e o período dos últimos 30 dias de dados para usar nos EXPLAIN.
+    """
+    cursor.execute("SELECT playerName, agentName FROM bpd WHERE playerName IS NOT NULL AND agentName IS NOT NULL LIMIT 1")
+    row = cursor.fetchone() or ('', '')
+    cursor.execute("SELECT MAX(dia) FROM bpd WHERE dia LIKE '____-__-__'")
+    max_dia = cursor.fetchone()[0]
+    end_date = pd.to_datetime(str(max_dia), errors='coerce') if max_dia else pd.Timestamp.today()
+    if pd.isna(end_date):
+        end_date = pd.Timestamp.today()
+    start_date = end_date - pd.Timedelta(days=29)
+    return row[0], row[1], start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+
+def index_column_sql(column: str, columns: dict):
+    # Colunas TEXT só podem ser indexadas com prefixo
+    if columns.get(column) in ('text', 'mediumtext', 'longtext', 'blob'):
+        return f"`{column}`(191)"
+    return f"`{column}`"
+
+def migrate_bpd_indexes():
+    """
+    Adiciona a coluna dia_date (DATE gerada a partir de 'dia') e os índices compostos das
+    consultas quentes. Se 'dia' já for do tipo DATE, os índices são criados sobre ela.
+    Também cria o contador de versão da bpd (veja create_version_counter).
+    Retorna (planos antes, planos depois), ou None em caso de erro.
+    """
+    conn = get_db_connection()
+    if not conn:
+        st.error("Não foi possível conectar ao banco de dados.")
+        return None
+
+    try:
+        cursor = conn.cursor()
+        columns = get_bpd_columns(cursor)
+        indexes = get_bpd_indexes(cursor)
+        sample_player, sample_agent, start_date, end_date = sample_values(cursor)
+
+        before_column = 'dia_date' if 'dia_date' in columns else 'dia'
+        plans_before = explain_queries(cursor, hot_queries(before_column, sample_player, sample_agent, start_date, end_date))
+
+        dia_is_date = columns.get('dia') == 'date'
+        date_column = 'dia' if dia_is_date else 'dia_date'
+
+        alterations = []
+        if not dia_is_date and 'dia_date' not in columns:
+            alterations.append(DIA_DATE_COLUMN_SQL)
+        for index_name, index_columns in BPD_INDEXES:
+            if index_name in indexes:
+                continue
+            index_columns = [date_column if col == 'dia_date' else col for col in index_columns]
+            alterations.append(f"ADD INDEX {index_name} (" + ", ".join(index_column_sql(col, columns) for col in index_columns) + ")")
+
+        if alterations:
+            st.info(f"Aplicando {len(alterations)} alteração(ões) na tabela bpd...")
+            cursor.execute("ALTER TABLE bpd " + ", ".join(alterations))
+            conn.commit()
+            st.success("✅ Coluna de data e índices criados com sucesso!")
+        else:
+            st.info("A tabela bpd já está migrada. Nenhuma alteração necessária.")
+
+        try:
+            if create_version_counter(cursor):
+                conn.commit()
+                st.success("✅ Contador de versão da tabela bpd criado com sucesso!")
+        except Exception as e:
+            st.warning(f"Não foi possível criar o contador de versão da tabela bpd ({e}). O cache continua usando COUNT(*) como marca d'água.")
+
+        cursor.execute("ANALYZE TABLE bpd")
+        cursor.fetchall()
+        plans_after = explain_queries(cursor, hot_queries(date_column, sample_player, sample_agent, start_date, end_date))
+        return plans_before, plans_after
+
+    except Exception as e:
+        st.error(f"Erro ao migrar a tabela bpd: {e}")
+        return None
+    finally:
+        conn.close()
+
+def main():
+    st.title("🔧 Migração de Índices da Tabela bpd")
+    st.markdown("Este script cria a coluna de data tipada `dia_date`, os índices compostos usados pelo dashboard e o contador de versão da tabela.")
+
+    if st.button("🚀 Migrar Tabela bpd", type="primary"):
+        with st.spinner("Migrando tabela bpd (pode demorar em tabelas grandes)..."):
+            result = migrate_bpd_indexes()
+
+        if result:
+            plans_before, plans_after = result
+            st.markdown("### 📊 Planos de execução (EXPLAIN)")
+            for label in plans_before:
+                st.markdown(f"**{label}**")
+                col_before, col_after = st.columns(2)
+                with col_before:
+                    st.caption("Antes")
+                    st.dataframe(plans_before[label], use_container_width=True, hide_index=True)
+                with col_after:
+                    st.caption("Depois")
+                    st.dataframe(plans_after[label], use_container_width=True, hide_index=True)
+        else:
+            st.error("Falha ao migrar a tabela bpd.")
+
+    st.markdown("---")
+    st.markdown("### 📋 Alterações aplicadas:")
+    st.markdown("""
+    **Coluna dia_date** - DATE gerada a partir do texto de `dia` (NULL para valores inválidos como '' e '-')
+
+    **Índices:**
+    - idx_bpd_dia_date: (dia_date) - filtros por período e MIN/MAX de datas
+    - idx_bpd_dia_linha: (dia_date, linha_id) - paginação por chave da tabela no modo servidor
+    - idx_bpd_player_dia: (playerName, dia_date) - dados de um jogador no período
+    - idx_bpd_agent_dia: (agentName, dia_date) - dados de um agente no período
+
+    **Contador de versão** - tabela `bpd_version` e triggers AFTER INSERT/UPDATE/DELETE na bpd
+    (exige o privilégio TRIGGER). O cache de resultados passa a usar o contador no lugar de
+    COUNT(*): a consulta fica barata e alterações no lugar também invalidam o cache. Cada
+    linha gravada na bpd atualiza a mesma linha do contador, o que serializa cargas concorrentes.
+    """)
+
+if __name__ == "__main__":
+    main()
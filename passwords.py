@@ -0,0 +1,42 @@
+import base64
+import hashlib
+import hmac
+import secrets
+
+# Formato guardado na coluna users.password: pbkdf2_sha256$<iterações>$<salt>$<hash>
+PASSWORD_HASH_ALGORITHM = "pbkdf2_sha256"
+PASSWORD_HASH_ITERATIONS = 260000
+
+# Tamanho do valor gerado por hash_password: salt de 22 caracteres e hash SHA-256 em base64 (44)
+PASSWORD_HASH_LENGTH = len(f"{PASSWORD_HASH_ALGORITHM}${PASSWORD_HASH_ITERATIONS}$") + 22 + 1 + 44
+
+def _pbkdf2(password: str, salt: str, iterations: int) -> str:
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations)
+    return base64.b64encode(digest).decode("ascii")
+
+def hash_password(password: str) -> str:
+    """
+    Gera o hash PBKDF2-SHA256 da senha com um salt aleatório, no formato guardado na tabela users.
+    """
+    salt = secrets.token_urlsafe(16)
+    return f"{PASSWORD_HASH_ALGORITHM}${PASSWORD_HASH_ITERATIONS}${salt}${_pbkdf2(password, salt, PASSWORD_HASH_ITERATIONS)}"
+
+def is_password_hash(stored: str) -> bool:
+    return bool(stored) and stored.startswith(PASSWORD_HASH_ALGORITHM + "$")
+
+def check_password(password: str, stored: str):
+    """
+    Compara a senha com o valor guardado em tempo constante. Senhas antigas, ainda em texto
+    puro, também são aceitas. Retorna (senha confere, valor guardado precisa virar hash).
+    """
+    if stored is None:
+        return False, False
+    if is_password_hash(stored):
+        try:
+            _, iterations, salt, expected = stored.split("$", 3)
+            computed = _pbkdf2(password, salt, int(iterations))
+        except ValueError:
+            return False, False
+        return hmac.compare_digest(computed, expected), int(iterations) != PASSWORD_HASH_ITERATIONS
+    matches = hmac.compare_digest(password.encode("utf-8"), str(stored).encode("utf-8"))
+    return matches, matches
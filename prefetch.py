@@ -0,0 +1,175 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from database import fetch_data
+from utils import get_setting, PERIOD_OPTIONS, period_dates
+from instrumentation import logger
+
+class Prefetcher:
+    """
+    Carrega em segundo plano, num pool de threads, os dados que o usuário provavelmente vai
+    pedir em seguida (os outros períodos do seletor), para que o resultado já esteja no cache
+    compartilhado de load_data quando ele for pedido.
+    - No máximo `max_workers` cargas rodam ao mesmo tempo e até `max_pending` esperam a vez;
+      além disso os pedidos novos são descartados (pré-carga é só uma otimização).
+    - Cada dono (a sessão do usuário) tem uma geração: um novo `schedule` do mesmo dono
+      cancela as cargas dele que ainda não começaram, e as que já começaram terminam
+      normalmente (o resultado continua útil no cache).
+    - Uma mesma chave não é carregada duas vezes ao mesmo tempo.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._generations = {}  # {dono: geração atual}
+        self._tasks = {}  # {chave: {'owner', 'generation', 'future', 'done' (Event), 'started'}}
+        self._stats = {'scheduled': 0, 'completed': 0, 'cancelled': 0, 'dropped': 0, 'failed': 0}
+
+    def schedule(self, owner, tasks: list):
+        """
+        Agenda as cargas de `owner`: `tasks` é uma lista de (chave, função sem argumentos).
+        Cancela as cargas ainda na fila de agendamentos anteriores do mesmo dono.
+        """
+        with self._lock:
+            generation = self._generations.get(owner, 0) + 1
+            self._generations[owner] = generation
+            for key, task in list(self._tasks.items()):
+                if task['owner'] == owner and not task['started'] and task['future'].cancel():
+                    del self._tasks[key]
+                    task['done'].set()
+                    self._stats['cancelled'] += 1
+
+            for key, func in tasks:
+                if key in self._tasks:
+                    continue
+                if sum(1 for task in self._tasks.values() if not task['started']) >= self.max_pending:
+                    self._stats['dropped'] += 1
+                    continue
+                task = {'owner': owner, 'generation': generation, 'done': threading.Event(), 'started': False}
+                self._tasks[key] = task
+                task['future'] = self._executor.submit(self._run, key, task, func)
+                self._stats['scheduled'] += 1
+
+    def cancel(self, owner):
+        """Cancela as cargas de `owner` que ainda não começaram (por exemplo, no logout)."""
+        self.schedule(owner, [])
+
+    def _run(self, key, task: dict, func):
+        with self._lock:
+            # Agendamento antigo do mesmo dono: a carga deixou de ser provável
+            if self._generations.get(task['owner']) != task['generation']:
+                self._tasks.pop(key, None)
+                task['done'].set()
+                self._stats['cancelled'] += 1
+                return
+            task['started'] = True
+        try:
+            started = time.perf_counter()
+            func()
+            logger.debug("Pré-carga %s concluída em %.2fs", key, time.perf_counter() - started)
+            with self._lock:
+                self._stats['completed'] += 1
+        except Exception as e:
+            logger.warning("Falha na pré-carga %s: %s", key, e)
+            with self._lock:
+                self._stats['failed'] += 1
+        finally:
+            with self._lock:
+                self._tasks.pop(key, None)
+            task['done'].set()
+
+    def wait(self, key, timeout: float = None) -> bool:
+        """
+        Se `key` já estiver sendo carregada, espera ela terminar (até `timeout` segundos), para
+        o pedido em primeiro plano não repetir a mesma consulta. Uma carga que ainda não começou
+        é cancelada e o chamador carrega por conta própria. Retorna True se havia uma carga
+        em andamento e ela terminou.
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                return False
+            if not task['started'] and task['future'].cancel():
+                del self._tasks[key]
+                task['done'].set()
+                self._stats['cancelled'] += 1
+                return False
+        return task['done'].wait(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = sum(1 for task in self._tasks.values() if not task['started'])
+            stats['running'] = sum(1 for task in self._tasks.values() if task['started'])
+        return stats
+
+@st.cache_resource
+def get_prefetcher():
+    """
+    Retorna o pré-carregador do processo. Os limites podem ser ajustados na seção [prefetch]
+    do secrets.toml: max_workers (cargas simultâneas; cada uma ocupa uma conexão do pool) e
+    max_pending (cargas na fila).
+    """
+    return Prefetcher(
+        max_workers=int(get_setting("prefetch", "max_workers", 2)),
+        max_pending=int(get_setting("prefetch", "max_pending", 8)),
+    )
+
+# Períodos pré-carregados por padrão: os que os usuários mais alternam. "Mostrar tudo" fica de
+# fora por ser o mais pesado
+DEFAULT_PREFETCH_PERIODS = ("Semana Atual", "Última semana", "Últimos 30 dias")
+
+def _period_key(username: str, user_role: str, start_date, end_date):
+    # Como no cache de load_data, administradores compartilham a mesma carga
+    scoped_username = username if user_role == 'Jogador' else None
+    return ('load_data', user_role, scoped_username, str(start_date), str(end_date))
+
+def _session_owner(username: str, user_role: str):
+    # Dono das cargas: a sessão, não só o login (vários navegadores podem usar o mesmo usuário)
+    if 'prefetch_session' not in st.session_state:
+        st.session_state['prefetch_session'] = uuid.uuid4().hex
+    return (username, user_role, st.session_state['prefetch_session'])
+
+def prefetch_periods(username: str, user_role: str, current_option: str, reference_date, today, columns):
+    """
+    Agenda a carga dos outros períodos prováveis do seletor ([prefetch] periods no secrets.toml)
+    para o usuário, com as mesmas colunas da tela atual. Desativado com [prefetch] enabled = false.
+    Só agenda de novo quando o usuário, o período ou as colunas mudam; os reruns da mesma tela
+    não repetem o agendamento. As cargas usam fetch_data, cujas falhas contam em stats()['failed'].
+    """
+    if not get_setting("prefetch", "enabled", True):
+        return
+    columns = sorted(columns)
+    scheduled = (username, user_role, current_option, str(reference_date), str(today), tuple(columns))
+    if st.session_state.get('prefetch_scheduled') == scheduled:
+        return
+    st.session_state['prefetch_scheduled'] = scheduled
+
+    periods = get_setting("prefetch", "periods", DEFAULT_PREFETCH_PERIODS)
+    tasks = []
+    for option in periods:
+        if option == current_option or option not in PERIOD_OPTIONS:
+            continue
+        start_date, end_date = period_dates(option, reference_date, today)
+        tasks.append((
+            _period_key(username, user_role, start_date, end_date),
+            lambda start_date=start_date, end_date=end_date: fetch_data(username, user_role, start_date, end_date, columns=columns),
+        ))
+    get_prefetcher().schedule(_session_owner(username, user_role), tasks)
+
+def cancel_prefetch(username: str, user_role: str):
+    """Cancela as pré-cargas da sessão que ainda não começaram (no logout)."""
+    get_prefetcher().cancel(_session_owner(username, user_role))
+
+def wait_for_period(username: str, user_role: str, start_date, end_date):
+    """
+    Antes de carregar um período, espera a pré-carga dele se ela já estiver em andamento
+    (até [prefetch] wait_timeout segundos), para servir o resultado do cache em vez de repetir
+    a consulta.
+    """
+    timeout = float(get_setting("prefetch", "wait_timeout", 60))
+    return get_prefetcher().wait(_period_key(username, user_role, start_date, end_date), timeout)
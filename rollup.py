@@ -0,0 +1,178 @@
+import threading
+from aggregation import MEASURABLE_COLUMNS
+from etl_state import ETL_STATE_DDL, date_expression, set_etl_position
+
+ROLLUP_TABLE = 'bpd_daily_rollup'
+ROLLUP_JOB = 'daily_rollup'
+# Valor do contador bpd_version lido no início do job (em last_linha_id), para perceber
+# alterações no lugar feitas depois dele
+ROLLUP_VERSION_JOB = 'daily_rollup_version'
+
+# Contagem e checksum de cada dia no momento em que ele entrou no rollup, para detectar dias
+# com linhas novas, alteradas ou apagadas
+ROLLUP_DAYS_TABLE = 'bpd_rollup_days'
+
+# Grão do rollup: um registro por dia, jogador, agente, clube e moeda. Os nomes acompanham os
+# IDs para que os filtros por nome (jogador, agente, clube) possam ser respondidos pelo rollup
+ROLLUP_KEY_COLUMNS = ['playerID', 'playerName', 'agentId', 'agentName', 'club', 'moeda']
+
+# Filtros que o rollup consegue responder (reference não faz parte do grão)
+ROLLUP_FILTER_COLUMNS = ['playerName', 'agentName', 'club']
+
+ROLLUP_DDL = f"""
+CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    dia DATE NOT NULL,
+    playerID BIGINT NULL,
+    playerName VARCHAR(255) NULL,
+    agentId BIGINT NULL,
+    agentName VARCHAR(255) NULL,
+    club VARCHAR(255) NULL,
+    moeda VARCHAR(32) NULL,
+    row_count INT NOT NULL,
+    {", ".join(f"`{col}` DOUBLE NULL" for col in MEASURABLE_COLUMNS)},
+    INDEX idx_rollup_dia (dia),
+    INDEX idx_rollup_player_dia (playerName, dia),
+    INDEX idx_rollup_agent_dia (agentName, dia)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+ROLLUP_DAYS_DDL = f"""
+CREATE TABLE IF NOT EXISTS {ROLLUP_DAYS_TABLE} (
+    dia DATE NOT NULL PRIMARY KEY,
+    row_count BIGINT NOT NULL,
+    checksum BIGINT NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+_tables_ready = False
+_refresh_lock = threading.Lock()
+
+def ensure_rollup_tables(conn):
+    """
+    Cria o rollup diário, o estado por dia e a etl_state se não existirem (uma vez por processo).
+    Chamado só pelo job de ETL (etl.py), que roda com um usuário com permissão de CREATE.
+    """
+    global _tables_ready
+    if _tables_ready:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(ETL_STATE_DDL)
+        cursor.execute(ROLLUP_DDL)
+        cursor.execute(ROLLUP_DAYS_DDL)
+        conn.commit()
+    finally:
+        cursor.close()
+    _tables_ready = True
+
+def _rebuild_days(cursor, days: list, date_expr: str, max_linha_id: int):
+    """Apaga e recalcula no rollup os dias informados, com as linhas até max_linha_id."""
+    placeholders = ", ".join(["%s"] * len(days))
+    cursor.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE dia IN ({placeholders})", days)
+    key_columns = ", ".join(f"`{col}`" for col in ROLLUP_KEY_COLUMNS)
+    cursor.execute(
+        f"INSERT INTO {ROLLUP_TABLE} (dia, {key_columns}, row_count, "
+        + ", ".join(f"`{col}`" for col in MEASURABLE_COLUMNS) + ") "
+        f"SELECT {date_expr}, {key_columns}, COUNT(*), "
+        + ", ".join(f"SUM(`{col}`)" for col in MEASURABLE_COLUMNS)
+        + f" FROM bpd WHERE {date_expr} IN ({placeholders}) AND linha_id <= %s "
+        f"GROUP BY {date_expr}, {key_columns}",
+        days + [max_linha_id]
+    )
+
+def _stored_day_checksums(cursor) -> dict:
+    cursor.execute(f"SELECT dia, row_count, checksum FROM {ROLLUP_DAYS_TABLE}")
+    return {str(dia): (int(rows), int(checksum)) for dia, rows, checksum in cursor.fetchall()}
+
+def _save_day_checksums(cursor, days: list, day_checksums: dict):
+    placeholders = ", ".join(["%s"] * len(days))
+    cursor.execute(f"DELETE FROM {ROLLUP_DAYS_TABLE} WHERE dia IN ({placeholders})", days)
+    rows = [(day, day_checksums[day]['rows'], day_checksums[day]['checksum']) for day in days if day in day_checksums]
+    if rows:
+        cursor.executemany(f"INSERT INTO {ROLLUP_DAYS_TABLE} (dia, row_count, checksum) VALUES (%s, %s, %s)", rows)
+
+def refresh_rollup(conn, date_column: str, typed: bool, max_linha_id, day_checksums: dict, days_per_batch: int = 31, rebuild: bool = False, version=None):
+    """
+    Atualiza o rollup até `max_linha_id`. `day_checksums` é o resultado de
+    database._fetch_day_checksums para a tabela inteira ({dia: {'rows', 'checksum', ...}}):
+    os dias cuja contagem ou checksum difere do guardado na última atualização (dias com
+    linhas novas, alteradas ou apagadas) são recalculados por inteiro, `days_per_batch` dias
+    por transação, e os dias que deixaram de existir saem do rollup. Com `rebuild`, todos os
+    dias são recalculados.
+    Ao terminar, registra `max_linha_id` e a `version` da bpd (se houver o contador) na
+    etl_state (veja is_rollup_current).
+    Retorna a quantidade de dias recalculados ou removidos.
+    """
+    ensure_rollup_tables(conn)
+    if max_linha_id is None:
+        return 0
+
+    with _refresh_lock:
+        cursor = conn.cursor()
+        try:
+            current = {day: (values['rows'], values['checksum']) for day, values in day_checksums.items() if values['rows']}
+            if rebuild:
+                cursor.execute(f"DELETE FROM {ROLLUP_TABLE}")
+                cursor.execute(f"DELETE FROM {ROLLUP_DAYS_TABLE}")
+                conn.commit()
+                stored = {}
+            else:
+                stored = _stored_day_checksums(cursor)
+
+            changed = sorted(day for day, values in current.items() if stored.get(day) != values)
+            deleted = sorted(set(stored) - set(current))
+
+            date_expr = date_expression(date_column, typed)
+            for i in range(0, len(changed), days_per_batch):
+                batch = changed[i:i + days_per_batch]
+                _rebuild_days(cursor, batch, date_expr, max_linha_id)
+                _save_day_checksums(cursor, batch, day_checksums)
+                conn.commit()
+
+            if deleted:
+                placeholders = ", ".join(["%s"] * len(deleted))
+                cursor.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE dia IN ({placeholders})", deleted)
+                cursor.execute(f"DELETE FROM {ROLLUP_DAYS_TABLE} WHERE dia IN ({placeholders})", deleted)
+
+            # A posição pode recuar se as últimas linhas da 'bpd' tiverem sido apagadas
+            set_etl_position(cursor, ROLLUP_JOB, max_linha_id, force=True)
+            if version is not None:
+                set_etl_position(cursor, ROLLUP_VERSION_JOB, version, force=True)
+            conn.commit()
+            return len(changed) + len(deleted)
+        finally:
+            cursor.close()
+
+def is_rollup_current(conn, max_linha_id, version=None) -> bool:
+    """
+    Indica se o rollup foi atualizado pelo job de ETL até a marca d'água `max_linha_id` e, com
+    o contador bpd_version, na mesma `version`. Caso contrário os totais são somados na 'bpd'.
+    """
+    if max_linha_id is None:
+        return False
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT job_name, last_linha_id FROM etl_state WHERE job_name IN (%s, %s)",
+            (ROLLUP_JOB, ROLLUP_VERSION_JOB)
+        )
+        positions = {job_name: int(position) for job_name, position in cursor.fetchall()}
+        if positions.get(ROLLUP_JOB) != max_linha_id:
+            return False
+        return version is None or positions.get(ROLLUP_VERSION_JOB) == version
+    except Exception:
+        # etl_state ainda não existe: o job nunca rodou
+        conn.rollback()
+        return False
+    finally:
+        cursor.close()
+
+def can_use_rollup(columns: list, filters: dict = None) -> bool:
+    """
+    Indica se uma consulta de totais pode ser respondida pelo rollup: todas as colunas somadas
+    precisam estar nele e nenhum filtro ativo pode usar colunas fora do grão (como reference).
+    """
+    if any(col not in MEASURABLE_COLUMNS for col in columns):
+        return False
+    return all(col in ROLLUP_FILTER_COLUMNS for col, values in (filters or {}).items() if values)
@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import pandas as pd
+import streamlit as st
+from utils import get_setting
+from instrumentation import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    pc = None
+    PYARROW_AVAILABLE = False
+
+class SnapshotStore:
+    """
+    Cópia local da tabela 'bpd' em arquivos Arrow IPC, um por dia (partição `dia=YYYY-MM-DD`).
+    A leitura é feita com memory map e só abre as partições do período pedido. O manifest
+    guarda a marca d'água e a contagem/checksum de cada dia, usados para sincronizar apenas
+    as partições novas ou alteradas.
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self._lock = threading.Lock()
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._manifest = self._load_manifest()
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.root_dir, 'manifest.json')
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            manifest['watermark'] = tuple(manifest['watermark']) if manifest.get('watermark') else None
+            return manifest
+        except (FileNotFoundError, ValueError, KeyError):
+            return {'watermark': None, 'days': {}}
+
+    def _save_manifest(self):
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    @property
+    def lock(self):
+        """Lock que serializa as sincronizações do snapshot."""
+        return self._lock
+
+    @property
+    def watermark(self):
+        return self._manifest['watermark']
+
+    def diff(self, server_days: dict):
+        """
+        Compara a contagem/checksum de cada dia no servidor com o manifest.
+        Retorna (dias a regravar, dias a remover).
+        """
+        local_days = self._manifest['days']
+        days_to_write = [
+            dia for dia, day in server_days.items()
+            if dia not in local_days
+            or (local_days[dia]['rows'], local_days[dia]['checksum']) != (day['rows'], day['checksum'])
+        ]
+        days_to_delete = [dia for dia in local_days if dia not in server_days]
+        return sorted(days_to_write), sorted(days_to_delete)
+
+    def write_day(self, dia: str, df: pd.DataFrame, rows: int, checksum: int, version):
+        """
+        Grava a partição de um dia. Cada versão ganha um arquivo novo, porque no Windows um
+        arquivo ainda mapeado em memória por uma leitura não pode ser substituído.
+        """
+        old_file = self._manifest['days'].get(dia, {}).get('file')
+        file_name = None
+        if not df.empty:
+            partition_dir = os.path.join(self.root_dir, f"dia={dia}")
+            os.makedirs(partition_dir, exist_ok=True)
+            file_name = os.path.join(f"dia={dia}", f"part-{version}.arrow")
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # Decimais viram float64 e categorias voltam a ser texto, para que todas as partições
+            # tenham o mesmo schema; o schema tipado é reaplicado na leitura
+            for i, field in enumerate(table.schema):
+                if pa.types.is_decimal(field.type):
+                    table = table.set_column(i, field.name, pc.cast(table[field.name], pa.float64()))
+                elif pa.types.is_dictionary(field.type):
+                    table = table.set_column(i, field.name, pc.cast(table[field.name], field.type.value_type))
+            tmp_path = os.path.join(self.root_dir, file_name + '.tmp')
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, os.path.join(self.root_dir, file_name))
+
+        self._manifest['days'][dia] = {'rows': rows, 'checksum': checksum, 'file': file_name}
+        if old_file and old_file != file_name:
+            self._remove_file(old_file)
+
+    def delete_day(self, dia: str):
+        day = self._manifest['days'].pop(dia, None)
+        if day and day.get('file'):
+            self._remove_file(day['file'])
+
+    def _remove_file(self, file_name: str):
+        try:
+            os.remove(os.path.join(self.root_dir, file_name))
+        except OSError:
+            pass  # Ainda mapeado por uma leitura; o arquivo fica órfão até a próxima limpeza
+
+    def commit(self, watermark):
+        """Registra a marca d'água sincronizada e persiste o manifest."""
+        self._manifest['watermark'] = tuple(watermark)
+        self._save_manifest()
+
+    def read(self, start_date=None, end_date=None, player_name: str = None, columns: list = None) -> pd.DataFrame:
+        """
+        Lê as partições do período (todas, se não houver período) com memory map, filtrando
+        pelo jogador quando informado e mantendo só as colunas pedidas (todas, se None).
+        Retorna um DataFrame vazio se nada for encontrado.
+        """
+        start_key = str(start_date) if start_date and end_date else None
+        end_key = str(end_date) if start_date and end_date else None
+
+        # Lista das partições tirada sob o lock para não concorrer com uma sincronização em andamento
+        with self._lock:
+            days = sorted(self._manifest['days'].items())
+
+        tables = []
+        for dia, day in days:
+            if not day.get('file'):
+                continue
+            if start_key and not (start_key <= dia <= end_key):
+                continue
+            source = pa.memory_map(os.path.join(self.root_dir, day['file']), 'r')
+            table = pa.ipc.open_file(source).read_all()
+            if player_name is not None:
+                table = table.filter(pc.equal(table['playerName'], player_name))
+            if columns is not None:
+                table = table.select([col for col in columns if col in table.column_names])
+            if table.num_rows:
+                tables.append(table)
+
+        if not tables:
+            return pd.DataFrame()
+        try:
+            table = pa.concat_tables(tables, promote_options="permissive")
+        except TypeError:
+            table = pa.concat_tables(tables, promote=True)  # pyarrow < 14
+        return table.to_pandas()
+
+    def stats(self) -> dict:
+        days = self._manifest['days']
+        return {
+            'watermark': self._manifest['watermark'],
+            'days': len(days),
+            'rows': sum(day['rows'] for day in days.values()),
+            'root_dir': self.root_dir,
+        }
+
+@st.cache_resource
+def get_snapshot_store():
+    """
+    Retorna o snapshot local do processo, ou None se ele estiver desativado ou se o pyarrow
+    não estiver instalado. Ativado pela seção [snapshot] do secrets.toml
+    (enabled = true e, opcionalmente, path). O pyarrow está no requirements.txt (o próprio
+    Streamlit depende dele); sem ele o aplicativo continua funcionando e lê tudo do MySQL.
+    """
+    if not get_setting("snapshot", "enabled", False):
+        return None
+    if not PYARROW_AVAILABLE:
+        logger.warning("Snapshot local ativado, mas o pyarrow não está instalado. Usando apenas o MySQL.")
+        return None
+    return SnapshotStore(get_setting("snapshot", "path", os.path.join("data", "snapshot")))
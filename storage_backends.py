@@ -0,0 +1,264 @@
+import os
+import re
+import sqlite3
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+import mysql.connector
+
+class MySQLBackend:
+    """Banco MySQL remoto (o padrão), acessado pelo mysql.connector."""
+
+    name = 'mysql'
+
+    def __init__(self, connect_args: dict):
+        self.connect_args = connect_args
+
+    def connect(self):
+        return mysql.connector.connect(**self.connect_args)
+
+    def column_types(self, conn, table: str) -> dict:
+        """Retorna {coluna: tipo em minúsculas} da tabela."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                (table,)
+            )
+            return {name: str(data_type).lower() for name, data_type in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def column_max_length(self, conn, table: str, column: str):
+        """Tamanho máximo (em caracteres) de uma coluna de texto, ou None se não houver limite."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT CHARACTER_MAXIMUM_LENGTH FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+                (table, column)
+            )
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] is not None else None
+        finally:
+            cursor.close()
+
+# --- SQLite ---
+# As consultas do app são escritas para o MySQL; a conexão SQLite traduz o que for preciso
+# (parâmetros %s, DDL, collation das colunas, ON DUPLICATE KEY UPDATE, SHOW TABLES, TRUNCATE)
+# e registra as funções do MySQL usadas nelas, para que as mesmas consultas rodem num arquivo local.
+
+_TABLE_OPTIONS = re.compile(r"\)\s*ENGINE\s*=.*$", re.IGNORECASE | re.DOTALL)
+_AUTO_INCREMENT_KEY = re.compile(r"\b(?:BIG)?INT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.IGNORECASE)
+_ON_UPDATE = re.compile(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b", re.IGNORECASE)
+_ENUM = re.compile(r"\bENUM\s*\([^)]*\)", re.IGNORECASE)
+_INLINE_INDEX = re.compile(r",\s*(?:INDEX|KEY)\s+`?(\w+)`?\s*\(([^)]*)\)", re.IGNORECASE)
+_COLUMN_COLLATION = re.compile(r"\s+(?:CHARACTER\s+SET\s+\w+\s+)?COLLATE\s+\w+", re.IGNORECASE)
+_UNIQUE_KEY = re.compile(r"\bUNIQUE\s+KEY\s+`?\w+`?\s*\(", re.IGNORECASE)
+_CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?", re.IGNORECASE)
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_REF = re.compile(r"\bVALUES\s*\(\s*`?(\w+)`?\s*\)", re.IGNORECASE)
+_SHOW_TABLES = re.compile(r"^\s*SHOW\s+TABLES(?:\s+LIKE\s+('[^']*'))?\s*$", re.IGNORECASE)
+_TRUNCATE = re.compile(r"^\s*TRUNCATE\s+TABLE\s+", re.IGNORECASE)
+
+@lru_cache(maxsize=512)
+def translate_mysql_sql(query: str) -> tuple:
+    """
+    Traduz uma consulta escrita para o MySQL para o SQLite. Retorna uma tupla de comandos: o
+    principal (com os parâmetros) e, num CREATE TABLE, os CREATE INDEX dos índices declarados
+    dentro da tabela, que o SQLite não aceita.
+    """
+    show_tables = _SHOW_TABLES.match(query)
+    if show_tables:
+        like = f" AND name LIKE {show_tables.group(1)}" if show_tables.group(1) else ""
+        return (f"SELECT name FROM sqlite_master WHERE type = 'table'{like}",)
+
+    query = _TRUNCATE.sub("DELETE FROM ", query).replace("%s", "?")
+    extra = []
+    create_table = _CREATE_TABLE.match(query)
+    if create_table:
+        table = create_table.group(1)
+        query = _TABLE_OPTIONS.sub(")", query)
+        query = _AUTO_INCREMENT_KEY.sub("INTEGER PRIMARY KEY AUTOINCREMENT", query)
+        query = _ON_UPDATE.sub("", query)
+        query = _ENUM.sub("TEXT", query)
+        query = _COLUMN_COLLATION.sub("", query)
+        query = _UNIQUE_KEY.sub("UNIQUE (", query)
+        for index_name, columns in _INLINE_INDEX.findall(query):
+            extra.append(f"CREATE INDEX IF NOT EXISTS {table}_{index_name} ON {table} ({columns})")
+        query = _INLINE_INDEX.sub("", query)
+
+    if _ON_DUPLICATE.search(query):
+        head, assignments = _ON_DUPLICATE.split(query, maxsplit=1)
+        query = head + "ON CONFLICT DO UPDATE SET" + _VALUES_REF.sub(r"excluded.\1", assignments)
+    return (query,) + tuple(extra)
+
+def _sql_param(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'item'):  # Escalares do numpy
+        return value.item()
+    return value
+
+def _concat_ws(separator, *values):
+    if separator is None:
+        return None
+    return str(separator).join(str(value) for value in values if value is not None)
+
+def _crc32(value):
+    return None if value is None else zlib.crc32(str(value).encode('utf-8'))
+
+def _least(*values):
+    return None if any(value is None for value in values) else min(values)
+
+def _greatest(*values):
+    return None if any(value is None for value in values) else max(values)
+
+class _BitXor:
+    def __init__(self):
+        self.value = 0
+
+    def step(self, value):
+        if value is not None:
+            self.value ^= int(value)
+
+    def finalize(self):
+        return self.value
+
+class SQLiteCursor:
+    """Cursor com a interface do mysql.connector usada pelo app (inclusive `dictionary=True`)."""
+
+    def __init__(self, cursor, dictionary: bool = False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, query: str, params=()):
+        statements = translate_mysql_sql(query)
+        self._cursor.execute(statements[0], [_sql_param(value) for value in params or ()])
+        for statement in statements[1:]:
+            self._cursor.connection.execute(statement)
+
+    def executemany(self, query: str, seq_of_params):
+        statements = translate_mysql_sql(query)
+        self._cursor.executemany(statements[0], ([_sql_param(value) for value in params] for params in seq_of_params))
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size: int = 1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(desc[0] for desc in self._cursor.description or ())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    """Conexão SQLite com a interface do mysql.connector usada pelo pool e pelos helpers."""
+
+    unread_result = False
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def cursor(self, dictionary: bool = False, buffered: bool = None):
+        return SQLiteCursor(self._conn.cursor(), dictionary=dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def consume_results(self):
+        pass
+
+    def is_connected(self) -> bool:
+        try:
+            self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._conn.close()
+
+class SQLiteBackend:
+    """
+    Banco SQLite local num único arquivo, para desenvolvimento offline, testes de carga e
+    benchmarks sem o servidor MySQL. As consultas são as mesmas do MySQL (veja translate_mysql_sql).
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def connect(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.create_function("CRC32", 1, _crc32, deterministic=True)
+        conn.create_function("CONCAT_WS", -1, _concat_ws, deterministic=True)
+        conn.create_function("IF", 3, lambda condition, if_true, if_false: if_true if condition else if_false, deterministic=True)
+        conn.create_function("LEAST", -1, _least, deterministic=True)
+        conn.create_function("GREATEST", -1, _greatest, deterministic=True)
+        conn.create_aggregate("BIT_XOR", 1, _BitXor)
+        return SQLiteConnection(conn)
+
+    def column_types(self, conn, table: str) -> dict:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"PRAGMA table_info(`{table}`)")
+            return {row[1]: str(row[2]).lower() for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def column_max_length(self, conn, table: str, column: str):
+        # O SQLite não limita o tamanho do texto, qualquer que seja o tipo declarado
+        return None
+
+STORAGE_BACKENDS = ('mysql', 'sqlite')
+
+def create_storage_backend(backend_name: str, mysql_settings: dict = None, sqlite_path: str = None):
+    """Cria o backend pelo nome ('mysql' ou 'sqlite')."""
+    if backend_name == 'sqlite':
+        return SQLiteBackend(sqlite_path or os.path.join("data", "bpd.sqlite3"))
+    if backend_name == 'mysql':
+        return MySQLBackend({
+            'host': mysql_settings["host"],
+            'user': mysql_settings["user"],
+            'password': mysql_settings["password"],
+            'database': mysql_settings["database"],
+            'port': int(mysql_settings.get("port", 3306)),
+        })
+    raise ValueError(f"Backend de armazenamento desconhecido: {backend_name!r} (use um de {', '.join(STORAGE_BACKENDS)})")
@@ -1,27 +1,44 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-
-def display_full_table(df: pd.DataFrame, user_role: str):
-    # st.subheader("Tabela Completa de Dados")
-
-    if df.empty:
-        st.warning("Nenhum dado disponível para exibição.")
-        return
-
-    # O DataFrame filtrado é o mesmo que o original, pois a busca foi removida.
-    df_filtered = df
-
-    # --- Seleção de Colunas em Expander ---
+from bpd_schema import BPD_COLUMNS, get_dataset_version
+from database import load_column_totals, load_bpd_page, iter_bpd_pages, get_connection_pool
+from aggregation import MEASURABLE_COLUMNS, compute_totals
+from exporter import EXPORT_FORMATS, build_totals_row, get_export, is_export_cached, iter_frame_chunks
+from export_jobs import ExportQueueFull, get_export_job_queue
+from utils import get_setting
+from instrumentation import logger, span
+
+# Colunas exibidas na tabela antes de o usuário alterar a seleção
+DEFAULT_TABLE_COLUMNS = ['dia', 'reference', 'club', 'playerName', 'agentName', 'localWins', 'localFee', 'hands']
+
+# No modo servidor não há a opção "Todas": a tabela nunca traz o período inteiro
+SERVER_PAGE_SIZE_OPTIONS = [20, 50, 100, 1000]
+
+def get_selected_table_columns() -> list:
+    """
+    Colunas que a tabela vai exibir neste rerun, lidas do estado da sessão antes de a tabela ser
+    desenhada, para que load_data selecione só o necessário. Une o valor atual do seletor com o
+    valor definido pelos botões "Selecionar Todas"/"Limpar Seleção", que só chega ao seletor
+    quando ele é desenhado de novo.
+    """
+    selected = st.session_state.get('selected_columns_multiselect', DEFAULT_TABLE_COLUMNS)
+    current = st.session_state.get('column_selector', [])
+    return list(dict.fromkeys(list(selected) + list(current)))
+
+def _display_column_selector() -> list:
+    """
+    Desenha o expander de seleção de colunas e retorna as colunas escolhidas (pode ser vazia).
+    """
     with st.expander("Seleção de Colunas", expanded=False):
         st.write("Use as opções abaixo para configurar a exibição da tabela.")
         
-        all_columns = df_filtered.columns.tolist()
+        # Todas as colunas da tabela bpd ficam disponíveis, mesmo as que ainda não foram
+        # carregadas: load_data busca as que faltarem no próximo rerun
+        all_columns = list(BPD_COLUMNS)
         
         # Definir colunas padrão para exibição inicial
-        default_cols = ['dia', 'reference', 'club', 'playerName', 'agentName', 'localWins', 'localFee', 'hands']
-        # Garantir que as colunas padrão existam no DataFrame
-        default_cols = [col for col in default_cols if col in all_columns]
+        default_cols = list(DEFAULT_TABLE_COLUMNS)
 
         # Inicializa o estado da sessão para as colunas selecionadas se não existir
         if 'selected_columns_multiselect' not in st.session_state:
@@ -49,95 +66,12 @@ def display_full_table(df: pd.DataFrame, user_role: str):
 
         if not selected_columns:
             st.warning("Por favor, selecione pelo menos uma coluna para exibir.")
-            return
-
-    df_display = df_filtered[selected_columns]
-
-    # --- Configuração de Paginação ---
-    total_rows = len(df_display)
-    page_size_options = [20, 50, 100, 1000, "Todas"]
-    
-    # Garante que a sessão tenha um valor padrão para 'page_size'
-    if 'page_size' not in st.session_state or st.session_state['page_size'] not in page_size_options:
-        st.session_state['page_size'] = 50
-
-    # --- Exibição da Tabela e Opções Adicionais ---
-    # st.markdown("### Dados da Tabela")
-
-    # --- Prepare DataFrame for Export (including Totals) ---
-    df_export_with_totals = df_display.copy() # Start with the full selected data
-
-    measurable_columns = [
-        'localWins', 'localFee', 'hands',
-        'dolarWins', 'dolarFee', 'dolarRakeback', 'dolarRebate', 'dolarAgentSett',
-        'realWins', 'realFee', 'realRakeback', 'realRebate', 'realAgentSett',
-        'realRevShare', 'realBPFProfit', 'deal', 'rebate'
-    ]
-
-    columns_to_sum = [col for col in measurable_columns if col in df_display.columns and pd.api.types.is_numeric_dtype(df_display[col])]
-
-    if columns_to_sum:
-        totals_row_data = {}
-        # Initialize all columns in df_export_with_totals with empty string for the totals row
-        for col in df_export_with_totals.columns:
-            totals_row_data[col] = ""
-
-        # Populate only the measurable columns with their sums
-        for col_name in columns_to_sum:
-            total_value = df_display[col_name].sum() # Sum from df_display (before pagination) - mantém total geral para exportação
-            totals_row_data[col_name] = total_value
-
-        # Add a label for the totals row, e.g., in the first column
-        if not df_export_with_totals.empty and df_export_with_totals.columns[0] in totals_row_data:
-            totals_row_data[df_export_with_totals.columns[0]] = "TOTAL GERAL"
-        elif not df_export_with_totals.empty:
-            # Fallback if first column is not suitable, try to find a string/object column
-            found_label_col = False
-            for col in df_export_with_totals.columns:
-                if pd.api.types.is_string_dtype(df_export_with_totals[col]) or pd.api.types.is_object_dtype(df_export_with_totals[col]):
-                    totals_row_data[col] = "TOTAL GERAL"
-                    found_label_col = True
-                    break
-            if not found_label_col and not df_export_with_totals.empty: # If no suitable column found, put in first
-                totals_row_data[df_export_with_totals.columns[0]] = "TOTAL GERAL"
-
-
-        # Convert to DataFrame and concatenate
-        totals_df = pd.DataFrame([totals_row_data])
-        df_export_with_totals = pd.concat([df_export_with_totals, totals_df], ignore_index=True)
-
-    # --- Exibição da Tabela e Opções Adicionais ---
-    # st.markdown("### Dados da Tabela")
-
-    # Botões de Download lado a lado usando colunas
-    csv = df_export_with_totals.to_csv(index=False).encode('utf-8')
-    import io
-    excel_buffer = io.BytesIO()
-    df_export_with_totals.to_excel(excel_buffer, index=False, engine='openpyxl')
-    excel_buffer.seek(0) # Volta para o início do buffer
-
-    # Cria 3 colunas, mas só usa a primeira para os botões (um ao lado do outro)
-    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
-    with col1:
-        btn_col_csv, btn_col_xlsx = st.columns(2)
-        with btn_col_csv:
-            st.download_button(
-                label="Baixar dados como CSV",
-                data=csv,
-                file_name='dados_tabela.csv',
-                mime='text/csv',
-                help="Baixa os dados atualmente exibidos na tabela (filtrados e com colunas selecionadas) e os totais como um arquivo CSV."
-            )
-        with btn_col_xlsx:
-            st.download_button(
-                label="Baixar dados como XLSX",
-                data=excel_buffer,
-                file_name='dados_tabela.xlsx',
-                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                help="Baixa os dados atualmente exibidos na tabela (filtrados e com colunas selecionadas) e os totais como um arquivo XLSX."
-            )
-    # col2 e col3 ficam vazias para espaçamento/estética
+    return selected_columns
 
+def _resolve_pagination(total_rows: int):
+    """
+    Ajusta a página atual ao tamanho de página escolhido e retorna (linhas por página, total de páginas).
+    """
     # Define a página atual, garantindo que ela seja reiniciada se os filtros mudarem
     if 'current_page' not in st.session_state:
         st.session_state['current_page'] = 1
@@ -155,38 +89,19 @@ def display_full_table(df: pd.DataFrame, user_role: str):
     if st.session_state['current_page'] > total_pages:
         st.session_state['current_page'] = total_pages
 
-    # --- Conversão para Numérico das Colunas Mensuráveis ---
-    # Lista de colunas que devem ter seus totais exibidos
-    measurable_columns = [
-        'localWins', 'localFee', 'hands',
-        'dolarWins', 'dolarFee', 'dolarRakeback', 'dolarRebate', 'dolarAgentSett',
-        'realWins', 'realFee', 'realRakeback', 'realRebate', 'realAgentSett',
-        'realRevShare', 'realBPFProfit', 'deal', 'rebate'
-    ]
-
-    # Converte colunas mensuráveis para numérico antes da paginação
-    for col in measurable_columns:
-        if col in df_display.columns and not pd.api.types.is_numeric_dtype(df_display[col]):
-            try:
-                df_display[col] = pd.to_numeric(df_display[col], errors='coerce')
-                print(f"Coluna '{col}' convertida para numérico antes da paginação")
-            except Exception as e:
-                print(f"Erro ao converter coluna '{col}': {e}")
-
-    start_row = (st.session_state['current_page'] - 1) * rows_per_page
-    end_row = start_row + rows_per_page
-    df_paginated = df_display.iloc[start_row:end_row]
+    return rows_per_page, total_pages
 
-    # Exibição da Tabela
-    st.dataframe(df_paginated, use_container_width=True, hide_index=True)
 
-    # --- Controles de Paginação Visuais ---
+def _display_pagination_controls(rows_shown: int, total_rows: int, total_pages: int, page_size_options: list):
+    """
+    Desenha as informações da página, o seletor de linhas por página e os botões de navegação.
+    """
     st.markdown("<hr style='margin: 1em 0;'>", unsafe_allow_html=True)
     
     col_info, col_size, col_nav = st.columns([2, 2, 3])
 
     with col_info:
-        st.info(f"Exibindo {len(df_paginated)} de {total_rows} | Página {st.session_state['current_page']} de {total_pages}")
+        st.info(f"Exibindo {rows_shown} de {total_rows} | Página {st.session_state['current_page']} de {total_pages}")
 
     with col_size:
         # Layout para colocar o rótulo ao lado do seletor
@@ -255,111 +170,329 @@ def display_full_table(df: pd.DataFrame, user_role: str):
                 st.session_state['current_page'] = total_pages
                 st.rerun()
 
+def _display_totals_cards(totals: dict, columns_to_sum: list, description: str):
+    """
+    Desenha um card por coluna com o total informado, limitando a 4 cards por linha.
+    """
+    cols_per_row = 4
+    num_rows = int(np.ceil(len(columns_to_sum) / cols_per_row))
+
+    for i in range(num_rows):
+        current_cols = st.columns(cols_per_row)
+        for j in range(cols_per_row):
+            idx = i * cols_per_row + j
+            if idx < len(columns_to_sum):
+                col_name = columns_to_sum[idx]
+                total_value = totals.get(col_name)
+
+                # Formatação para valores monetários
+                try:
+                    if total_value is None or pd.isna(total_value):
+                        formatted_value = "N/A"
+                    elif 'dolar' in col_name.lower():
+                        formatted_value = f"US$ {total_value:,.2f}"
+                    elif 'real' in col_name.lower():
+                        formatted_value = f"R$ {total_value:,.2f}"
+                    else:
+                        formatted_value = f"{total_value:,.0f}" # Para mãos, etc.
+                except (ValueError, TypeError):
+                    formatted_value = "N/A"
+
+                # Determinar cor baseado no valor (para valores monetários)
+                card_class = "metric-card-improved"
+                if formatted_value != "N/A":
+                    if 'wins' in col_name.lower() and total_value > 0:
+                        card_class = "metric-card-improved positive"
+                    elif 'fee' in col_name.lower() and total_value < 0:
+                        card_class = "metric-card-improved negative"
+
+                with current_cols[j]:
+                    st.markdown(f'''
+                    <div class="{card_class}">
+                        <div class="metric-content">
+                            <div class="metric-label">{col_name}</div>
+                            <div class="metric-value">{formatted_value}</div>
+                            <div class="metric-description">{description}</div>
+                        </div>
+                    </div>
+                    ''', unsafe_allow_html=True)
+
+def _display_export_button(df_display: pd.DataFrame, export_format: str, totals_row: dict, data_version: str):
+    """
+    Mostra o download do formato. O arquivo só é gerado quando o usuário clica em "Preparar";
+    depois de gerado fica em cache pela versão dos dados e colunas, e o download aparece direto.
+    """
+    label = export_format.upper()
+    columns = list(df_display.columns)
+    file_info = EXPORT_FORMATS[export_format]
+    ready = data_version is not None and is_export_cached(columns, export_format, data_version)
+    if not ready and not st.button(f"Preparar {label}", key=f"prepare_export_{export_format}",
+                                   help=f"Gera o arquivo {label} com os dados atualmente exibidos na tabela (filtrados e com colunas selecionadas) e os totais."):
+        return
+    try:
+        with st.spinner(f"Gerando arquivo {label}..."), span('export', format=export_format, rows=len(df_display)):
+            data = get_export(df_display, columns, export_format, totals_row, version=data_version)
+    except Exception as e:
+        st.error(f"Erro ao gerar o arquivo {label}: {e}")
+        return
+    st.download_button(
+        label=f"Baixar dados como {label}",
+        data=data,
+        file_name=file_info['file_name'],
+        mime=file_info['mime'],
+        help=f"Baixa os dados atualmente exibidos na tabela (filtrados e com colunas selecionadas) e os totais como um arquivo {label}."
+    )
+
+def _display_background_export_button(export_format: str, columns: list, chunks_factory, totals_row: dict, total_rows: int):
+    """
+    Botão que enfileira a exportação do formato na fila de exportações em segundo plano, para
+    volumes grandes: o arquivo é gerado fora da thread do script, sem travar a página.
+    """
+    label = export_format.upper()
+    if not st.button(f"Exportar {label}", key=f"background_export_{export_format}",
+                     help=f"Gera o arquivo {label} com os dados da tabela (filtrados e com colunas selecionadas) e os totais em segundo plano. O download aparece abaixo quando terminar."):
+        return
+    try:
+        get_export_job_queue().submit(st.session_state.get('username'), export_format, columns, chunks_factory, totals_row, total_rows)
+    except ExportQueueFull as e:
+        st.warning(str(e))
+        return
+    st.rerun()
+
+def _render_export_jobs(owner: str):
+    queue = get_export_job_queue()
+    for job in queue.jobs_for(owner):
+        label = job.export_format.upper()
+        if job.active:
+            progress = job.progress
+            text = f"Exportação {label}: {job.rows_written:,} linhas gravadas" + (" (na fila)" if job.status == 'queued' else "")
+            st.progress(progress or 0.0, text=text)
+            if st.button("Cancelar", key=f"cancel_export_{job.id}"):
+                queue.cancel(job.id)
+        elif job.status == 'done':
+            file_info = EXPORT_FORMATS[job.export_format]
+            col_download, col_discard = st.columns([3, 1])
+            with col_download:
+                # O arquivo só é lido quando o usuário clica no download
+                st.download_button(
+                    label=f"Baixar exportação {label} ({job.rows_written:,} linhas)",
+                    data=job.read_bytes,
+                    file_name=file_info['file_name'],
+                    mime=file_info['mime'],
+                    key=f"download_export_{job.id}",
+                    on_click="ignore",
+                )
+            with col_discard:
+                if st.button("Descartar", key=f"discard_export_{job.id}"):
+                    queue.discard(job.id)
+                    st.rerun()
+        elif job.status == 'error':
+            st.error(f"Erro na exportação {label}: {job.error}")
+            if st.button("Descartar", key=f"discard_export_{job.id}"):
+                queue.discard(job.id)
+                st.rerun()
+        else:
+            queue.discard(job.id)
+
+@st.fragment(run_every=2)
+def _display_running_export_jobs(owner: str):
+    # Atualiza só este trecho da página enquanto houver exportações ativas
+    if not any(job.active for job in get_export_job_queue().jobs_for(owner)):
+        st.rerun(scope="app")
+    _render_export_jobs(owner)
+
+def _display_export_jobs(owner: str):
+    """Progresso, downloads e erros das exportações em segundo plano do usuário."""
+    if any(job.active for job in get_export_job_queue().jobs_for(owner)):
+        _display_running_export_jobs(owner)
+    else:
+        _render_export_jobs(owner)
+
+def display_full_table(df: pd.DataFrame, user_role: str):
+    # st.subheader("Tabela Completa de Dados")
+
+    if df.empty:
+        st.warning("Nenhum dado disponível para exibição.")
+        return
+
+    # O DataFrame filtrado é o mesmo que o original, pois a busca foi removida.
+    df_filtered = df
+
+    # --- Seleção de Colunas em Expander ---
+    selected_columns = _display_column_selector()
+    if not selected_columns:
+        return
+
+    df_display = df_filtered[[col for col in selected_columns if col in df_filtered.columns]]
+
+    # --- Configuração de Paginação ---
+    total_rows = len(df_display)
+    page_size_options = [20, 50, 100, 1000, "Todas"]
+    
+    # Garante que a sessão tenha um valor padrão para 'page_size'
+    if 'page_size' not in st.session_state or st.session_state['page_size'] not in page_size_options:
+        st.session_state['page_size'] = 50
+
+    # --- Exibição da Tabela e Opções Adicionais ---
+    # st.markdown("### Dados da Tabela")
+
+    columns_to_sum = [col for col in MEASURABLE_COLUMNS if col in df_display.columns and pd.api.types.is_numeric_dtype(df_display[col])]
+
+    # Totais gerais calculados uma vez por versão dos dados filtrados, para a exportação e os cards
+    data_version = get_dataset_version(df_filtered)
+    grand_totals = compute_totals(df_filtered, columns_to_sum, version=data_version)
+
+    # --- Exibição da Tabela e Opções Adicionais ---
+    # st.markdown("### Dados da Tabela")
+
+    # Os arquivos só são gerados quando o usuário pede, e não a cada rerun
+    totals_row = build_totals_row(list(df_display.columns), grand_totals['sums']) if columns_to_sum else None
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
+    # Volumes grandes vão para a fila de exportações em segundo plano
+    background_export = total_rows >= int(get_setting("export", "background_min_rows", 200000))
+    with col1:
+        btn_col_csv, btn_col_xlsx = st.columns(2)
+        for export_format, btn_col in (('csv', btn_col_csv), ('xlsx', btn_col_xlsx)):
+            with btn_col:
+                if background_export:
+                    _display_background_export_button(export_format, list(df_display.columns), lambda: iter_frame_chunks(df_display), totals_row, total_rows)
+                else:
+                    _display_export_button(df_display, export_format, totals_row, data_version)
+    if background_export:
+        _display_export_jobs(st.session_state.get('username'))
+    # col2 e col3 ficam vazias para espaçamento/estética
+
+    rows_per_page, total_pages = _resolve_pagination(total_rows)
+
+    # --- Conversão para Numérico das Colunas Mensuráveis ---
+    # Lista de colunas que devem ter seus totais exibidos
+    # Converte colunas mensuráveis para numérico antes da paginação
+    for col in MEASURABLE_COLUMNS:
+        if col in df_display.columns and not pd.api.types.is_numeric_dtype(df_display[col]):
+            try:
+                df_display[col] = pd.to_numeric(df_display[col], errors='coerce')
+                logger.debug("Coluna '%s' convertida para numérico antes da paginação", col)
+            except Exception as e:
+                logger.warning("Erro ao converter coluna '%s': %s", col, e)
+
+    start_row = (st.session_state['current_page'] - 1) * rows_per_page
+    end_row = start_row + rows_per_page
+    df_paginated = df_display.iloc[start_row:end_row]
+
+    # Exibição da Tabela
+    st.dataframe(df_paginated, use_container_width=True, hide_index=True)
+
+    # --- Controles de Paginação Visuais ---
+    _display_pagination_controls(len(df_paginated), total_rows, total_pages, page_size_options)
+
     # --- Totais das Colunas Mensuráveis com Cards Modernos ---
     st.markdown("### 📊 Totais")
     
     # Filtra as colunas mensuráveis que estão presentes no df_display e são numéricas
-    columns_to_sum = [col for col in measurable_columns if col in df_display.columns and pd.api.types.is_numeric_dtype(df_display[col])]
-    
-    print(f"Colunas para somar: {columns_to_sum}")
-    print("=============================\n")
+    columns_to_sum = [col for col in MEASURABLE_COLUMNS if col in df_display.columns and pd.api.types.is_numeric_dtype(df_display[col])]
 
     if columns_to_sum:
         # Seção de totais da página atual
         st.markdown("#### 📄 Totais da Página Atual")
-        
-        # Cria colunas para exibir os totais, limitando a 4 por linha para melhor visualização
-        cols_per_row = 4
-        num_rows = int(np.ceil(len(columns_to_sum) / cols_per_row))
-
-        for i in range(num_rows):
-            current_cols = st.columns(cols_per_row)
-            for j in range(cols_per_row):
-                idx = i * cols_per_row + j
-                if idx < len(columns_to_sum):
-                    col_name = columns_to_sum[idx]
-                    # Calcula o total apenas dos dados da página atual
-                    total_value = df_paginated[col_name].sum()
-                    
-                    # Diagnóstico específico para valores N/A
-                    print(f"DEBUG TOTAIS: Coluna '{col_name}' - Total: {total_value}")
-                    print(f"  Valores únicos na página: {df_paginated[col_name].unique()}")
-                    print(f"  Contagem de NaN: {df_paginated[col_name].isna().sum()}")
-                    print(f"  Contagem de valores válidos: {df_paginated[col_name].notna().sum()}")
-                    
-                    # Formatação para valores monetários
-                    try:
-                        if pd.isna(total_value) or total_value is None:
-                            formatted_value = "N/A"
-                        elif 'dolar' in col_name.lower():
-                            formatted_value = f"US$ {total_value:,.2f}"
-                        elif 'real' in col_name.lower():
-                            formatted_value = f"R$ {total_value:,.2f}"
-                        else:
-                            formatted_value = f"{total_value:,.0f}" # Para mãos, etc.
-                    except (ValueError, TypeError):
-                        formatted_value = "N/A"
-
-                    # Determinar cor baseado no valor (para valores monetários)
-                    card_class = "metric-card-improved"
-                    if 'wins' in col_name.lower() and total_value > 0:
-                        card_class = "metric-card-improved positive"
-                    elif 'fee' in col_name.lower() and total_value < 0:
-                        card_class = "metric-card-improved negative"
-
-                    with current_cols[j]:
-                        st.markdown(f'''
-                        <div class="{card_class}">
-                            <div class="metric-content">
-                                <div class="metric-label">{col_name}</div>
-                                <div class="metric-value">{formatted_value}</div>
-                                <div class="metric-description">Total da página atual</div>
-                            </div>
-                        </div>
-                        ''', unsafe_allow_html=True)
+        # Calcula o total apenas dos dados da página atual
+        page_totals = compute_totals(df_paginated, columns_to_sum)
+        logger.debug("Totais da página: %s; NaN: %s", page_totals['sums'], page_totals['nans'])
+        _display_totals_cards(page_totals['sums'], columns_to_sum, "Total da página atual")
         
         # Seção de totais gerais (apenas se houver paginação)
         if st.session_state.get('page_size') != "Todas" and total_pages > 1:
             st.markdown("#### 📊 Totais Gerais (Todos os Dados Filtrados)")
-            
-            for i in range(num_rows):
-                current_cols = st.columns(cols_per_row)
-                for j in range(cols_per_row):
-                    idx = i * cols_per_row + j
-                    if idx < len(columns_to_sum):
-                        col_name = columns_to_sum[idx]
-                        # Calcula o total de todos os dados filtrados
-                        total_value = df_display[col_name].sum()
-                        
-                        # Formatação para valores monetários
-                        try:
-                            if pd.isna(total_value) or total_value is None:
-                                formatted_value = "N/A"
-                            elif 'dolar' in col_name.lower():
-                                formatted_value = f"US$ {total_value:,.2f}"
-                            elif 'real' in col_name.lower():
-                                formatted_value = f"R$ {total_value:,.2f}"
-                            else:
-                                formatted_value = f"{total_value:,.0f}" # Para mãos, etc.
-                        except (ValueError, TypeError):
-                            formatted_value = "N/A"
-
-                        # Determinar cor baseado no valor (para valores monetários)
-                        card_class = "metric-card-improved"
-                        if 'wins' in col_name.lower() and total_value > 0:
-                            card_class = "metric-card-improved positive"
-                        elif 'fee' in col_name.lower() and total_value < 0:
-                            card_class = "metric-card-improved negative"
-
-                        with current_cols[j]:
-                            st.markdown(f'''
-                            <div class="{card_class}">
-                                <div class="metric-content">
-                                    <div class="metric-label">{col_name}</div>
-                                    <div class="metric-value">{formatted_value}</div>
-                                    <div class="metric-description">Total geral filtrado</div>
-                                </div>
-                            </div>
-                            ''', unsafe_allow_html=True)
+            _display_totals_cards(grand_totals['sums'], columns_to_sum, "Total geral filtrado")
+    else:
+        st.info("Nenhuma coluna mensurável selecionada para exibir totais.")
+
+def _server_page_start(scope_key, page: int, rows_per_page: int, total_rows: int):
+    """
+    Retorna (chave, offset, a partir do fim) para ler a página `page` no modo servidor. As
+    chaves das páginas já visitadas ficam no estado da sessão; a leitura parte da chave
+    conhecida mais próxima antes da página, e o offset só é diferente de zero em saltos para
+    páginas ainda não visitadas. Se a página estiver mais perto do fim do escopo, o offset
+    conta a partir da última linha.
+    """
+    cursors = st.session_state.get('server_page_cursors')
+    if not cursors or cursors['scope'] != scope_key:
+        cursors = {'scope': scope_key, 'keys': {1: None}}
+        st.session_state['server_page_cursors'] = cursors
+    known_page = max(known for known in cursors['keys'] if known <= page)
+    forward_offset = (page - known_page) * rows_per_page
+    end_offset = max(total_rows - page * rows_per_page, 0)
+    if end_offset < forward_offset:
+        return None, end_offset, True
+    return cursors['keys'][known_page], forward_offset, False
+
+def display_server_table(username: str, user_role: str, start_date, end_date, filters: dict):
+    """
+    Tabela no modo servidor, para períodos grandes: só a página atual é lida do MySQL, por
+    paginação por chave em (dia, linha_id). O total de linhas e os totais gerais vêm de uma
+    única consulta agregada, então o período inteiro nunca é carregado na memória.
+    """
+    selected_columns = _display_column_selector()
+    if not selected_columns:
+        return
+
+    columns_to_sum = [col for col in MEASURABLE_COLUMNS if col in selected_columns]
+    totals = load_column_totals(username, user_role, start_date, end_date, filters, columns_to_sum)
+    if totals is None:
+        return
+    total_rows = totals['rows']
+    if total_rows == 0:
+        st.warning("Nenhum dado disponível para exibição.")
+        return
+
+    if st.session_state.get('page_size') not in SERVER_PAGE_SIZE_OPTIONS:
+        st.session_state['page_size'] = 50
+    rows_per_page, total_pages = _resolve_pagination(total_rows)
+    current_page = st.session_state['current_page']
+
+    scope_key = (username, user_role, str(start_date), str(end_date), repr(sorted(filters.items())), rows_per_page)
+    after_key, offset, from_end = _server_page_start(scope_key, current_page, rows_per_page, total_rows)
+    # Da última página só existem as linhas que sobram
+    page_rows = min(rows_per_page, total_rows - (current_page - 1) * rows_per_page) if from_end else rows_per_page
+    if offset >= int(get_setting("dashboard", "server_offset_warning_rows", 100000)):
+        st.caption(
+            f"Salto para uma página ainda não visitada: o banco percorre {offset:,} linhas para chegar nela. "
+            "Avançar página a página (ou ir para as últimas páginas) é mais rápido.".replace(",", ".")
+        )
+    df_page, last_key = load_bpd_page(username, user_role, start_date, end_date, filters, selected_columns, page_rows, after_key, offset, from_end)
+    if last_key is not None:
+        st.session_state['server_page_cursors']['keys'][current_page + 1] = last_key
+
+    df_paginated = df_page[[col for col in selected_columns if col in df_page.columns]]
+
+    # Exportação do escopo inteiro, lida do MySQL página a página em segundo plano
+    export_columns = list(df_paginated.columns)
+    totals_row = build_totals_row(export_columns, {col: totals[col] for col in columns_to_sum}) if columns_to_sum else None
+    pool = get_connection_pool()
+    export_filters = dict(filters)
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
+    with col1:
+        btn_col_csv, btn_col_xlsx = st.columns(2)
+        for export_format, btn_col in (('csv', btn_col_csv), ('xlsx', btn_col_xlsx)):
+            with btn_col:
+                _display_background_export_button(
+                    export_format, export_columns,
+                    lambda: iter_bpd_pages(pool, username, user_role, start_date, end_date, export_filters, selected_columns),
+                    totals_row, total_rows
+                )
+    _display_export_jobs(username)
+
+    st.dataframe(df_paginated, use_container_width=True, hide_index=True)
+
+    _display_pagination_controls(len(df_paginated), total_rows, total_pages, SERVER_PAGE_SIZE_OPTIONS)
+
+    st.markdown("### 📊 Totais")
+    if columns_to_sum:
+        st.markdown("#### 📄 Totais da Página Atual")
+        page_totals = compute_totals(df_paginated, columns_to_sum)
+        _display_totals_cards(page_totals['sums'], columns_to_sum, "Total da página atual")
+
+        if total_pages > 1:
+            st.markdown("#### 📊 Totais Gerais (Todos os Dados Filtrados)")
+            _display_totals_cards(totals, columns_to_sum, "Total geral filtrado")
     else:
         st.info("Nenhuma coluna mensurável selecionada para exibir totais.")
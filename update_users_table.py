@@ -70,6 +70,47 @@ def check_and_update_users_table():
     finally:
         conn.close()
 
+def ensure_login_index():
+    """
+    Garante o índice único em users.username, usado pelo login para buscar um único usuário,
+    e amplia a coluna password para caber o hash PBKDF2 das senhas.
+    """
+    conn = get_db_connection()
+    if not conn:
+        st.error("Não foi possível conectar ao banco de dados.")
+        return False
+
+    try:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'username' AND SEQ_IN_INDEX = 1"
+        )
+        if cursor.fetchone()[0]:
+            st.success("✅ Coluna 'username' já está indexada!")
+        else:
+            cursor.execute("ALTER TABLE users ADD UNIQUE INDEX idx_users_username (username)")
+            conn.commit()
+            st.success("✅ Índice único em 'username' criado com sucesso!")
+
+        cursor.execute(
+            "SELECT CHARACTER_MAXIMUM_LENGTH FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'password'"
+        )
+        row = cursor.fetchone()
+        if row and row[0] is not None and row[0] < 255:
+            cursor.execute("ALTER TABLE users MODIFY COLUMN password VARCHAR(255)")
+            conn.commit()
+            st.success("✅ Coluna 'password' ampliada para VARCHAR(255) (hash das senhas)!")
+        return True
+
+    except Exception as e:
+        st.error(f"Erro ao criar índice da tabela users: {e}")
+        return False
+    finally:
+        conn.close()
+
 def insert_sample_user():
     """
     Insere um usuário de exemplo para teste.
@@ -105,7 +146,7 @@ def main():
     
     if st.button("🔍 Verificar e Atualizar Tabela", type="primary"):
         with st.spinner("Verificando e atualizando tabela users..."):
-            if check_and_update_users_table():
+            if check_and_update_users_table() and ensure_login_index():
                 st.success("Tabela users verificada e atualizada com sucesso!")
                 
                 if st.button("👤 Inserir Usuário de Exemplo"):
@@ -0,0 +1,194 @@
+import atexit
+import threading
+import time
+import streamlit as st
+from database import get_connection_pool
+from utils import get_setting
+from instrumentation import logger
+
+USER_CONFIGS_DDL = """
+CREATE TABLE IF NOT EXISTS user_configs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(255) NOT NULL,
+    config_type VARCHAR(100) NOT NULL,
+    config_value TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_user_config (username, config_type)
+)
+"""
+
+UPSERT_QUERY = """
+INSERT INTO user_configs (username, config_type, config_value)
+VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE config_value = VALUES(config_value), updated_at = CURRENT_TIMESTAMP
+"""
+
+class UserPreferences:
+    """
+    Preferências dos usuários (tabela user_configs) servidas da memória do processo.
+    Todas as linhas de um usuário são carregadas em uma consulta no login; as leituras
+    seguintes não tocam o banco. As gravações atualizam a memória na hora e ficam numa fila
+    que uma thread grava em lote a cada `flush_interval` segundos: várias alterações da mesma
+    preferência antes da gravação viram uma única linha no lote.
+    """
+
+    def __init__(self, pool, flush_interval: float = 2.0):
+        self._pool = pool
+        self.flush_interval = flush_interval
+        self._values = {}   # {username: {config_type: config_value}}
+        self._pending = {}  # {(username, config_type): config_value}, ainda não gravado
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stats = {'loads': 0, 'reads': 0, 'writes': 0, 'flushes': 0, 'rows_flushed': 0, 'flush_errors': 0}
+        self._ensure_table()
+        self._writer = threading.Thread(target=self._run_writer, name="user-preferences-writer", daemon=True)
+        self._writer.start()
+        # Grava o que ainda estiver na fila quando o processo for encerrado
+        atexit.register(self.flush)
+
+    def _ensure_table(self):
+        # DDL executado uma vez por processo, fora do caminho das leituras e gravações
+        conn = self._pool.checkout()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(USER_CONFIGS_DDL)
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+    def load_user(self, username: str) -> dict:
+        """
+        Carrega todas as preferências do usuário em uma consulta, substituindo a cópia em memória.
+        Gravações ainda pendentes continuam valendo sobre o que veio do banco.
+        """
+        conn = self._pool.checkout()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT config_type, config_value FROM user_configs WHERE username = %s", (username,))
+            values = dict(cursor.fetchall())
+            cursor.close()
+        finally:
+            conn.close()
+
+        with self._lock:
+            for (pending_user, config_type), config_value in self._pending.items():
+                if pending_user == username:
+                    values[config_type] = config_value
+            self._values[username] = values
+            self._stats['loads'] += 1
+            return dict(values)
+
+    def get(self, username: str, config_type: str, default_value=None):
+        """Retorna a preferência do usuário, carregando o usuário do banco se ainda não estiver em memória."""
+        with self._lock:
+            values = self._values.get(username)
+            self._stats['reads'] += 1
+        if values is None:
+            values = self.load_user(username)
+        return values.get(config_type, default_value)
+
+    def set(self, username: str, config_type: str, config_value: str):
+        """Atualiza a preferência em memória e agenda a gravação no banco."""
+        with self._lock:
+            # Usuário ainda não carregado: a próxima leitura carrega do banco e aplica o pendente
+            if username in self._values:
+                self._values[username][config_type] = config_value
+            self._pending[(username, config_type)] = config_value
+            self._stats['writes'] += 1
+        self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Grava em lote as preferências pendentes e retorna quantas linhas foram gravadas.
+        Em caso de erro, as linhas voltam para a fila (sem sobrescrever alterações mais novas).
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            conn = None
+            try:
+                conn = self._pool.checkout()
+                cursor = conn.cursor()
+                cursor.executemany(UPSERT_QUERY, [(username, config_type, value) for (username, config_type), value in batch.items()])
+                conn.commit()
+                cursor.close()
+            except Exception as e:
+                logger.error("Falha ao gravar %d preferência(s) de usuário: %s", len(batch), e)
+                with self._lock:
+                    for key, value in batch.items():
+                        self._pending.setdefault(key, value)
+                    self._stats['flush_errors'] += 1
+                return 0
+            finally:
+                if conn is not None:
+                    conn.close()
+
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['rows_flushed'] += len(batch)
+            return len(batch)
+
+    def _run_writer(self):
+        while True:
+            self._wakeup.wait()
+            # Espera o intervalo para juntar as alterações feitas em sequência num único lote
+            time.sleep(self.flush_interval)
+            self._wakeup.clear()
+            if self.flush() == 0 and self._pending:
+                time.sleep(self.flush_interval)  # Banco indisponível: tenta de novo mais tarde
+            if self._pending:
+                self._wakeup.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['users'] = len(self._values)
+            stats['pending'] = len(self._pending)
+        return stats
+
+@st.cache_resource
+def get_user_preferences():
+    """
+    Retorna o serviço de preferências do processo. O intervalo entre as gravações em lote pode
+    ser ajustado em [preferences] flush_interval (segundos) no secrets.toml.
+    """
+    return UserPreferences(get_connection_pool(), flush_interval=float(get_setting("preferences", "flush_interval", 2.0)))
+
+def load_user_preferences(username: str) -> dict:
+    """
+    Carrega as preferências do usuário para a memória (chamado no login).
+    Retorna {config_type: config_value}, ou um dicionário vazio em caso de erro.
+    """
+    try:
+        return get_user_preferences().load_user(username)
+    except Exception as e:
+        st.error(f"Erro ao carregar as configurações do usuário: {e}")
+        return {}
+
+def get_user_preference(username: str, config_type: str, default_value=None):
+    """
+    Retorna uma preferência do usuário a partir da memória do processo.
+    """
+    try:
+        return get_user_preferences().get(username, config_type, default_value)
+    except Exception as e:
+        st.error(f"Erro ao carregar configuração do usuário: {e}")
+        return default_value
+
+def save_user_preference(username: str, config_type: str, config_value: str) -> bool:
+    """
+    Salva uma preferência do usuário. O valor vale imediatamente para as leituras e é
+    gravado no banco em segundo plano.
+    """
+    try:
+        get_user_preferences().set(username, config_type, config_value)
+        return True
+    except Exception as e:
+        st.error(f"Erro ao salvar configuração do usuário: {e}")
+        return False
@@ -1,4 +1,5 @@
 import streamlit as st
+from datetime import date, timedelta
 
 def insert_google_analytics():
     st.markdown(
@@ -13,4 +14,34 @@ def insert_google_analytics():
 </script>
         ''',
         unsafe_allow_html=True
-    )
\ No newline at end of file
+    )
+
+def get_setting(section: str, key: str, default=None):
+    """
+    Lê uma configuração opcional do secrets.toml, retornando `default` se a seção,
+    a chave ou o próprio arquivo de secrets não existirem.
+    """
+    try:
+        return st.secrets[section].get(key, default)
+    except Exception:
+        return default
+
+# Opções do seletor de período do dashboard
+PERIOD_OPTIONS = ("Semana Atual", "Hoje", "Última semana", "Últimos 30 dias", "Mostrar tudo")
+
+def period_dates(option: str, reference_date: date, today: date):
+    """
+    Retorna (início, fim) do período do seletor. `reference_date` é a data máxima dos dados
+    (ou hoje, se o banco não tiver datas). "Mostrar tudo" retorna (None, None).
+    """
+    if option == "Semana Atual":
+        return reference_date - timedelta(days=reference_date.weekday()), reference_date
+    if option == "Hoje":
+        # Para "Hoje", sempre usar a data atual do sistema, não a data máxima do banco
+        return today, today
+    if option == "Última semana":
+        end_of_last_week = reference_date - timedelta(days=reference_date.weekday() + 1)
+        return end_of_last_week - timedelta(days=6), end_of_last_week
+    if option == "Últimos 30 dias":
+        return reference_date - timedelta(days=29), reference_date
+    return None, None